@@ -188,4 +188,12 @@ For example:
 If a log file is not necessary, removing the LOGFILE option from the 'Select_options' parameter will allow 
 the tool to run to completion.
 
-'''
\ No newline at end of file
+'''
+
+
+edgeWidthError = '''Invalid edge width: {0}
+
+Edge widths must be whole numbers of grid cells greater than zero. Several edge widths may be given, separated by 
+semicolons or commas (e.g., "1;3;5;10"), when ATtILA2.metric.runCoreAndEdgeMetrics is called directly from Python. The 
+Edge width parameter of the Core and Edge Metrics tool accepts a single whole number.
+'''
@@ -31,6 +31,47 @@ dummyFieldName = "_dummy"
 scratchGDBFilename = "attilaScratchWorkspace.gdb"
 allGridValuesTools = ["lccc", "lcd"]
 
+# Engine used to tabulate land cover area by reporting unit. "ARCPY" runs the Spatial Analyst TabulateArea tool. "NUMPY"
+# rasterizes the reporting units once and computes the zones x values area matrix in memory.
+zonalEngine = "ARCPY"
+
+# Grids with more rows or columns than zonalBlockSize are tabulated by the "NUMPY" engine in blocks of this many rows and
+# columns, which bounds the memory used for continental extents.
+zonalBlockSize = 4096
+
+# Engine used to build the patch grid for Patch Metrics. "NUMPY" labels the patches in memory and writes the finished
+# patch grid once; "ARCPY" chains the Spatial Analyst Reclassify, RegionGroup and Con tools. The "NUMPY" engine holds the
+# whole land cover grid in memory and reads its cells as they are, so the "ARCPY" tools are used instead for grids of
+# more than patchEngineMaxCells cells and when the extent, cell size, mask, snap raster or output coordinate system
+# environments would clip, resample, mask, shift or project the grid.
+patchEngine = "ARCPY"
+patchEngineMaxCells = 2 ** 28
+
+# Engine used for the square neighborhood sums of Neighborhood Proportions and the circular neighborhood sums of the
+# view tools. "NUMPY" computes the sums in memory (from a summed area table for squares; by direct sums, row runs or an
+# FFT, depending on the radius, for circles), reading the grids in strips of whole rows that hold about focalStripCells
+# cells; "ARCPY" runs the Spatial Analyst FocalStatistics tool. As with the patch engine, the "ARCPY" tools are used
+# instead when the extent, cell size, mask, snap raster or output coordinate system environments would change the grid.
+# The view tools also read the whole land cover grid, so they use the "ARCPY" tools for grids of more than
+# patchEngineMaxCells cells.
+focalEngine = "ARCPY"
+focalStripCells = 2 ** 24
+
+# Grids produced by the "NUMPY" focal engine are streamed, a strip at a time, into tiled, deflate compressed GeoTIFFs
+# with internal overviews in the scratch folder (see utils/rasterwriter.py). rasterTileSize is the number of rows and
+# columns in a tile and rasterCompressLevel the zlib compression level (1 to 9).
+rasterTileSize = 256
+rasterCompressLevel = 6
+
+# Zonal tabulations can be cached by a fingerprint of the reporting units, land cover grid and processing environments so
+# that tools run on the same inputs reuse them. Building the fingerprint reads every reporting unit geometry (and every
+# cell of a land cover grid without an attribute table), so the cache only pays off when several tools tabulate the same
+# inputs; set tabulationCache to True to use it. When no folder is given, the cache is kept in the scratch folder. The
+# oldest entries are removed once the cache exceeds the maximum size (bytes).
+tabulationCache = False
+tabulationCacheFolder = ""
+tabulationCacheMaxSize = 2 * 1024 ** 3
+
 # These are the extensions Esri recognizes as rasters. They may not all be acceptable when saving a calculated grid. Tools
 # such as Intersection Density can only save its output with ".img", or ".tif" extensions when saving to a folder. An 
 # extension in this case, however, is not required and may be omitted. No extensions are permitted inside a geodatabase.
@@ -27,7 +27,8 @@ from .constants import metricConstants
 from .constants import globalConstants
 from .constants import errorConstants
 from . import utils
-from .utils.tabarea import TabulateAreaTable
+from .utils.tabarea import TabulateAreaTable, ArrayTabulateAreaTable, MatrixTabulateAreaTable, getTabulateAreaTable
+from .utils import edgecore
 from datetime import datetime
 import traceback
 import random
@@ -142,8 +143,9 @@ class metricCalc:
     def _makeTabAreaTable(self):
         AddMsg(self.timer.now() + " Generating a zonal tabulate area table", 0, self.logFile)
         # Internal function to generate a zonal tabulate area table
-        self.tabAreaTable = TabulateAreaTable(self.inReportingUnitFeature, self.reportingUnitIdField,
-                                              self.inLandCoverGrid, self.logFile, self.tableName, self.lccObj)
+        self.tabAreaTable = getTabulateAreaTable(self.inReportingUnitFeature, self.reportingUnitIdField,
+                                                 self.inLandCoverGrid, self.logFile, self.tableName, self.lccObj,
+                                                 self.timer)
 
     def _calculateMetrics(self):
         AddMsg(self.timer.now() + " Processing the tabulate area table and computing metric values", 0, self.logFile)
@@ -593,7 +595,7 @@ def runFloodplainLandCoverProportions(toolPath, inReportingUnitFeature, reportin
                     ruTableName = metricConst.shortName + globalConstants.ruTabulateAreaTableAbbv
                 else:
                     ruTableName = None
-                ruAreaTable = TabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, flcpCalc.lccObj)
+                ruAreaTable = getTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, flcpCalc.lccObj, timer)
                 
                 for ruAreaTableRow in ruAreaTable:
                     key = ruAreaTableRow.zoneIdValue
@@ -732,6 +734,15 @@ def runPatchMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField, inLa
             inLandCoverGrid, scratchName = raster.clipRaster(inReportingUnitFeature, inLandCoverGrid, DateTimer, metricConst, logFile)
             env.workspace = _startingWorkSpace
         
+        
+        # The "NUMPY" patch engine cross-tabulates all reporting units in one pass for the patch metrics and MDCP, which
+        # gives each cell to only one reporting unit. Overlapping reporting units are processed one at a time instead.
+        crossTabYN = False
+        if globalConstants.patchEngine == "NUMPY":
+            AddMsg(f"{timer.now()} Checking {basename(inReportingUnitFeature)} for overlapping reporting units.", 0, logFile)
+            crossTabYN = not polygons.hasOverlaps(inReportingUnitFeature)
+            if not crossTabYN:
+                AddMsg(f"{timer.now()} Overlapping reporting units found. Patch metrics and MDCP will be calculated one reporting unit at a time.", 1, logFile)
             
         # Run metric calculate for each metric in list
         for m in metricsBaseNameList:
@@ -767,34 +778,37 @@ def runPatchMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField, inLa
                 def _calculateMetrics(self):
                     AddMsg(f"{self.timer.now()} Calculating Patch Numbers by Reporting Unit for Class:{m}", 0, self.logFile)
                     
-                    per = '[PER UNIT]'
-                    AddMsg(f"{timer.now()} The following steps will be performed for each reporting unit:", 0, logFile)    
-                    AddMsg("\n---")
-                    AddMsg(f"{timer.now()} {per} 1) Create a feature layer of the single reporting unit.", 0, logFile)
-                    AddMsg(f"{timer.now()} {per} 2) Set the geoprocessing extent to just the extent of the selected reporting unit.", 0, logFile)
-                    AddMsg(f"{timer.now()} {per} 3) Copy the single reporting unit feature layer to a new feature class.", 0, logFile)
-                    AddMsg(f"{timer.now()} {per} 4) Calculate the area of patches within reporting unit with TabulateArea:", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}     4a) arcpy.sa.TabulateArea(newFeatureClass, reportingUnitIdField, inLandCoverGrid,'Value', tabareaTable, processingCellSize)", 0, logFile)
-                    AddMsg(f"{timer.now()} {per} 5) Loop through each row in the TabulateArea table (only one row in table) and calculate the patch metrics: ", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}     5a) other area = value of 'Value_0' field ", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}     5b) excluded area = value of 'Value__9999' field", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}     5c) create a list of all patch area values for the row (all fields except 'Value_0' and 'Value__9999'):", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c1) numPatch = len(patchAreaList)", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c2) patchArea = sum(patchAreaList)", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c3) lrgPatch = max(patchAreaList)", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c4) mdnpatch = numpy.median(patchAreaList)", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c5) avePatch = patchArea/numPatch", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c6) lrgProportion = (lrgPatch/patchArea) * 100", 0, logFile)
-                    AddMsg(f"{timer.now()} {per}       c7) patchDensity = numPatch/(patchArea + otherArea) in square kilometers", 0, logFile)    
-                    AddMsg(f"{timer.now()} {per} 6) Insert calculated values into Output table.", 0, logFile)
-                    AddMsg(f"{timer.now()} {per} 7) Delete reporting unit feature layer, reporting unit feature class, and TabulateArea table.", 0, logFile)
-                    AddMsg("---\n")
+                    if crossTabYN:
+                        AddMsg(f"{timer.now()} Cross-tabulating reporting units and patches in one pass to compute the patch metrics.", 0, logFile)
+                    else:
+                        per = '[PER UNIT]'
+                        AddMsg(f"{timer.now()} The following steps will be performed for each reporting unit:", 0, logFile)    
+                        AddMsg("\n---")
+                        AddMsg(f"{timer.now()} {per} 1) Create a feature layer of the single reporting unit.", 0, logFile)
+                        AddMsg(f"{timer.now()} {per} 2) Set the geoprocessing extent to just the extent of the selected reporting unit.", 0, logFile)
+                        AddMsg(f"{timer.now()} {per} 3) Copy the single reporting unit feature layer to a new feature class.", 0, logFile)
+                        AddMsg(f"{timer.now()} {per} 4) Calculate the area of patches within reporting unit with TabulateArea:", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}     4a) arcpy.sa.TabulateArea(newFeatureClass, reportingUnitIdField, inLandCoverGrid,'Value', tabareaTable, processingCellSize)", 0, logFile)
+                        AddMsg(f"{timer.now()} {per} 5) Loop through each row in the TabulateArea table (only one row in table) and calculate the patch metrics: ", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}     5a) other area = value of 'Value_0' field ", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}     5b) excluded area = value of 'Value__9999' field", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}     5c) create a list of all patch area values for the row (all fields except 'Value_0' and 'Value__9999'):", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c1) numPatch = len(patchAreaList)", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c2) patchArea = sum(patchAreaList)", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c3) lrgPatch = max(patchAreaList)", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c4) mdnpatch = numpy.median(patchAreaList)", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c5) avePatch = patchArea/numPatch", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c6) lrgProportion = (lrgPatch/patchArea) * 100", 0, logFile)
+                        AddMsg(f"{timer.now()} {per}       c7) patchDensity = numPatch/(patchArea + otherArea) in square kilometers", 0, logFile)    
+                        AddMsg(f"{timer.now()} {per} 6) Insert calculated values into Output table.", 0, logFile)
+                        AddMsg(f"{timer.now()} {per} 7) Delete reporting unit feature layer, reporting unit feature class, and TabulateArea table.", 0, logFile)
+                        AddMsg("---\n")
                     
                     # calculate Patch metrics
                     AddMsg(f"{timer.now()} Starting calculations per reporting unit...", 0, logFile)
                     self.pmResultsDict = calculate.getPatchNumbers(self.outIdField, self.newTable, self.reportingUnitIdField, self.metricsFieldnameDict,
                                                       self.zoneAreaDict, self.metricConst, m, self.inReportingUnitFeature, 
-                                                      self.inLandCoverGrid, processingCellSize, conversionFactor)
+                                                      self.inLandCoverGrid, processingCellSize, conversionFactor, crossTabYN)
  
                     AddMsg(f"{timer.now()} Patch analysis has been run for Class:{m}", 0, self.logFile)
                     
@@ -817,7 +831,8 @@ def runPatchMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField, inLa
                         # run the calculation script. get the results back as a dictionary keyed to RU id values
                         self.mdcpDict =  vector.tabulateMDCP(self.inLandCoverGrid, self.inReportingUnitFeature, 
                                                                    self.reportingUnitIdField, rastoPolyFeature, rasterCentroidFeature, polyDissolvedFeature,
-                                                                   nearPatchTable, self.zoneAreaDict, timer, self.pmResultsDict, self.logFile)
+                                                                   nearPatchTable, self.zoneAreaDict, timer, self.pmResultsDict, self.logFile,
+                                                                   crossTabYN)
                         # place the results into the output table
                         calculate.getMDCP(self.outIdField, self.newTable, self.mdcpDict, self.optionalGroupsList,
                                                  outClassName)
@@ -900,7 +915,12 @@ def runPatchMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField, inLa
 
 def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, _lccName, lccFilePath, metricsToRun,
                           inEdgeWidth, outTable, processingCellSize, snapRaster, optionalFieldGroups, clipLCGrid):
-    """ Interface for script executing Core/Edge Metrics """
+    """ Interface for script executing Core/Edge Metrics
+
+        inEdgeWidth is a width in cells, or several widths separated by semicolons or commas (e.g., "1;3;5;10"). The
+        Edge width parameter of the toolbox is a Long and takes a single width; several widths can only be given by
+        calling this function directly from Python.
+    """
 
     try:
         timer = DateTimer()
@@ -915,11 +935,33 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
         
         # grab the current date and time for log file
         metricConst.logTimeStamp = datetime.now().strftime(globalConstants.logFileExtension)
-        # append the edge width distance value to the field suffix
-        metricConst.fieldParameters[1] = metricConst.fieldSuffix + inEdgeWidth
+        # several edge widths may be given, separated by semicolons or commas (e.g., "1;3;5;10"). The Edge width
+        # parameter of the toolbox is a Long, so lists of widths can only be passed in by calling this function directly.
+        edgeWidthList = []
+        for aWidth in str(inEdgeWidth).replace(",", ";").split(";"):
+            aWidth = aWidth.strip()
+            if not aWidth:
+                continue
+            if not aWidth.isdigit() or int(aWidth) == 0:
+                raise errors.attilaException(errorConstants.edgeWidthError.format(aWidth))
+            aWidth = str(int(aWidth))
+            if aWidth not in edgeWidthList:
+                edgeWidthList.append(aWidth)
+        if not edgeWidthList:
+            raise errors.attilaException(errorConstants.edgeWidthError.format(inEdgeWidth))
+        
+        # append the first edge width distance value to the field suffix
+        metricConst.fieldParameters[1] = metricConst.fieldSuffix + edgeWidthList[0]
         # for the core and edge fields, add the edge width to the  field suffix
         for i, fldParams in enumerate(metricConst.additionalFields):
-            fldParams[1] = metricConst.additionalSuffixes[i] + inEdgeWidth
+            fldParams[1] = metricConst.additionalSuffixes[i] + edgeWidthList[0]
+        # add a set of ratio, core and edge fields suffixed with each additional edge width
+        widthFields = []
+        for aWidth in edgeWidthList[1:]:
+            widthFields.append([metricConst.fieldPrefix, metricConst.fieldSuffix + aWidth] + metricConst.fieldParameters[2:])
+            for i, fldParams in enumerate(metricConst.additionalFields):
+                widthFields.append([fldParams[0], metricConst.additionalSuffixes[i] + aWidth] + fldParams[2:])
+        metricConst.additionalFields = metricConst.additionalFields + widthFields
         
         metricsBaseNameList, optionalGroupsList = setupAndRestore.standardSetup(snapRaster, processingCellSize,
                                                                                 os.path.dirname(outTable),
@@ -961,8 +1003,19 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
 
 
         if clipLCGrid == "true":
-            inLandCoverGrid, scratchName = raster.clipRaster(inReportingUnitFeature, inLandCoverGrid, DateTimer, metricConst, logFile, inEdgeWidth)
-        
+            inLandCoverGrid, scratchName = raster.clipRaster(inReportingUnitFeature, inLandCoverGrid, DateTimer, metricConst, logFile, 
+                                                             max(edgeWidthList, key=float))
+        
+        def getWidthFieldNames(m, aWidth):
+            # return the ratio, core and edge field names of a class for one edge width
+            outClassName = metricsFieldnameDict[m][1]
+            if aWidth == edgeWidthList[0]:
+                ratioFieldName = metricsFieldnameDict[m][0]
+            else:
+                ratioFieldName = metricConst.fieldPrefix + outClassName + metricConst.fieldSuffix + aWidth
+            additionalFieldNames = [fldParams[0] + outClassName + metricConst.additionalSuffixes[i] + aWidth 
+                                    for i, fldParams in enumerate(metricConst.additionalFields[:len(metricConst.additionalSuffixes)])]
+            return [ratioFieldName] + additionalFieldNames
         
         # Run metric calculate for each metric in list
         for m in metricsBaseNameList:
@@ -974,6 +1027,16 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
                     AddMsg(f"{self.timer.now()} Generating core and edge grid for Class: {m.upper()}", 0, self.logFile)
                     
                     scratchNameReference =  [""];
+                    if globalConstants.zonalEngine == "NUMPY":
+                        # classify core and edge in memory; the category array is tabulated directly in _makeTabAreaTable
+                        self.coreEdgeArrays = raster.getEdgeCoreArrays(m, self.lccObj, self.lccClassesDict, self.inReportingUnitFeature,
+                                                                       self.reportingUnitIdField, self.inLandCoverGrid, self.edgeWidthList,
+                                                                       self.timer, metricConst.shortName, scratchNameReference,
+                                                                       self.logFile, self.saveIntermediates)
+                        self.scratchNameToBeDeleted = scratchNameReference[0]
+                        AddMsg(f"{self.timer.now()} Class {m.upper()} core and edge array complete.", 0, self.logFile)
+                        return
+                    
                     self.inLandCoverGrid = raster.getEdgeCoreGrid(m, self.lccObj, self.lccClassesDict, self.inLandCoverGrid, self.inEdgeWidth,
                                                                         self.timer, metricConst.shortName, scratchNameReference, self.logFile)
                     self.scratchNameToBeDeleted = scratchNameReference[0]
@@ -987,6 +1050,21 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
                 
                 def _makeTabAreaTable(self):
                     AddMsg(f"{self.timer.now()} Generating a zonal tabulate area table", 0, self.logFile)
+                    if globalConstants.zonalEngine == "NUMPY":
+                        zoneArray, coreEdgeArray, zoneIdLookup, cellArea = self.coreEdgeArrays
+                        self.coreEdgeArrays = None
+                        self.lccObj = None
+                        # tabulate the codes of all edge widths in one zonal pass, then split the areas into a table per width
+                        codeTabAreaTable = ArrayTabulateAreaTable(zoneArray, coreEdgeArray, cellArea, None, zoneIdLookup, -1,
+                                                                  edgecore.noDataCode)
+                        zoneIdValues, gridValues, areaMatrix = codeTabAreaTable.getAreaMatrix()
+                        categoryValues, widthMatrices = edgecore.getWidthAreaMatrices(gridValues, areaMatrix, self.edgeWidthList)
+                        self.tabAreaTables = [MatrixTabulateAreaTable(zoneIdValues, categoryValues, widthMatrix)
+                                              for widthMatrix in widthMatrices]
+                        self.tabAreaTable = None
+                        return
+                    
+                    edgeWidth = self.inEdgeWidth
                     # Internal function to generate a zonal tabulate area table
                     class categoryTabAreaTable(TabulateAreaTable):
                         #Update definition so Tabulate Table is run on the POS field.
@@ -994,23 +1072,22 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
                             self._value = "CATEGORY"
                             if self._tableName:
                                 self._destroyTable = False
-                                self._tableName = arcpy.CreateScratchName(self._tableName+m.upper()+inEdgeWidth+"_", "", self._datasetType)
+                                self._tableName = arcpy.CreateScratchName(self._tableName+m.upper()+edgeWidth+"_", "", self._datasetType)
                             else:
-                                self._tableName = arcpy.CreateScratchName(self._tempTableName+m.upper()+inEdgeWidth+"_", "", self._datasetType)
+                                self._tableName = arcpy.CreateScratchName(self._tempTableName+m.upper()+edgeWidth+"_", "", self._datasetType)
 
                             log.logArcpy('arcpy.gp.TabulateArea_sa', (self._inReportingUnitFeature, self._reportingUnitIdField, self._inLandCoverGrid, 
                                   self._value, self._tableName), logFile)
                             arcpy.gp.TabulateArea_sa(self._inReportingUnitFeature, self._reportingUnitIdField, self._inLandCoverGrid, self._value, self._tableName)
                             
-                            self._tabAreaTableRows = arcpy.SearchCursor(self._tableName)        
                             self._tabAreaValueFields = arcpy.ListFields(self._tableName, "", "DOUBLE")
                             self._tabAreaValues = [aFld.name for aFld in self._tabAreaValueFields]
-                            self._tabAreaDict = dict(zip(self._tabAreaValues,[])) 
                              
                     self.lccObj = None
                     
                     self.tabAreaTable = categoryTabAreaTable(self.inReportingUnitFeature, self.reportingUnitIdField,
                                               self.inLandCoverGrid, self.tableName, self.lccObj)
+                    self.tabAreaTables = [self.tabAreaTable]
                     
                 # Update housekeeping. Moved checks for undefined grid values and excluded grid values in class definitions
                 # out of the for loop. Now they are only ran once at the beginning of the metric run
@@ -1036,9 +1113,11 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
                     self.newTable = newtable
                     self.metricsFieldnameDict = metricsFieldnameDict
 
-                    # calculate Core to Edge ratio
-                    calculate.getCoreEdgeRatio(self.outIdField, self.newTable, self.tabAreaTable, self.metricsFieldnameDict,
-                                                      self.zoneAreaDict, self.metricConst, m)
+                    # calculate Core to Edge ratio for each edge width
+                    for tabAreaTable, aWidth in zip(self.tabAreaTables, self.edgeWidthList):
+                        calculate.getCoreEdgeRatio(self.outIdField, self.newTable, tabAreaTable, self.metricsFieldnameDict,
+                                                   self.zoneAreaDict, self.metricConst, m, getWidthFieldNames(m, aWidth))
+                    self.tabAreaTables = None
                     AddMsg(f"{self.timer.now()} Core/Edge Ratio calculations are complete for class: {m.upper()}", 0, self.logFile)
                 
                 #skip over output table statistics routine as it will be performed later
@@ -1049,24 +1128,32 @@ def runCoreAndEdgeMetrics(toolPath, inReportingUnitFeature, reportingUnitIdField
                     pass
 
 
-            # Create new instance of metricCalc class to contain parameters
-            caemCalc = metricCalcCAEM(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, lccFilePath,
-                          m, outTable, processingCellSize, snapRaster, optionalFieldGroups, metricConst, logFile)
-    
-            caemCalc.inEdgeWidth = inEdgeWidth
-    
-            # Run Calculation
-            caemCalc.run()
-            
-            caemCalc.metricsBaseNameList = metricsBaseNameList
-
-            #delete the intermediate raster if save intermediates option is not chosen 
-            if caemCalc.saveIntermediates:
-                pass
+            # the array engine classifies and tabulates all edge widths together; the arcpy engine builds a grid per width
+            if globalConstants.zonalEngine == "NUMPY":
+                widthRuns = [edgeWidthList]
             else:
-                directory = env.workspace
-                path = os.path.join(directory, caemCalc.scratchNameToBeDeleted)
-                arcpy.Delete_management(path)
+                widthRuns = [[aWidth] for aWidth in edgeWidthList]
+            
+            for runWidthList in widthRuns:
+                # Create new instance of metricCalc class to contain parameters
+                caemCalc = metricCalcCAEM(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, lccFilePath,
+                              m, outTable, processingCellSize, snapRaster, optionalFieldGroups, metricConst, logFile)
+        
+                caemCalc.inEdgeWidth = runWidthList[0]
+                caemCalc.edgeWidthList = runWidthList
+        
+                # Run Calculation
+                caemCalc.run()
+                
+                caemCalc.metricsBaseNameList = metricsBaseNameList
+    
+                #delete the intermediate raster if save intermediates option is not chosen 
+                if caemCalc.saveIntermediates or not caemCalc.scratchNameToBeDeleted:
+                    pass
+                else:
+                    directory = env.workspace
+                    path = os.path.join(directory, caemCalc.scratchNameToBeDeleted)
+                    arcpy.Delete_management(path)
 
         
         if logFile:
@@ -1207,7 +1294,7 @@ def runRiparianLandCoverProportions(toolPath, inReportingUnitFeature, reportingU
                     ruTableName = metricConst.shortName + globalConstants.ruTabulateAreaTableAbbv
                 else:
                     ruTableName = None
-                ruAreaTable = TabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, rlcpCalc.lccObj)
+                ruAreaTable = getTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, rlcpCalc.lccObj, timer)
                 
                 for ruAreaTableRow in ruAreaTable:
                     key = ruAreaTableRow.zoneIdValue
@@ -1356,7 +1443,7 @@ def runSamplePointLandCoverProportions(toolPath, inReportingUnitFeature, reporti
                     ruTableName = metricConst.shortName + globalConstants.ruTabulateAreaTableAbbv
                 else:
                     ruTableName = None
-                ruAreaTable = TabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, splcpCalc.lccObj)
+                ruAreaTable = getTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, ruTableName, splcpCalc.lccObj, timer)
                 
                 for ruAreaTableRow in ruAreaTable:
                     key = ruAreaTableRow.zoneIdValue
@@ -1434,7 +1521,7 @@ def runLandCoverCoefficientCalculator(toolPath, inReportingUnitFeature, reportin
                                                                                                 self.outIdField, self.logFile)
             def _calculateMetrics(self):
                 # process the tabulate area table and compute metric values. Use values to populate the ATtILA output table
-                calculate.landCoverCoefficientCalculator(self.lccObj.values, self.metricsBaseNameList,
+                calculate.landCoverCoefficientCalculator(self.lccObj, self.metricsBaseNameList,
                                                                self.optionalGroupsList, self.metricConst, self.outIdField,
                                                                self.newTable, self.tabAreaTable, self.metricsFieldnameDict,
                                                                self.zoneAreaDict, self.conversionFactor)
@@ -1960,8 +2047,9 @@ def runLandCoverDiversity(toolPath, inReportingUnitFeature, reportingUnitIdField
             def _makeTabAreaTable(self):
                 AddMsg(f"{self.timer.now()} Generating a zonal tabulate area table", 0, self.logFile)
                 # Internal function to generate a zonal tabulate area table
-                self.tabAreaTable = TabulateAreaTable(self.inReportingUnitFeature, self.reportingUnitIdField,
-                                                      self.inLandCoverGrid, self.logFile, self.tableName)
+                self.tabAreaTable = getTabulateAreaTable(self.inReportingUnitFeature, self.reportingUnitIdField,
+                                                         self.inLandCoverGrid, self.logFile, self.tableName,
+                                                         timer=self.timer)
                 
             def _calculateMetrics(self):
                 AddMsg(f"{self.timer.now()} Processing the tabulate area table and computing metric values", 0, self.logFile)
@@ -2030,6 +2118,194 @@ def runLandCoverDiversity(toolPath, inReportingUnitFeature, reportingUnitIdField
         setupAndRestore.standardRestore(logFile)
 
 
+def runLandCoverMetricSuite(toolPath, inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, lccFilePath,
+                            metricRequests, processingCellSize, snapRaster, optionalFieldGroups):
+    """ Interface for computing several land cover metrics from a single zonal tabulation
+
+    **Description:**
+
+        Land Cover Proportions, Land Cover Coefficient Calculator and Land Cover Diversity all start from the same
+        zonal tabulation of the land cover grid by reporting unit. This function performs the environment setup, LCC
+        parse, housekeeping and tabulation once, and then computes each requested metric from that tabulation and
+        writes it to its own output table.
+
+    **Arguments:**
+
+        * *metricRequests* - list of dictionaries, one per output table. Each has the keys:
+                        "metric" - one of "lcp", "lccc", or "lcd"
+                        "outTable" - the output table for the metric
+                        "metricsToRun" - the classes (lcp) or coefficients (lccc) to compute. Not used for lcd
+                        "perCapitaYN", "inCensusDataset", "inPopField" - optional per capita inputs for lcp
+        * all other arguments are the same as for runLandCoverProportions
+
+    **Returns:**
+
+        * None
+
+    """
+    suiteCalc = None
+    logFile = None
+    try:
+        suiteMetrics = ["lcp", "lccc", "lcd"]
+        for request in metricRequests:
+            if request["metric"].lower() not in suiteMetrics:
+                raise errors.attilaException(f"Unknown metric {request['metric']} requested. Available metrics are {', '.join(suiteMetrics)}")
+
+        # the Land Cover Proportions constants are used for the shared setup (e.g., the intermediate table name)
+        metricConst = metricConstants.lcpConstants()
+        firstOutTable = metricRequests[0]["outTable"]
+
+        # copy input parameters to pass to the log file routine
+        parametersList = [toolPath, inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, "", lccFilePath, 
+                          "", firstOutTable, "", "", "", processingCellSize, snapRaster, optionalFieldGroups]
+        # create a log file if requested, otherwise logFile = None.
+        logFile = log.setupLogFile(optionalFieldGroups, metricConst, parametersList, firstOutTable, toolPath)
+        
+        # Check to see if the inLandCoverGrid has an attribute table. If not, build one
+        raster.buildRAT(inLandCoverGrid, logFile)
+
+        # the housekeeping checks are run for every class requested by a Land Cover Proportions request
+        lcpClasses = []
+        for request in metricRequests:
+            if request["metric"].lower() == "lcp":
+                lcpClasses.append(request["metricsToRun"])
+
+        class metricSuiteCalc(metricCalc):
+            # Subclass that computes every requested metric from the one tabulate area table
+
+            def _makeAttilaOutTable(self):
+                # Output tables are constructed per request in _calculateMetrics
+                pass
+
+            def _getPopulationDict(self, request):
+                # Assemble dictionary with the reporting unit's ID as key, and the area-weighted population as the value
+                AddMsg(self.timer.now() + " Calculating population within each reporting unit", 0, self.logFile) 
+                popTable = files.nameIntermediateFile([metricConstants.lcpConstants.valueCountTableName,'Dataset'],self.cleanupList)
+                populationTable, populationField = table.createPolygonValueCountTable(self.inReportingUnitFeature,
+                                                                                     self.reportingUnitIdField,
+                                                                                     request["inCensusDataset"],
+                                                                                     request["inPopField"],
+                                                                                     popTable,
+                                                                                     self.metricConst,
+                                                                                     0,
+                                                                                     self.cleanupList,
+                                                                                     self.logFile)
+                return table.getIdValueDict(populationTable, self.reportingUnitIdField, populationField)
+
+            def _calculateMetrics(self):
+                for request in metricRequests:
+                    metric = request["metric"].lower()
+                    self.outTable = request["outTable"]
+                    AddMsg(f"{self.timer.now()} Constructing the ATtILA metric output table: {os.path.basename(self.outTable)}", 0, self.logFile)
+
+                    if metric == "lcp":
+                        self.metricConst = metricConstants.lcpConstants()
+                        self.metricsBaseNameList = parameters.splitItemsAndStripDescriptions(request["metricsToRun"], globalConstants.descriptionDelim)
+                        perCapitaYN = request.get("perCapitaYN", "false")
+                        additionalFields = self.metricConst.additionalFields if perCapitaYN == "true" else None
+                        self.newTable, self.metricsFieldnameDict = table.tableWriterByClass(self.outTable,
+                                                                                            self.metricsBaseNameList,
+                                                                                            self.optionalGroupsList,
+                                                                                            self.metricConst,
+                                                                                            self.lccObj,
+                                                                                            self.outIdField,
+                                                                                            self.logFile,
+                                                                                            additionalFields)
+                        zonePopulationDict = None
+                        if perCapitaYN == "true":
+                            zonePopulationDict = self._getPopulationDict(request)
+
+                        AddMsg(self.timer.now() + " Computing land cover proportions from the tabulate area table", 0, self.logFile)
+                        calculate.landCoverProportions(self.lccClassesDict, self.metricsBaseNameList, self.optionalGroupsList,
+                                                       self.metricConst, self.outIdField, self.newTable, self.tabAreaTable,
+                                                       self.metricsFieldnameDict, self.zoneAreaDict, self.reportingUnitAreaDict,
+                                                       zonePopulationDict, self.conversionFactor)
+
+                    elif metric == "lccc":
+                        self.metricConst = metricConstants.lcccConstants()
+                        self.metricsBaseNameList = parameters.splitItemsAndStripDescriptions(request["metricsToRun"], globalConstants.descriptionDelim)
+                        self.newTable, self.metricsFieldnameDict = table.tableWriterByCoefficient(self.outTable,
+                                                                                                  self.metricsBaseNameList,
+                                                                                                  self.optionalGroupsList,
+                                                                                                  self.metricConst, self.lccObj,
+                                                                                                  self.outIdField, self.logFile)
+
+                        AddMsg(self.timer.now() + " Computing land cover coefficients from the tabulate area table", 0, self.logFile)
+                        calculate.landCoverCoefficientCalculator(self.lccObj, self.metricsBaseNameList,
+                                                                 self.optionalGroupsList, self.metricConst, self.outIdField,
+                                                                 self.newTable, self.tabAreaTable, self.metricsFieldnameDict,
+                                                                 self.zoneAreaDict, self.conversionFactor)
+
+                    else:
+                        self.metricConst = metricConstants.lcdConstants()
+                        self.metricsBaseNameList = parameters.splitItemsAndStripDescriptions(self.metricConst.fixedMetricsToRun, globalConstants.descriptionDelim)
+                        self.newTable, self.metricsFieldnameDict = table.tableWriterNoLcc(self.outTable,
+                                                                                          self.metricsBaseNameList,
+                                                                                          self.optionalGroupsList,
+                                                                                          self.metricConst,
+                                                                                          self.outIdField,
+                                                                                          self.logFile)
+
+                        AddMsg(self.timer.now() + " Computing land cover diversity from the tabulate area table", 0, self.logFile)
+                        calculate.landCoverDiversity(self.metricConst, self.outIdField, self.newTable, self.tabAreaTable, self.zoneAreaDict)
+
+                    # Record each output table's info to the log file
+                    metricCalc._summarizeOutTable(self)
+
+            def _summarizeOutTable(self):
+                # Output tables are summarized as each one is completed in _calculateMetrics
+                pass
+
+            def _logEnvironments(self):
+                if self.logFile:
+                    # write environment settings
+                    log.writeEnvironments(self.logFile, self.snapRaster, self.processingCellSize, self.extentList)
+
+                    # write the grid values of every requested land cover proportions class to the log file
+                    if self.suiteClassNames:
+                        log.logWriteClassValues(self.logFile, self.suiteClassNames, self.lccObj, metricConstants.lcpConstants())
+
+        # Create new instance of metricCalc class to contain parameters
+        suiteCalc = metricSuiteCalc(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, lccFilePath,
+                                    ";".join(lcpClasses), firstOutTable, processingCellSize, snapRaster, optionalFieldGroups,
+                                    metricConst, logFile)
+        suiteCalc.suiteClassNames = [mBaseName for mBaseName in suiteCalc.metricsBaseNameList if mBaseName]
+        suiteCalc.extentList = [inReportingUnitFeature, inLandCoverGrid]
+        suiteCalc.cleanupList = [] # This is an empty list object that will contain tuples of the form (function, arguments) as needed for cleanup
+        if suiteCalc.saveIntermediates:
+            suiteCalc.cleanupList.append("KeepIntermediates")  # add this string as the first item in the cleanupList to prevent cleanups
+        else:
+            suiteCalc.cleanupList.append((arcpy.AddMessage,("Cleaning up intermediate datasets",)))
+
+        # using the output linear units, get the conversion factor to convert the tabulateArea area measures to square meters
+        outputLinearUnits = settings.getOutputLinearUnits(inLandCoverGrid)
+        try:
+            suiteCalc.conversionFactor = conversion.getSqMeterConversionFactor(outputLinearUnits)
+        except:
+            raise errors.attilaException(errorConstants.linearUnitConversionError)
+
+        # Run Calculation
+        suiteCalc.run()
+
+    except Exception as e:
+        if logFile:
+            # COMPLETE LOGFILE
+            logFile.write("\nSomething went wrong.\n\n")
+            logFile.write("Python Traceback Message below:")
+            logFile.write(traceback.format_exc())
+        
+        errors.standardErrorHandling(e, logFile)
+
+    finally:
+        if suiteCalc and not suiteCalc.cleanupList[0] == "KeepIntermediates":
+            for (function,arguments) in suiteCalc.cleanupList:
+                # Flexibly executes any functions added to cleanup array.
+                function(*arguments)
+            AddMsg("Clean up complete", 0)
+
+        setupAndRestore.standardRestore(logFile)
+
+
 def runPopulationDensityCalculator(toolPath, inReportingUnitFeature, reportingUnitIdField, inCensusFeature, inPopField, outTable,
                                    popChangeYN, inCensusFeature2, inPopField2, optionalFieldGroups):
     """ Interface for script executing Population Density Metrics """
@@ -2599,7 +2875,8 @@ def runPopulationLandCoverViews(toolPath, inReportingUnitFeature, reportingUnitI
             # process the inLandCoverGrid for the selected class
             AddMsg(f"{timer.now()} Determining population with minimal views of Class:{m.upper()}.", 0, logFile) 
             viewGrid = raster.getPatchViewGrid(m, classValuesList, excludedValuesList, inLandCoverGrid, landCoverValues, 
-                                          viewRadius, conValues, minPatchSize, timer, saveIntermediates, metricConst, logFile)
+                                          viewRadius, conValues, minPatchSize, timer, saveIntermediates, metricConst, logFile,
+                                          cleanupList)
   
             
             if viewGrid.maximum == None:
@@ -3085,116 +3362,167 @@ def runNeighborhoodProportions(toolPath, inLandCoverGrid, _lccName, lccFilePath,
                     burnInGrid.save(scratchName)
                     AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}")
 
-        # Run metric calculate for each metric in list
-        for m in metricsBaseNameList:
-            # get the grid codes for this specified metric
-            classValuesList = lccClassesDict[m].uniqueValueIds.intersection(landCoverValues)
+        # the NumPy focal engine reads the land cover cells as they are, so the Spatial Analyst tools are used when the
+        # processing environments would clip, resample, mask, shift or project the grid
+        focalEngine = globalConstants.focalEngine
+        if focalEngine == "NUMPY":
+            envConflicts = raster.getArrayEnvironmentConflicts(Raster(inLandCoverGrid))
+            if envConflicts:
+                AddMsg(f"{timer.now()} The {', '.join(envConflicts)} environment settings change the land cover grid. "
+                       f"Calculating the neighborhood sums with the Spatial Analyst tools.", 0, logFile)
+                focalEngine = "ARCPY"
+
+        focalRastersDict = {}
+        if focalEngine == "NUMPY":
+            # the neighborhood sums of all selected classes are computed together in one pass over the land cover grid
+            classValuesDict = dict((m, lccClassesDict[m].uniqueValueIds.intersection(landCoverValues)) for m in metricsBaseNameList)
+            AddMsg(f"{timer.now()} Calculating the proportion of each land cover class within {inNeighborhoodSize} x {inNeighborhoodSize} cell neighborhood.", 0, logFile)
+            # the percent zones are binned in the same pass unless excluded areas are burned into the proportions first
+            zoneBinStep = int(zoneBin_str) if createZones == "true" and burnIn != "true" else None
+            focalRastersDict = raster.getNeighborhoodProportionRasters(inLandCoverGrid, classValuesDict, inNeighborhoodSize,
+                                                                       timer, logFile, saveIntermediates, zoneBinStep)
+
+        focalRasters = None
+        try:
+            # Run metric calculate for each metric in list
+            for m in metricsBaseNameList:
+                # get the grid codes for this specified metric
+                classValuesList = lccClassesDict[m].uniqueValueIds.intersection(landCoverValues)
  
-            # process the inLandCoverGrid for the selected class
-            AddMsg(f"{timer.now()} Processing neighborhood proportions grid for {m.upper()}.", 0, logFile)
+                # process the inLandCoverGrid for the selected class
+                AddMsg(f"{timer.now()} Processing neighborhood proportions grid for {m.upper()}.", 0, logFile)
             
-            maxCellCount = pow(int(inNeighborhoodSize), 2)
-                 
-            # create class (value = 1) / other (value = 0) / excluded grid (value = 0) raster
-            # define the reclass values
-            classValue = 1
-            excludedValue = 0
-            otherValue = 0
-            newValuesList = [classValue, excludedValue, otherValue]
-            
-            # generate a reclass list where each item in the list is a two item list: the original grid value, and the reclass value
-            reclassPairs = raster.getInOutOtherReclassPairs(landCoverValues, classValuesList, excludedValuesList, newValuesList)
-              
-            AddMsg(f"{timer.now()} Reclassifying selected {m.upper()} land cover class to 1. All other values = 0.", 0, logFile)
-            log.logArcpy("arcpy.sa.Reclassify",(inLandCoverGrid,"VALUE", RemapValue(reclassPairs)), logFile)
-            reclassGrid = arcpy.sa.Reclassify(inLandCoverGrid,"VALUE", RemapValue(reclassPairs))
-            
-            AddMsg(f"{timer.now()} Performing focal SUM on reclassified raster using {inNeighborhoodSize} x {inNeighborhoodSize} cell neighborhood.", 0, logFile)
-            neighborhood = arcpy.sa.NbrRectangle(int(inNeighborhoodSize), int(inNeighborhoodSize), "CELL")
-            log.logArcpy("arcpy.sa.FocalStatistics", (f'reclassGrid == {classValue}', neighborhood, "SUM", "NODATA"), logFile)
-            nbrCntGrid = arcpy.sa.FocalStatistics(reclassGrid == classValue, neighborhood, "SUM", "NODATA")
+                maxCellCount = pow(int(inNeighborhoodSize), 2)
+                nbrZoneGrid = None
+            
+                if focalEngine == "NUMPY":
+                    focalRasters = focalRastersDict.pop(m)
+                    proximityGrid, nbrCntGrid, nbrZoneGrid = focalRasters
+                else:
+                    # create class (value = 1) / other (value = 0) / excluded grid (value = 0) raster
+                    # define the reclass values
+                    classValue = 1
+                    excludedValue = 0
+                    otherValue = 0
+                    newValuesList = [classValue, excludedValue, otherValue]
                 
-            AddMsg(f"{timer.now()} Calculating the proportion of land cover class within {inNeighborhoodSize} x {inNeighborhoodSize} cell neighborhood.", 0, logFile)
-            log.logArcpy("arcpy.sa.RasterCalculator",("[nbrCntGrid]", ["x"], (f' (x / {maxCellCount}) * 100') ), logFile)
-            proximityGrid = arcpy.sa.RasterCalculator([nbrCntGrid], ["x"], (f' (x / {maxCellCount}) * 100') )
-            
-            # get output grid name
-            namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxRasterOutName}"
-            if overWrite == "false":
-                namePrefix = f"{namePrefix}_"
-            proximityGridName = files.getRasterName(namePrefix)
-            
-            if burnIn == "true":
-                AddMsg(f"{timer.now()} Burning excluded areas into proportions grid.", 0, logFile)
-                delimitedVALUE = arcpy.AddFieldDelimiters(burnInGrid,"VALUE")
-                whereClause = delimitedVALUE+" = 0"
-                log.logArcpy("arcpy.sa.Con",(burnInGrid, proximityGridName, burnInGrid, whereClause), logFile)
-                proximityGrid = arcpy.sa.Con(burnInGrid, proximityGrid, burnInGrid, whereClause)
-        
-        
-            # Add output grid name to the list of features to add to the Contents pane
-            datasetList = arcpy.ListDatasets()
-            if proximityGridName in datasetList:
-                arcpy.Delete_management(proximityGridName)
-            AddMsg(f"{timer.now()} Saving proportions grid: {basename(proximityGridName)}.", 0, logFile)
-            try:
-                proximityGrid.save(proximityGridName)
-            except:
-                raise errors.attilaException(errorConstants.rasterOutputFormatError) 
-            AddMsg(f"{timer.now()} Save proportions grid complete: {basename(proximityGridName)}.", 0, logFile)
-            addToActiveMap.append(proximityGridName)
+                    # generate a reclass list where each item in the list is a two item list: the original grid value, and the reclass value
+                    reclassPairs = raster.getInOutOtherReclassPairs(landCoverValues, classValuesList, excludedValuesList, newValuesList)
                   
-            # save the intermediate raster if save intermediates option has been chosen 
-            if saveIntermediates:
-                namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxFocalSumOutName}"
-                if overWrite == "false":
-                    namePrefix = f"{namePrefix}_"
-                scratchName = files.getRasterName(namePrefix)  
-                datasetList = arcpy.ListDatasets()
-                if scratchName in datasetList:
-                    arcpy.Delete_management(scratchName)
-                AddMsg(f"{timer.now()} Saving intermediate grid: {basename(scratchName)}.", 0, logFile)
-                try:
-                    nbrCntGrid.save(scratchName)
-                except:
-                    raise errors.attilaException(errorConstants.rasterOutputFormatError)
-                AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}.", 0, logFile)
-  
-            # convert neighborhood proportions raster to zones if createZones is selected
-            if createZones == "true":
-                # To reclass the proportions grid, the max grid value is 100
-                maxGridValue = 100
-        
-                # Set up break points to reclass proximity grid into % classes
-                reclassBins = raster.getRemapBinsByPercentStep(maxGridValue, int(zoneBin_str))
-                rngRemap = RemapRange(reclassBins)
+                    AddMsg(f"{timer.now()} Reclassifying selected {m.upper()} land cover class to 1. All other values = 0.", 0, logFile)
+                    log.logArcpy("arcpy.sa.Reclassify",(inLandCoverGrid,"VALUE", RemapValue(reclassPairs)), logFile)
+                    reclassGrid = arcpy.sa.Reclassify(inLandCoverGrid,"VALUE", RemapValue(reclassPairs))
                 
-                time.sleep(1) # A small pause is needed here between quick successive timer calls
-                AddMsg(f"{timer.now()} Reclassifying proportions grid into {zoneBin_str}% breaks.", 0, logFile)
-                # nbrZoneGrid = Reclassify(proximityGrid, "VALUE", rngRemap)
-                # The simple reclassify operation above, often leaves the ESRI default layer name in the saved 
-                # nbrZoneGrid when the land cover raster is relatively small. Although the nbrZoneGrid appears to have the
-                # correct name in the catalog, when the raster is added to a map, the layer name is displayed in the TOC
-                # instead of the saved raster name (e.g., Reclass_NI_91 instead of NI_9_Zone0). The technique below appears
-                # to alleviate that problem without adding substantial time to the reclassification operation.
-                nbrZoneGrid = (Reclassify(proximityGrid, "VALUE", rngRemap) * 1)
-                if logFile:
-                    # capture the reclass operation to the log file. The usual logArcpy technique won't work
-                    logFile.write(f'{timer.now()}   [CMD] (Reclassify({proximityGridName}, VALUE, {rngRemap}) * 1)\n')
-                namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxZoneRaserOutName}"
+                    AddMsg(f"{timer.now()} Performing focal SUM on reclassified raster using {inNeighborhoodSize} x {inNeighborhoodSize} cell neighborhood.", 0, logFile)
+                    neighborhood = arcpy.sa.NbrRectangle(int(inNeighborhoodSize), int(inNeighborhoodSize), "CELL")
+                    log.logArcpy("arcpy.sa.FocalStatistics", (f'reclassGrid == {classValue}', neighborhood, "SUM", "NODATA"), logFile)
+                    nbrCntGrid = arcpy.sa.FocalStatistics(reclassGrid == classValue, neighborhood, "SUM", "NODATA")
+                    
+                    AddMsg(f"{timer.now()} Calculating the proportion of land cover class within {inNeighborhoodSize} x {inNeighborhoodSize} cell neighborhood.", 0, logFile)
+                    log.logArcpy("arcpy.sa.RasterCalculator",("[nbrCntGrid]", ["x"], (f' (x / {maxCellCount}) * 100') ), logFile)
+                    proximityGrid = arcpy.sa.RasterCalculator([nbrCntGrid], ["x"], (f' (x / {maxCellCount}) * 100') )
+            
+                # get output grid name
+                namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxRasterOutName}"
                 if overWrite == "false":
                     namePrefix = f"{namePrefix}_"
-                scratchName = files.getRasterName(namePrefix)
+                proximityGridName = files.getRasterName(namePrefix)
+            
+                if burnIn == "true":
+                    AddMsg(f"{timer.now()} Burning excluded areas into proportions grid.", 0, logFile)
+                    delimitedVALUE = arcpy.AddFieldDelimiters(burnInGrid,"VALUE")
+                    whereClause = delimitedVALUE+" = 0"
+                    log.logArcpy("arcpy.sa.Con",(burnInGrid, proximityGridName, burnInGrid, whereClause), logFile)
+                    proximityGrid = arcpy.sa.Con(burnInGrid, proximityGrid, burnInGrid, whereClause)
+        
+        
+                # Add output grid name to the list of features to add to the Contents pane
                 datasetList = arcpy.ListDatasets()
-                if scratchName in datasetList:
-                    arcpy.Delete_management(scratchName)
+                if proximityGridName in datasetList:
+                    arcpy.Delete_management(proximityGridName)
+                AddMsg(f"{timer.now()} Saving proportions grid: {basename(proximityGridName)}.", 0, logFile)
                 try:
-                    AddMsg(f"{timer.now()} Saving {zoneBin_str}% breaks zone raster: {basename(scratchName)}", 0, logFile)
-                    nbrZoneGrid.save(scratchName)
+                    proximityGrid.save(proximityGridName)
                 except:
-                    raise errors.attilaException(errorConstants.rasterOutputFormatError)
-                AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}.", 0, logFile)
-                addToActiveMap.append(scratchName)
+                    raise errors.attilaException(errorConstants.rasterOutputFormatError) 
+                if focalEngine == "NUMPY":
+                    # grids created from NumPy arrays carry no spatial reference
+                    arcpy.management.DefineProjection(proximityGridName, Raster(inLandCoverGrid).spatialReference)
+                AddMsg(f"{timer.now()} Save proportions grid complete: {basename(proximityGridName)}.", 0, logFile)
+                addToActiveMap.append(proximityGridName)
+                  
+                # save the intermediate raster if save intermediates option has been chosen 
+                if saveIntermediates:
+                    namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxFocalSumOutName}"
+                    if overWrite == "false":
+                        namePrefix = f"{namePrefix}_"
+                    scratchName = files.getRasterName(namePrefix)  
+                    datasetList = arcpy.ListDatasets()
+                    if scratchName in datasetList:
+                        arcpy.Delete_management(scratchName)
+                    AddMsg(f"{timer.now()} Saving intermediate grid: {basename(scratchName)}.", 0, logFile)
+                    try:
+                        nbrCntGrid.save(scratchName)
+                    except:
+                        raise errors.attilaException(errorConstants.rasterOutputFormatError)
+                    if focalEngine == "NUMPY":
+                        arcpy.management.DefineProjection(scratchName, Raster(inLandCoverGrid).spatialReference)
+                    AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}.", 0, logFile)
+  
+                # convert neighborhood proportions raster to zones if createZones is selected
+                if createZones == "true":
+                    # the NumPy focal engine may have binned the zones along with the proportions
+                    zonesFromArray = nbrZoneGrid is not None
+                    if not zonesFromArray:
+                        # To reclass the proportions grid, the max grid value is 100
+                        maxGridValue = 100
+            
+                        # Set up break points to reclass proximity grid into % classes
+                        reclassBins = raster.getRemapBinsByPercentStep(maxGridValue, int(zoneBin_str))
+                        rngRemap = RemapRange(reclassBins)
+                    
+                        time.sleep(1) # A small pause is needed here between quick successive timer calls
+                        AddMsg(f"{timer.now()} Reclassifying proportions grid into {zoneBin_str}% breaks.", 0, logFile)
+                        # nbrZoneGrid = Reclassify(proximityGrid, "VALUE", rngRemap)
+                        # The simple reclassify operation above, often leaves the ESRI default layer name in the saved 
+                        # nbrZoneGrid when the land cover raster is relatively small. Although the nbrZoneGrid appears to have the
+                        # correct name in the catalog, when the raster is added to a map, the layer name is displayed in the TOC
+                        # instead of the saved raster name (e.g., Reclass_NI_91 instead of NI_9_Zone0). The technique below appears
+                        # to alleviate that problem without adding substantial time to the reclassification operation.
+                        nbrZoneGrid = (Reclassify(proximityGrid, "VALUE", rngRemap) * 1)
+                        if logFile:
+                            # capture the reclass operation to the log file. The usual logArcpy technique won't work
+                            logFile.write(f'{timer.now()}   [CMD] (Reclassify({proximityGridName}, VALUE, {rngRemap}) * 1)\n')
+                    namePrefix = f"{m.upper()}_{inNeighborhoodSize}{metricConst.proxZoneRaserOutName}"
+                    if overWrite == "false":
+                        namePrefix = f"{namePrefix}_"
+                    scratchName = files.getRasterName(namePrefix)
+                    datasetList = arcpy.ListDatasets()
+                    if scratchName in datasetList:
+                        arcpy.Delete_management(scratchName)
+                    try:
+                        AddMsg(f"{timer.now()} Saving {zoneBin_str}% breaks zone raster: {basename(scratchName)}", 0, logFile)
+                        nbrZoneGrid.save(scratchName)
+                    except:
+                        raise errors.attilaException(errorConstants.rasterOutputFormatError)
+                    if zonesFromArray:
+                        arcpy.management.DefineProjection(scratchName, Raster(inLandCoverGrid).spatialReference)
+                    AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}.", 0, logFile)
+                    addToActiveMap.append(scratchName)
+            
+                if focalEngine == "NUMPY":
+                    # delete the scratch .tif files streamed by the focal engine now that their grids are saved
+                    scratchTiffs = [aRaster.catalogPath for aRaster in focalRasters if aRaster is not None]
+                    proximityGrid = nbrCntGrid = nbrZoneGrid = focalRasters = None
+                    for scratchTiff in scratchTiffs:
+                        arcpy.Delete_management(scratchTiff)
+        finally:
+            # delete the scratch .tif files of the NumPy focal engine that the loop did not get to
+            proximityGrid = nbrCntGrid = nbrZoneGrid = None
+            for leftRasters in [focalRasters] + list(focalRastersDict.values()):
+                for aRaster in leftRasters or ():
+                    if aRaster is not None:
+                        arcpy.Delete_management(aRaster.catalogPath)
  
      
         if logFile:
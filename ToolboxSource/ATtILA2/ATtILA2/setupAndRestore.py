@@ -18,6 +18,10 @@ _tempEnvironment5 = ""
 _tempEnvironment6 = ""
 _tempEnvironment7 = ""
 
+# The Parallel Processing Factor set by the user before standardSetup disabled it. ATtILA's own parallel code (e.g., the
+# tiled NUMPY zonal engine) uses it to size its process pool.
+_requestedParallelProcessingFactor = None
+
 
 def standardSetup(snapRaster, processingCellSize, fallBackDirectory, itemDescriptionPairList=[], logFile=None):
     """ Standard setup for executing metrics. """
@@ -51,6 +55,8 @@ def standardSetup(snapRaster, processingCellSize, fallBackDirectory, itemDescrip
     env.outputZFlag = "Disabled" 
     
     # Until the Pairwise geoprocessing tools can be incorporated into ATtILA, disable the Parallel Processing Factor if the environment is set
+    global _requestedParallelProcessingFactor
+    _requestedParallelProcessingFactor = env.parallelProcessingFactor
     currentFactor = str(env.parallelProcessingFactor)
     if currentFactor == 'None' or currentFactor == '0':
         pass
@@ -72,6 +78,15 @@ def standardSetup(snapRaster, processingCellSize, fallBackDirectory, itemDescrip
         
     return itemTuples
 
+
+def getRequestedParallelProcessingFactor():
+    """ Return the Parallel Processing Factor that was set before standardSetup disabled it for the geoprocessing tools """
+    
+    if _requestedParallelProcessingFactor is None:
+        return env.parallelProcessingFactor
+    
+    return _requestedParallelProcessingFactor
+
     
 def standardRestore(logFile=None):
     """ Standard restore for executing metrics. """
@@ -9,8 +9,10 @@ from ATtILA2 import errors
 from ATtILA2.constants import errorConstants
 from . import messages
 from . import files
+from . import polygons
 from . import vector
 from . import table
+from . import tablewriter
 from .messages import AddMsg
 from .log import logArcpy
 from os.path import basename
@@ -60,9 +62,84 @@ def getMetricPercentAreaAndSum(metricGridCodesList, tabAreaDict, effectiveAreaSu
     return metricPercentArea, metricAreaSum
 
 
+def getClassMembershipMatrix(lccClassesDict, metricsBaseNameList, tabAreaValues, excludedValues):
+    """ Creates a boolean matrix that flags the tabulated grid values belonging to each metric class
+
+    **Description:**
+
+        Each column of the matrix represents one metric class and each row one of the tabulated grid values. A cell is
+        True when the grid value is one of the class's grid codes and is not tagged as excluded in the lcc file. A matrix
+        product of a zones x values area matrix with this matrix gives the area of every class in every zone.
+
+    **Arguments:**
+
+        * *lccClassesDict* - dictionary of metric class values 
+                        (e.g., classValuesDict['for'].uniqueValueIds = (41, 42, 43))
+        * *metricsBaseNameList* - a list of metric BaseNames parsed from the 'Metrics to run' input 
+        * *tabAreaValues* - list of the grid values in the order of the area matrix columns
+        * *excludedValues* - a set of grid values tagged in the xml lcc file to be excluded from the total area calculations
+
+    **Returns:**
+
+        * boolean NumPy array (values x classes)
+
+    """
+    import numpy as np
+
+    membershipMatrix = np.zeros((len(tabAreaValues), len(metricsBaseNameList)), dtype=bool)
+    for j, mBaseName in enumerate(metricsBaseNameList):
+        metricGridCodes = lccClassesDict[mBaseName].uniqueValueIds
+        for i, aValueID in enumerate(tabAreaValues):
+            if aValueID in metricGridCodes and aValueID not in excludedValues:
+                membershipMatrix[i, j] = True
+
+    return membershipMatrix
+
+
+def getLandCoverProportionArrays(lccClassesDict, metricsBaseNameList, tabAreaValues, areaMatrix, excludedValues):
+    """ Calculates the area and the percentage of effective area of each metric class for all zones at once
+
+    **Description:**
+
+        The vectorized counterpart of getMetricPercentAreaAndSum. Class areas are found with a single matrix product
+        of the area matrix and the class membership matrix. Zones where every grid value is excluded receive a
+        percentage of 0.
+
+    **Arguments:**
+
+        * *lccClassesDict* - dictionary of metric class values 
+        * *metricsBaseNameList* - a list of metric BaseNames parsed from the 'Metrics to run' input 
+        * *tabAreaValues* - list of the grid values in the order of the area matrix columns
+        * *areaMatrix* - two dimensional NumPy array of areas (zones x values)
+        * *excludedValues* - a set of grid values tagged in the xml lcc file to be excluded from the total area calculations
+
+    **Returns:**
+
+        * NumPy array (zones x classes) of class percentages of the effective area
+        * NumPy array (zones x classes) of class areas
+        * NumPy array of the effective area of each zone
+        * NumPy array of the excluded area of each zone
+
+    """
+    import numpy as np
+
+    excludedMask = np.array([aValueID in excludedValues for aValueID in tabAreaValues], dtype=bool)
+    effectiveAreas = areaMatrix[:, ~excludedMask].sum(axis=1)
+    excludedAreas = areaMatrix[:, excludedMask].sum(axis=1)
+
+    membershipMatrix = getClassMembershipMatrix(lccClassesDict, metricsBaseNameList, tabAreaValues, excludedValues)
+    classAreas = areaMatrix @ membershipMatrix.astype(np.float64)
+
+    classPercents = np.zeros_like(classAreas)
+    hasEffectiveArea = effectiveAreas > 0
+    classPercents[hasEffectiveArea] = (classAreas[hasEffectiveArea] / effectiveAreas[hasEffectiveArea, None]) * 100
+
+    return classPercents, classAreas, effectiveAreas, excludedAreas
+
+
 def landCoverProportions(lccClassesDict, metricsBaseNameList, optionalGroupsList, metricConst, outIdField, newTable, 
                          tabAreaTable, metricsFieldnameDict, zoneAreaDict, reportingUnitAreaDict, zoneValueDict=False,
-                         conversionFactor=None):
+                         conversionFactor=None, vectorized=True):
     """ Creates *outTable* populated with land cover proportions metrics
 
     **Description:**
@@ -95,12 +172,21 @@ def landCoverProportions(lccClassesDict, metricsBaseNameList, optionalGroupsList
                         values are equal to those in the zoneAreaDict.
         * *zoneValueDict* - dictionary with a value for an input polygon feature keyed to the polygon's ID value.
                         Used in lcc class area per value calculations (e.g. square meters of forest per person).
+        * *conversionFactor* - multiplier to convert the tabulated areas to square meters for the per value fields
+        * *vectorized* - if True, compute all zones and classes at once from the tabulate area matrix. If False,
+                        process the tabulate area table row by row.
 
     **Returns:**
 
         * None
 
     """
+    
+    if vectorized:
+        landCoverProportionsByMatrix(lccClassesDict, metricsBaseNameList, optionalGroupsList, metricConst, outIdField,
+                                     newTable, tabAreaTable, metricsFieldnameDict, zoneAreaDict, reportingUnitAreaDict,
+                                     zoneValueDict, conversionFactor)
+        return
 
     try:      
         # create the cursor to add data to the output table
@@ -130,10 +216,10 @@ def landCoverProportions(lccClassesDict, metricsBaseNameList, optionalGroupsList
         zeroCountWarning = set()
         missingCountWarning = set()
 
+        excludedValues = tabAreaTable._excludedValues
         for tabAreaTableRow in tabAreaTable:
             tabAreaDict = tabAreaTableRow.tabAreaDict
             effectiveArea = tabAreaTableRow.effectiveArea
-            excludedValues = tabAreaTableRow._excludedValues
 
             # initiate a row to add to the metric output table
             outTableRow = outTableRows.newRow()
@@ -247,6 +333,108 @@ def landCoverProportions(lccClassesDict, metricsBaseNameList, optionalGroupsList
             pass
 
 
+def landCoverProportionsByMatrix(lccClassesDict, metricsBaseNameList, optionalGroupsList, metricConst, outIdField,
+                                 newTable, tabAreaTable, metricsFieldnameDict, zoneAreaDict, reportingUnitAreaDict,
+                                 zoneValueDict=False, conversionFactor=None):
+    """ Vectorized form of landCoverProportions
+
+    **Description:**
+
+        Reads the zones x values area matrix from *tabAreaTable* once, computes every class area, percentage, per value
+        and QA field for all zones with array operations, and then inserts the finished rows into *newTable*. Arguments
+        are the same as for landCoverProportions.
+
+    **Returns:**
+
+        * None
+
+    """
+    import numpy as np
+
+    zoneIdValues, tabAreaValues, areaMatrix = tabAreaTable.getAreaMatrix()
+    excludedValues = tabAreaTable._excludedValues
+
+    classPercents, classAreas, effectiveAreas, excludedAreas = getLandCoverProportionArrays(lccClassesDict,
+                                                                                            metricsBaseNameList,
+                                                                                            tabAreaValues, areaMatrix,
+                                                                                            excludedValues)
+    totalAreas = effectiveAreas + excludedAreas
+
+    # collect the output values field by field; each column holds one value per zone
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(zoneIdValues)
+
+    if zoneValueDict:
+        # NaN marks reporting units that do not overlap the input population dataset
+        zoneValues = np.array([zoneValueDict.get(zoneId, np.nan) for zoneId in zoneIdValues], dtype=np.float64)
+        missingValue = np.isnan(zoneValues)
+        zeroValue = ~missingValue & ~(zoneValues >= 1)
+
+    for j, mBaseName in enumerate(metricsBaseNameList):
+        outTableWriter.addColumn(metricsFieldnameDict[mBaseName][0], classPercents[:, j])
+
+        if globalConstants.metricAddName in optionalGroupsList:
+            areaSuffix = globalConstants.areaFieldParameters[0]
+            outTableWriter.addColumn(metricsFieldnameDict[mBaseName][0]+areaSuffix, classAreas[:, j])
+
+        # add per value (e.g., capita) calculations. Values below 1 would assign more land cover to the individual than
+        # exists in the reporting unit, so they receive -99999; zones without a value receive -55555
+        if zoneValueDict:
+            classSqM = classAreas[:, j] * conversionFactor
+            with np.errstate(divide='ignore', invalid='ignore'):
+                perValueCalc = np.where(zeroValue, -99999, np.where(missingValue, -55555, classSqM / zoneValues))
+
+            outTableWriter.addColumn(metricsFieldnameDict[mBaseName][1]+metricConst.perCapitaSuffix, perValueCalc)
+            outTableWriter.addColumn(metricsFieldnameDict[mBaseName][1]+metricConst.meterSquaredSuffix, classSqM)
+
+    # add QACheck calculations/values
+    if zoneAreaDict:
+        qaCheckFlds = metricConst.qaCheckFieldParameters
+        zoneAreas = np.array([zoneAreaDict[zoneId] for zoneId in zoneIdValues], dtype=np.float64)
+
+        # process standard QA Fields. Standard QA fields include: OVER, TOTA, EFFA, EXCA.
+        outTableWriter.addColumn(qaCheckFlds[0][0], (totalAreas / zoneAreas) * 100)
+        outTableWriter.addColumn(qaCheckFlds[1][0], totalAreas)
+        outTableWriter.addColumn(qaCheckFlds[2][0], effectiveAreas)
+        outTableWriter.addColumn(qaCheckFlds[3][0], excludedAreas)
+
+        # process non-standard QA fields (e.g., rTOTA, rEFFA)
+        if len(qaCheckFlds) > 4 and metricConst.pctBufferName:
+            qaFieldNames = [aFldParams[0] for aFldParams in qaCheckFlds]
+            buffFieldNames = [fldName for fldName in qaFieldNames if fldName.startswith(metricConst.pctBufferName)]
+            totaPctFieldNames = [fldName for fldName in qaFieldNames if fldName.startswith(metricConst.totaPctName)]
+
+            if buffFieldNames:
+                if reportingUnitAreaDict:
+                    ruEffectiveAreas = np.array([reportingUnitAreaDict[zoneId][1] for zoneId in zoneIdValues],
+                                                dtype=np.float64)
+                    ruTotalAreas = np.array([reportingUnitAreaDict[zoneId][0] for zoneId in zoneIdValues],
+                                            dtype=np.float64)
+                else:
+                    ruEffectiveAreas = zoneAreas
+                    ruTotalAreas = zoneAreas
+
+                # calculate the percentage of effective area in the reporting unit to the effective area of the entire reporting unit
+                effaPercentCalc = np.zeros_like(effectiveAreas)
+                hasRuEffectiveArea = ruEffectiveAreas > 0
+                effaPercentCalc[hasRuEffectiveArea] = (effectiveAreas[hasRuEffectiveArea] /
+                                                       ruEffectiveAreas[hasRuEffectiveArea]) * 100
+                outTableWriter.addColumn(buffFieldNames[-1], effaPercentCalc)
+
+                # calculate the percentage of the reporting unit that is in the buffer area
+                outTableWriter.addColumn(totaPctFieldNames[-1], (totalAreas / ruTotalAreas) * 100)
+
+    # insert all rows in one bulk write
+    outTableWriter.insertRows()
+
+    # report to the user if null values for troublesome reporting units were inserted into the output table 
+    if zoneValueDict:
+        if zeroValue.any():
+            arcpy.AddWarning("Zero population was found in %s reporting units. A value of -99999 was assigned to the Per Capita fields for those records." % int(zeroValue.sum()))        
+        if missingValue.any():
+            arcpy.AddWarning("Population data was missing for %s reporting units. A value of -55555 was assigned to the Per Capita fields for those records." % int(missingValue.sum())) 
+
+
 # def landCoverProportionsOLD(lccClassesDict, metricsBaseNameList, optionalGroupsList, metricConst, outIdField, newTable, 
 #                          tabAreaTable, metricsFieldnameDict, zoneAreaDict):
 #     """ Creates *outTable* populated with land cover proportions metrics
@@ -426,19 +614,20 @@ def getCoefficientPercentage(tabAreaDict, lccValuesDict, coeffId):
     return coefficientCalculation
 
 
-def landCoverCoefficientCalculator(lccValuesDict, metricsBaseNameList, optionalGroupsList, metricConst, outIdField, 
+def landCoverCoefficientCalculator(lccObj, metricsBaseNameList, optionalGroupsList, metricConst, outIdField, 
                                    newTable, tabAreaTable, metricsFieldnameDict, zoneAreaDict, conversionFactor):
     """ Creates *outTable* populated with land cover coefficient metrics
 
     **Description:**
 
-        Creates *outTable* populated with land cover coefficient metrics...
+        Creates *outTable* populated with land cover coefficient metrics. The zones x values area matrix of the 
+        tabulate area table is multiplied by the LCC file's values x coefficients matrix, which computes the weighted 
+        area of every selected coefficient for every reporting unit in one matrix product. The results match 
+        getCoefficientPerUnitArea and getCoefficientPercentage.
 
     **Arguments:**
 
-        * *lccValuesDict* - dictionary with all the individual VALUES and their attributes supplied in the LCC file 
-                        (e.g., lccValuesDict['21'].name = "Developed, Open Space";
-                               lccValuesDict['21'].getCoefficientValueById("NITROGEN") = 9.25)
+        * *lccObj* - the LandCoverClassification object holding the coefficient values for each grid value
         * *metricsBaseNameList* - a list of metric BaseNames parsed from the 'Metrics to run' input 
                         (e.g., [for, agt, shrb, devt] or [NITROGEN, IMPERVIOUS])
         * *optionalGroupsList* - list of the selected options parsed from the 'Select options' input
@@ -458,55 +647,43 @@ def landCoverCoefficientCalculator(lccValuesDict, metricsBaseNameList, optionalG
         * None
 
     """
+    import numpy as np
 
-    try:
-        # create the cursor to add data to the output table
-        outTableRows = arcpy.InsertCursor(newTable)        
-
-        for tabAreaTableRow in tabAreaTable:
-
-            # initiate a row to add to the metric output table
-            outTableRow = outTableRows.newRow()
-            # set the reporting unit id value in the output row
-            outTableRow.setValue(outIdField.name, tabAreaTableRow.zoneIdValue)
-
-            # compute the amount of metric item (e.g., NITROGEN) per unit area using the supplied coefficients   
-            for mBaseName in metricsBaseNameList:
-                # get coefficient per unit area from the tabulate area table
-                if mBaseName in metricConst.perUnitAreaMetrics:
-                    coefficientCalculation = getCoefficientPerUnitArea(tabAreaTableRow.tabAreaDict, lccValuesDict, 
-                                                                       mBaseName, conversionFactor)
-                elif mBaseName in metricConst.percentageMetrics:
-                    coefficientCalculation = getCoefficientPercentage(tabAreaTableRow.tabAreaDict, lccValuesDict,
-                                                                      mBaseName)
-                else:
-                    arcpy.AddWarning("Procedure for %s undefined. Tell the programmer to add it to metricConstants.py" % 
-                                     mBaseName)
-
-                # add the calculation to the output row
-                outTableRow.setValue(metricsFieldnameDict[mBaseName][0], coefficientCalculation)
+    zoneIdValues, tabAreaValues, areaMatrix = tabAreaTable.getAreaMatrix()
 
-            # add QACheck calculations/values to row
-            if globalConstants.qaCheckName in optionalGroupsList:
-                zoneArea = zoneAreaDict[tabAreaTableRow.zoneIdValue]
-                overlapCalc = ((tabAreaTableRow.totalArea)/zoneArea) * 100
+    # weighted area of each coefficient in each zone. Grid values not defined in the LCC file have a coefficient of 0
+    coefficientMatrix = lccObj.getCoefficientMatrix(tabAreaValues, metricsBaseNameList)
+    coefficientTotals = areaMatrix.dot(coefficientMatrix)
+    totalAreas = areaMatrix.sum(axis=1)
 
-                qaCheckFields = metricConst.qaCheckFieldParameters
-                outTableRow.setValue(qaCheckFields[0][0], overlapCalc)
+    # the per unit area metrics are amounts per hectare of the reporting unit. As both the weighted total and the
+    # total area are converted to hectares with the same factor, the conversion cancels out of the ratio.
+    safeTotals = np.where(totalAreas > 0, totalAreas, 1.0)
+    
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(zoneIdValues)
+
+    for j, mBaseName in enumerate(metricsBaseNameList):
+        coefficientTotal = coefficientTotals[:, j]
+        if mBaseName in metricConst.perUnitAreaMetrics:
+            coefficientCalculation = np.where(coefficientTotal > 0, coefficientTotal / safeTotals, 0)
+        elif mBaseName in metricConst.percentageMetrics:
+            coefficientCalculation = np.where(coefficientTotal > 0, (coefficientTotal / safeTotals) * 100, 0)
+        else:
+            arcpy.AddWarning("Procedure for %s undefined. Tell the programmer to add it to metricConstants.py" % 
+                             mBaseName)
+            continue
 
-            # commit the row to the output table
-            outTableRows.insertRow(outTableRow)
+        outTableWriter.addColumn(metricsFieldnameDict[mBaseName][0], coefficientCalculation)
 
-    finally:
+    # add QACheck calculations/values
+    if globalConstants.qaCheckName in optionalGroupsList:
+        zoneAreas = np.array([zoneAreaDict[zoneId] for zoneId in zoneIdValues], dtype=np.float64)
+        qaCheckFields = metricConst.qaCheckFieldParameters
+        outTableWriter.addColumn(qaCheckFields[0][0], (totalAreas / zoneAreas) * 100)
 
-        # delete cursor and row objects to remove locks on the data
-        try:
-            del outTableRows
-            del outTableRow
-            del tabAreaTable
-            del tabAreaTableRow
-        except:
-            pass
+    # write all rows to the output table in one bulk insert
+    outTableWriter.insertRows()
 
 
 def lineDensityCalculator(inLines,inAreas,areaUID,unitArea,outLines,densityField,inLengthField,lineClass="",iaField="",logFile=None):
@@ -590,49 +767,68 @@ def landCoverDiversity(metricConst, outIdField, newTable, tabAreaTable, zoneArea
 
     """
 
-    try:      
-        # create the cursor to add data to the output table
-        outTableRows = arcpy.InsertCursor(newTable)        
+    import numpy as np
 
-        for tabAreaTableRow in tabAreaTable:
+    # calculate the diversity indices (H, H_Prime, C, and S) for all reporting units at once
+    zoneIdValues, _tabAreaValues, areaMatrix = tabAreaTable.getAreaMatrix()
+    totalAreas = areaMatrix.sum(axis=1)
+    h, hp, s, c = getDiversityIndexArrays(areaMatrix, totalAreas)
 
-            # initiate a row to add to the metric output table
-            outTableRow = outTableRows.newRow()
+    # write all rows to the output table in one bulk insert
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(zoneIdValues)
+    outTableWriter.addColumn("S", s)
+    outTableWriter.addColumn("H", h)
+    outTableWriter.addColumn("H_Prime", hp)
+    outTableWriter.addColumn("C", c)
 
-            # set the reporting unit id value in the output row
-            outTableRow.setValue(outIdField.name, tabAreaTableRow.zoneIdValue)
+    # add QACheck calculations/values
+    if zoneAreaDict:
+        zoneAreas = np.array([zoneAreaDict[zoneId] for zoneId in zoneIdValues], dtype=np.float64)
+        qaCheckFlds = metricConst.qaCheckFieldParameters
+        outTableWriter.addColumn(qaCheckFlds[0][0], (totalAreas / zoneAreas) * 100)
+    outTableWriter.insertRows()
 
-            # calculate the diversity indices (H, H_Prime, C, and S) for the current reporting unit  
-            h,hp,s,c = getDiversityIndices(tabAreaTableRow.tabAreaDict, tabAreaTableRow.totalArea)
 
-            # populate metric fields
-            outTableRow.S = s
-            outTableRow.H = h
-            outTableRow.H_Prime = hp
-            outTableRow.C = c
+def getDiversityIndexArrays(areaMatrix, totalAreas):
+    """ Calculates the diversity indices for every row of a zones x values area matrix
 
-            # add QACheck calculations/values to row
-            if zoneAreaDict:
-                zoneArea = zoneAreaDict[tabAreaTableRow.zoneIdValue]
-                overlapCalc = ((tabAreaTableRow.totalArea)/zoneArea) * 100
+    **Description:**
 
-                qaCheckFlds = metricConst.qaCheckFieldParameters
-                outTableRow.setValue(qaCheckFlds[0][0], overlapCalc)
+        Array version of getDiversityIndices. Only values with an area greater than zero contribute to an index.
 
+    **Arguments:**
 
-            # commit the row to the output table
-            outTableRows.insertRow(outTableRow)
+        * *areaMatrix* - two dimensional NumPy array of areas (zones x values)
+        * *totalAreas* - NumPy array of the total area of each zone
 
-    finally:
+    **Returns:**
 
-        # delete cursor and row objects to remove locks on the data
-        try:
-            del outTableRows
-            del outTableRow
-            del tabAreaTable
-            del tabAreaTableRow
-        except:
-            pass
+        * tuple of NumPy arrays (H, Hprime, S, C), one value per zone
+
+    """
+    import numpy as np
+
+    present = areaMatrix > 0
+    S = np.count_nonzero(present, axis=1)
+
+    # proportion of each value in each zone; zones without any area keep proportions of 0
+    safeTotals = np.where(totalAreas > 0, totalAreas, 1.0)
+    P = np.where(present, areaMatrix / safeTotals[:, np.newaxis], 0.0)
+
+    #Calculate Shannon-Weiner Diversity equation (H) from sum(P * ln(P)) over the values present
+    logP = np.log(P, out=np.zeros_like(P), where=present)
+    H = -(P * logP).sum(axis=1)
+
+    #Calculate Shannon-Weiner Diversity equation (H prime)
+    Hprime = np.zeros_like(H)
+    multiple = S > 1
+    Hprime[multiple] = H[multiple] / np.log(S[multiple])
+
+    #Calculate the Simpson Index
+    C = (P * P).sum(axis=1)
+
+    return H, Hprime, S, C
 
 
 def getDiversityIndices(tabAreaDict, totalArea):
@@ -667,7 +863,8 @@ def getDiversityIndices(tabAreaDict, totalArea):
     return diversityIndices 
 
 
-def getCoreEdgeRatio(outIdField, newTable, tabAreaTable, metricsFieldnameDict, zoneAreaDict, metricConst, m):
+def getCoreEdgeRatio(outIdField, newTable, tabAreaTable, metricsFieldnameDict, zoneAreaDict, metricConst, m,
+                     outFieldNames=None):
     """ Creates *outTable* populated with land cover edge to area metrics
 
     **Description:**
@@ -688,6 +885,8 @@ def getCoreEdgeRatio(outIdField, newTable, tabAreaTable, metricsFieldnameDict, z
         * *metricConst* - an object with constants specific to the metric being run (lcp vs lcosp)
         * *m* - a metric BaseName parsed from the 'Metrics to run' input 
                         (e.g., [for, agt, shrb, devt] or [NITROGEN, IMPERVIOUS])
+        * *outFieldNames* - optional list of the ratio, core and edge field names (e.g., for an additional edge width).
+                        By default the names are built from *metricsFieldnameDict* and *metricConst*
 
 
     **Returns:**
@@ -697,168 +896,104 @@ def getCoreEdgeRatio(outIdField, newTable, tabAreaTable, metricsFieldnameDict, z
     """  
     CoreEdgeDict = {}
 
-    try:    
-        # Calculate Core/Edge metrics and place results in dictionary with zoneIdValue as the key
-        for tabAreaTableRow in tabAreaTable:
-            edgeArea = 0
-            if ("EDGE" in tabAreaTableRow.tabAreaDict):
-                edgeArea = tabAreaTableRow.tabAreaDict["EDGE"]
-            coreArea = 0
-            if ("CORE" in tabAreaTableRow.tabAreaDict):
-                coreArea = tabAreaTableRow.tabAreaDict["CORE"]
-            otherArea = 0
-            if ("OTHER" in tabAreaTableRow.tabAreaDict):
-                otherArea = tabAreaTableRow.tabAreaDict["OTHER"]
-            excludedArea = 0
-            if ("EXCLUDED" in tabAreaTableRow.tabAreaDict):
-                excludedArea = tabAreaTableRow.tabAreaDict["EXCLUDED"]
-
-            totalArea = edgeArea + coreArea + otherArea + excludedArea
-            effectiveArea = totalArea - excludedArea 
-
-            # test to make sure land cover values exist in this zoneId, then gather metrics
-            if effectiveArea > 0:
-                percentEdge = (edgeArea/effectiveArea)*100
-                percentCore = (coreArea/effectiveArea)*100
-                if edgeArea or coreArea > 0: # don't want to divide by zero
-                    CtoERatio = (edgeArea/(edgeArea + coreArea))*100
-                else:
-                    arcpy.AddWarning( m + " landuse doesn't exist in reporting unit feature " + str(tabAreaTableRow.zoneIdValue))
-                    CtoERatio = 0
+    # Calculate Core/Edge metrics and place results in dictionary with zoneIdValue as the key
+    for tabAreaTableRow in tabAreaTable:
+        edgeArea = 0
+        if ("EDGE" in tabAreaTableRow.tabAreaDict):
+            edgeArea = tabAreaTableRow.tabAreaDict["EDGE"]
+        coreArea = 0
+        if ("CORE" in tabAreaTableRow.tabAreaDict):
+            coreArea = tabAreaTableRow.tabAreaDict["CORE"]
+        otherArea = 0
+        if ("OTHER" in tabAreaTableRow.tabAreaDict):
+            otherArea = tabAreaTableRow.tabAreaDict["OTHER"]
+        excludedArea = 0
+        if ("EXCLUDED" in tabAreaTableRow.tabAreaDict):
+            excludedArea = tabAreaTableRow.tabAreaDict["EXCLUDED"]
+
+        totalArea = edgeArea + coreArea + otherArea + excludedArea
+        effectiveArea = totalArea - excludedArea 
+
+        # test to make sure land cover values exist in this zoneId, then gather metrics
+        if effectiveArea > 0:
+            percentEdge = (edgeArea/effectiveArea)*100
+            percentCore = (coreArea/effectiveArea)*100
+            if edgeArea or coreArea > 0: # don't want to divide by zero
+                CtoERatio = (edgeArea/(edgeArea + coreArea))*100
             else:
-                arcpy.AddWarning("All landuse is tagged as EXCLUDED in reporting unit feature " + str(tabAreaTableRow.zoneIdValue))
-                percentEdge = 0
-                percentCore = 0
+                arcpy.AddWarning( m + " landuse doesn't exist in reporting unit feature " + str(tabAreaTableRow.zoneIdValue))
                 CtoERatio = 0
+        else:
+            arcpy.AddWarning("All landuse is tagged as EXCLUDED in reporting unit feature " + str(tabAreaTableRow.zoneIdValue))
+            percentEdge = 0
+            percentCore = 0
+            CtoERatio = 0
 
-            resultsTuple = (CtoERatio, percentCore, percentEdge, totalArea, effectiveArea, excludedArea)
-            CoreEdgeDict[tabAreaTableRow.zoneIdValue] = resultsTuple
-
-
-        # Check to see if newTable has already been set up
-        rowcount = int(arcpy.GetCount_management(newTable).getOutput(0))
-        if rowcount == 0:
-            outTableRows = arcpy.InsertCursor(newTable)
-            for k in CoreEdgeDict.keys():
-                # initiate a row to add to the metric output table
-                outTableRow = outTableRows.newRow()
-
-                # set the reporting unit id value in the output row
-                outTableRow.setValue(outIdField.name, k)
-
-                # commit the row to the output table
-                outTableRows.insertRow(outTableRow)
-            del outTableRows, outTableRow
+        resultsTuple = (CtoERatio, percentCore, percentEdge, totalArea, effectiveArea, excludedArea)
+        CoreEdgeDict[tabAreaTableRow.zoneIdValue] = resultsTuple
 
-        # assemble the names for the core and edge fields    
+    # assemble the names for the core and edge fields    
+    if outFieldNames is None:
         outClassName = metricsFieldnameDict[m][1]
         coreFieldName = metricConst.coreField[0]+outClassName+metricConst.coreField[1]
         edgeFieldName = metricConst.edgeField[0]+outClassName+metricConst.edgeField[1]
+        outFieldNames = [metricsFieldnameDict[m][0], coreFieldName, edgeFieldName]
+    else:
+        outFieldNames = list(outFieldNames)
 
-        # create the cursor to add data to the output table
-        outTableRows = arcpy.UpdateCursor(newTable)        
-        outTableRow = outTableRows.next()
-        while outTableRow:
-            uid = outTableRow.getValue(outIdField.name)
-            # populate the edge to core ratio for the current reporting unit
-            if (uid in CoreEdgeDict):
-                outTableRow.setValue(metricsFieldnameDict[m][0], CoreEdgeDict[uid][0])
-                outTableRow.setValue(coreFieldName, CoreEdgeDict[uid][1])
-                outTableRow.setValue(edgeFieldName, CoreEdgeDict[uid][2])
-            else:
-                outTableRow.setValue(metricsFieldnameDict[m][0], 0)
-                outTableRow.setValue(coreFieldName, 0)
-                outTableRow.setValue(edgeFieldName, 0)
+    # add QACheck calculations/values
+    if zoneAreaDict:
+        qaCheckFlds = metricConst.qaCheckFieldParameters
+        outFieldNames += [qaCheckFlds[i][0] for i in range(4)]
+        for uid, resultsTuple in CoreEdgeDict.items():
+            overlapCalc = ((resultsTuple[3])/zoneAreaDict[uid]) * 100
+            CoreEdgeDict[uid] = resultsTuple[:3] + (overlapCalc,) + resultsTuple[3:]
 
-
-            # add QACheck calculations/values to row
-            if zoneAreaDict:
-                zoneArea = zoneAreaDict[uid]
-                qaCheckFlds = metricConst.qaCheckFieldParameters
-
-                if (uid in CoreEdgeDict):
-                    overlapCalc = ((CoreEdgeDict[uid][3])/zoneArea) * 100
-                    outTableRow.setValue(qaCheckFlds[0][0], overlapCalc)
-                    outTableRow.setValue(qaCheckFlds[1][0], CoreEdgeDict[uid][3])
-                    outTableRow.setValue(qaCheckFlds[2][0], CoreEdgeDict[uid][4])
-                    outTableRow.setValue(qaCheckFlds[3][0], CoreEdgeDict[uid][5])
-                else:
-                    outTableRow.setValue(qaCheckFlds[0][0], 0)
-                    outTableRow.setValue(qaCheckFlds[1][0], 0)
-                    outTableRow.setValue(qaCheckFlds[2][0], 0)
-                    outTableRow.setValue(qaCheckFlds[3][0], 0)                       
-
-            # commit the row to the output table
-            outTableRows.updateRow(outTableRow)
-            outTableRow = outTableRows.next()
-    finally:
-
-        # delete cursor and row objects to remove locks on the data
-        try:
-            del outTableRows
-            del outTableRow
-            del tabAreaTable
-            del tabAreaTableRow
-        except:
-            pass
+    # insert the rows if the output table is empty, otherwise update them. Reporting units without results get 0
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(CoreEdgeDict.keys())
+    for i, fieldName in enumerate(outFieldNames):
+        outTableWriter.addColumn(fieldName, [resultsTuple[i] for resultsTuple in CoreEdgeDict.values()])
+    outTableWriter.writeRows(dict((fieldName, 0) for fieldName in outFieldNames))
 
 
 def getMDCP(outIdField, newTable, mdcpDict, optionalGroupsList, outClassName):
-    try:
-        # Check to see if newTable has already been set up
-        rowcount = int(arcpy.GetCount_management(newTable).getOutput(0))
-        if rowcount == 0:
-            outTableRows = arcpy.InsertCursor(newTable)
-            for k in mdcpDict.keys():
-                # initiate a row to add to the metric output table
-                outTableRow = outTableRows.newRow()
-
-                # set the reporting unit id value in the output row
-                outTableRow.setValue(outIdField.name, k)
-
-                # commit the row to the output table
-                outTableRows.insertRow(outTableRow)
-            del outTableRows, outTableRow
-        # If QA fields are selected, add fields for pwn (patches w/ neighbors) and pwon (patches w/o) for the class
-        if globalConstants.qaCheckName in optionalGroupsList:
-            arcpy.AddField_management(newTable, outClassName+"_PWN", "LONG")
-            arcpy.AddField_management(newTable, outClassName+"_PWON", "LONG")
-
-        mdcpFieldName = outClassName+"_MDCP"
+    # If QA fields are selected, add fields for pwn (patches w/ neighbors) and pwon (patches w/o) for the class
+    if globalConstants.qaCheckName in optionalGroupsList:
+        arcpy.AddField_management(newTable, outClassName+"_PWN", "LONG")
+        arcpy.AddField_management(newTable, outClassName+"_PWON", "LONG")
 
-        # create the cursor to add data to the output table
-        outTableRows = arcpy.UpdateCursor(newTable)        
-        outTableRow = outTableRows.next()
-        while outTableRow:
-            uid = outTableRow.getValue(outIdField.name)
-            # populate the mean distance to edge patch for the current reporting unit
-            outTableRow.setValue(mdcpFieldName, mdcpDict[uid].split(",")[2])
-
-            # If QA fields are selected, populate the pwon and pwn fields
-            if globalConstants.qaCheckName in optionalGroupsList:
-                outTableRow.setValue(outClassName+"_PWN", mdcpDict[uid].split(",")[0])
-                outTableRow.setValue(outClassName+"_PWON", mdcpDict[uid].split(",")[1])
+    # each mdcpDict value is a tuple of the pwn, pwon, and mdcp values
+    mdcpValues = list(mdcpDict.values())
 
-            # commit the row to the output table
-            outTableRows.updateRow(outTableRow)
-            outTableRow = outTableRows.next()
+    # populate the mean distance to closest patch for every reporting unit in one bulk write
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(mdcpDict.keys())
+    outTableWriter.addColumn(outClassName+"_MDCP", [float(values[2]) for values in mdcpValues])
 
-    finally:
+    # If QA fields are selected, populate the pwon and pwn fields
+    if globalConstants.qaCheckName in optionalGroupsList:
+        outTableWriter.addColumn(outClassName+"_PWN", [int(values[0]) for values in mdcpValues])
+        outTableWriter.addColumn(outClassName+"_PWON", [int(values[1]) for values in mdcpValues])
 
-        # delete cursor and row objects to remove locks on the data
-        try:
-            del outTableRows
-            del outTableRow
-
-        except:
-            pass
+    outTableWriter.writeRows()
 
 
 def getPatchNumbers(outIdField, newTable, reportingUnitIdField, metricsFieldnameDict, zoneAreaDict, metricConst, m, 
-                    inReportingUnitFeature, inLandCoverGrid, processingCellSize, conversionFactor):
+                    inReportingUnitFeature, inLandCoverGrid, processingCellSize, conversionFactor, useCrossTab=None):
     import numpy as np
     from arcpy import env
     
+    # the cross-tabulation gives each cell to one reporting unit, so overlapping reporting units are done one at a time
+    if useCrossTab is None:
+        useCrossTab = globalConstants.patchEngine == "NUMPY" and not polygons.hasOverlaps(inReportingUnitFeature)
+    
+    if useCrossTab:
+        resultsDict = getPatchNumbersFromCrossTab(zoneAreaDict, metricConst, inReportingUnitFeature, reportingUnitIdField,
+                                                  inLandCoverGrid, conversionFactor)
+        writePatchNumbers(outIdField, newTable, resultsDict, metricsFieldnameDict, metricConst, m)
+        return resultsDict
+    
     resultsDict={}
 
     try:
@@ -968,81 +1103,14 @@ def getPatchNumbers(outIdField, newTable, reportingUnitIdField, metricsFieldname
         # Restore the original environment extent
         env.extent = _tempEnvironment3
 
-        # Check to see if newTable has already been set up
-        rowcount = int(arcpy.GetCount_management(newTable).getOutput(0))
-        if rowcount == 0:
-            outTableRows = arcpy.InsertCursor(newTable)
-            for k in resultsDict.keys():
-                # initiate a row to add to the metric output table
-                outTableRow = outTableRows.newRow()
-
-                # set the reporting unit id value in the output row
-                outTableRow.setValue(outIdField.name, k)
-
-                # commit the row to the output table
-                outTableRows.insertRow(outTableRow)
-            del outTableRows, outTableRow
-
-        # assemble the names for the patch metric fields 
-        outClassName = metricsFieldnameDict[m][1]
-        numFieldName = metricConst.numField[0]+outClassName+metricConst.numField[1]
-        avgFieldName = metricConst.avgField[0]+outClassName+metricConst.avgField[1]
-        mdnFieldName = metricConst.mdnField[0]+outClassName+metricConst.mdnField[1]
-        densFieldName = metricConst.densField[0]+outClassName+metricConst.densField[1]
-        lrgFieldName = metricConst.lrgField[0]+outClassName+metricConst.lrgField[1]
-
-        # check to see if QA fields are included in table
-        fldNames = [f.name for f in arcpy.ListFields(newTable)]
-        QAFields = metricConst.overlapName in fldNames
-
-        # create the cursor to add data to the output table
-        outTableRows = arcpy.UpdateCursor(newTable)        
-        outTableRow = outTableRows.next()
-        while outTableRow:
-            uid = outTableRow.getValue(outIdField.name)
-            # populate the patch metric fields for the current reporting unit
-            if (uid in resultsDict):
-                outTableRow.setValue(metricsFieldnameDict[m][0], resultsDict[uid][0])
-                outTableRow.setValue(numFieldName, resultsDict[uid][1])
-                outTableRow.setValue(avgFieldName, resultsDict[uid][2])
-                outTableRow.setValue(mdnFieldName, resultsDict[uid][3])
-                outTableRow.setValue(densFieldName, resultsDict[uid][4])
-                outTableRow.setValue(lrgFieldName, resultsDict[uid][5])
-                
-            else:
-                outTableRow.setValue(metricsFieldnameDict[m][0], 0)
-                outTableRow.setValue(numFieldName, 0)
-                outTableRow.setValue(avgFieldName, 0)
-                outTableRow.setValue(mdnFieldName, 0)
-                outTableRow.setValue(densFieldName, 0)
-                outTableRow.setValue(lrgFieldName, 0)
-
-            # add QACheck calculations/values to row
-            if QAFields:
-
-                qaCheckFlds = metricConst.qaCheckFieldParameters
-                effectiveArea = resultsDict[uid][6] + resultsDict[uid][7]
-                excludedArea = resultsDict[uid][8]
-                vectorRUArea = resultsDict[uid][9]
-                rasterRUArea = effectiveArea + excludedArea
-                overlapCalc = (rasterRUArea/ vectorRUArea) * 100
-
-                outTableRow.setValue(qaCheckFlds[0][0], overlapCalc)
-                outTableRow.setValue(qaCheckFlds[1][0], rasterRUArea)
-                outTableRow.setValue(qaCheckFlds[2][0], effectiveArea)
-                outTableRow.setValue(qaCheckFlds[3][0], excludedArea)
+        writePatchNumbers(outIdField, newTable, resultsDict, metricsFieldnameDict, metricConst, m)
 
-            # commit the row to the output table
-            outTableRows.updateRow(outTableRow)
-            outTableRow = outTableRows.next()
     finally:
 
         # delete cursor and row objects to remove locks on the data
         try:
             del rows
             del row
-            del outTableRows
-            del outTableRow
             if arcpy.Exists(tabareaTable):
                 arcpy.Delete_management(tabareaTable)
         except:
@@ -1051,6 +1119,140 @@ def getPatchNumbers(outIdField, newTable, reportingUnitIdField, metricsFieldname
     return resultsDict
 
 
+def getPatchNumbersFromCrossTab(zoneAreaDict, metricConst, inReportingUnitFeature, reportingUnitIdField, inPatchGrid,
+                                conversionFactor):
+    """ Computes the patch metrics of every reporting unit from one (zone, patch label) cross-tabulation
+
+    **Description:**
+
+        The reporting units are rasterized once, aligned with the patch grid, and the cells of every (zone, patch
+        label) pair are counted block by block into a sparse accumulator. All per reporting unit statistics are then
+        grouped from that single cross-tabulation (see patches.getZonePatchStatistics) instead of running a feature
+        layer, copy and TabulateArea for each reporting unit. As with TabulateArea over the full reporting unit theme,
+        a cell lying in overlapping reporting units would be counted for only one of them, so getPatchNumbers only
+        uses the cross-tabulation when the reporting units do not overlap.
+
+    **Arguments:**
+
+        * *zoneAreaDict* -  dictionary with the area of each input polygon keyed to the polygon's ID value
+        * *metricConst* - an object with constants specific to the metric being run
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inPatchGrid* - the patch raster from raster.createPatchRaster
+        * *conversionFactor* - conversion factor to convert area measures to square meters
+
+    **Returns:**
+
+        * dictionary keyed to reporting unit id with a tuple of (lrgProportion, numPatch, avePatch, mdnPatch,
+          patchDensity, lrgPatch, patchArea, otherArea, excludedArea, zoneArea)
+
+    """
+    import numpy as np
+    from . import patches
+    from . import raster
+    from . import zonal
+    from .tabarea import getZonalWorkerCount
+
+    zoneReader, patchReader, zoneIdLookup, cellArea, valueNoData, zoneRasterName = raster.getZoneAndValueReaders(
+        inReportingUnitFeature, reportingUnitIdField, inPatchGrid, raster.timer)
+    try:
+        accumulator = zonal.tabulateBlocks(zoneReader, patchReader, -1, valueNoData, globalConstants.zonalBlockSize,
+                                           getZonalWorkerCount())
+    finally:
+        arcpy.Delete_management(zoneRasterName)
+
+    zoneCodes, gridValues, cellCounts = accumulator.getSparseCounts()
+
+    # translate the rasterized zone codes to positions in the list of reporting unit ids
+    zoneIdValues = list(zoneAreaDict.keys())
+    idPosition = dict((idValue, i) for i, idValue in enumerate(zoneIdValues))
+    codePosition = dict((code, idPosition[idValue]) for code, idValue in zoneIdLookup.items() if idValue in idPosition)
+    uniqueCodes, codeIndexes = np.unique(zoneCodes, return_inverse=True)
+    zonePositions = np.array([codePosition.get(code, -1) for code in uniqueCodes.tolist()], dtype=np.int64)
+    zoneIndexes = zonePositions[codeIndexes.ravel()] if zoneCodes.size else zoneCodes
+    inZone = zoneIndexes >= 0
+
+    statistics = patches.getZonePatchStatistics(zoneIndexes[inZone], gridValues[inZone], cellCounts[inZone] * cellArea,
+                                                len(zoneIdValues), metricConst.otherValue, metricConst.excludedValue)
+    numPatch = statistics["numPatch"]
+    patchArea = statistics["patchArea"]
+    otherArea = statistics["otherArea"]
+
+    # patch density is the number of patches per square kilometer of the non-excluded area
+    rasterRUAreaKM = (otherArea + patchArea) * (conversionFactor / 1000000)
+    patchDensity = np.zeros(len(zoneIdValues), dtype=np.float64)
+    hasPatches = numPatch > 0
+    patchDensity[hasPatches] = numPatch[hasPatches] / rasterRUAreaKM[hasPatches]
+
+    hasCells = (otherArea + patchArea + statistics["excludedArea"]) > 0
+    for i, aZone in enumerate(zoneIdValues):
+        if not hasCells[i]:
+            AddMsg(f"No land cover grid data found in {aZone}", 1)
+        elif not hasPatches[i]:
+            AddMsg(f"No patches found in {aZone}", 1)
+
+    resultsColumns = [statistics["lrgProportion"], numPatch, statistics["avePatch"], statistics["mdnPatch"], patchDensity,
+                      statistics["lrgPatch"], patchArea, otherArea, statistics["excludedArea"]]
+    resultsRows = zip(*[column.tolist() for column in resultsColumns])
+    return dict((aZone, tuple(results) + (zoneAreaDict[aZone],)) for aZone, results in zip(zoneIdValues, resultsRows))
+
+
+def writePatchNumbers(outIdField, newTable, resultsDict, metricsFieldnameDict, metricConst, m):
+    """ Writes the patch metric values for one class to the output table
+
+    **Description:**
+
+        Inserts a row for each reporting unit if the output table is empty, otherwise updates the existing rows.
+        Reporting units missing from *resultsDict* receive 0 for the patch metric fields. QA fields are populated only
+        if they are found in the output table.
+
+    **Arguments:**
+
+        * *outIdField* - a copy of the reportingUnitIdField except where the IdField type = OID
+        * *newTable* - the ATtILA created output table 
+        * *resultsDict* - dictionary keyed to reporting unit id with a tuple of (lrgProportion, numPatch, avePatch,
+                        mdnPatch, patchDensity, lrgPatch, patchArea, otherArea, excludedArea, zoneArea)
+        * *metricsFieldnameDict* - a dictionary keyed to the lcc class with the ATtILA generated fieldname tuple as value
+        * *metricConst* - an object with constants specific to the metric being run
+        * *m* - a metric BaseName parsed from the 'Metrics to run' input 
+
+    **Returns:**
+
+        * None
+
+    """
+    # assemble the names for the patch metric fields 
+    outClassName = metricsFieldnameDict[m][1]
+    numFieldName = metricConst.numField[0]+outClassName+metricConst.numField[1]
+    avgFieldName = metricConst.avgField[0]+outClassName+metricConst.avgField[1]
+    mdnFieldName = metricConst.mdnField[0]+outClassName+metricConst.mdnField[1]
+    densFieldName = metricConst.densField[0]+outClassName+metricConst.densField[1]
+    lrgFieldName = metricConst.lrgField[0]+outClassName+metricConst.lrgField[1]
+    outFieldNames = [metricsFieldnameDict[m][0], numFieldName, avgFieldName, mdnFieldName, densFieldName, lrgFieldName]
+
+    outTableWriter = tablewriter.getTableWriter(newTable, outIdField.name)
+    outTableWriter.setIds(resultsDict.keys())
+    for i, fieldName in enumerate(outFieldNames):
+        outTableWriter.addColumn(fieldName, [results[i] for results in resultsDict.values()])
+
+    # check to see if QA fields are included in table
+    fldNames = [f.name for f in arcpy.ListFields(newTable)]
+    if metricConst.overlapName in fldNames:
+        qaCheckFlds = metricConst.qaCheckFieldParameters
+        effectiveAreas = [results[6] + results[7] for results in resultsDict.values()]
+        excludedAreas = [results[8] for results in resultsDict.values()]
+        rasterRUAreas = [effectiveArea + excludedArea for effectiveArea, excludedArea in zip(effectiveAreas, excludedAreas)]
+        vectorRUAreas = [results[9] for results in resultsDict.values()]
+
+        outTableWriter.addColumn(qaCheckFlds[0][0], [(rasterRUArea/ vectorRUArea) * 100 for rasterRUArea, vectorRUArea
+                                                     in zip(rasterRUAreas, vectorRUAreas)])
+        outTableWriter.addColumn(qaCheckFlds[1][0], rasterRUAreas)
+        outTableWriter.addColumn(qaCheckFlds[2][0], effectiveAreas)
+        outTableWriter.addColumn(qaCheckFlds[3][0], excludedAreas)
+
+    outTableWriter.writeRows(dict((fieldName, 0) for fieldName in outFieldNames))
+
+
 def getWeightedPopDensity(inReportingUnitFeature,reportingUnitIdField,ruAreaFld,inCensusFeature,inPopField,outTable,
                           metricConst,cleanupList,index,timer,logFile):
     """ Performs a transfer of population from input census features to input reporting unit features using simple
@@ -1370,49 +1572,40 @@ def landCoverViews(metricsBaseNameList, metricConst, viewRadius, viewThreshold,
 #    
 #     arcpy.TableToTable_conversion(statsResultTable,os.path.dirname(outTable),os.path.basename(outTable))
 
-    # Use the try: finally: section of code when INFO tables are possible as outputs.
-    try:
-        setWarning = False
-
-        # Create the search cursor to query the contents of the BELOW THRESHOLD statistics table
-        inTableRows = arcpy.SearchCursor(statsResultTable)
-
-        # create the insert cursor to add data to the output table
-        outTableRows = arcpy.InsertCursor(newTable)        
-
-        for inRow in inTableRows:
-            # initiate a row to add to the metric output table
-            outTableRow = outTableRows.newRow()
+    # Read the BELOW/ABOVE THRESHOLD statistics table once, then write the output table in one bulk insert
+    statsFieldNames = [reportingUnitIdField, "FREQUENCY"]
+    for mBaseName in metricsBaseNameList:
+        statsFieldNames += ["SUM_" + mBaseName + belowSuffix, "SUM_" + mBaseName + aboveSuffix]
+    with arcpy.da.SearchCursor(statsResultTable, statsFieldNames) as inTableRows:
+        statsColumns = list(zip(*inTableRows)) or [()] * len(statsFieldNames)
 
-            # set the reporting unit id value in the output row
-            outTableRow.setValue(reportingUnitIdField, inRow.getValue(reportingUnitIdField))
+    outTableWriter = tablewriter.getTableWriter(newTable, reportingUnitIdField)
+    outTableWriter.setIds(statsColumns[0])
 
-            # set the number of facilities in the reporting unit in the output row 
-            facilityCount = inRow.getValue("FREQUENCY")
-            outTableRow.setValue(cntFldName, facilityCount)
+    # set the number of facilities in each reporting unit
+    facilityCounts = statsColumns[1]
+    outTableWriter.addColumn(cntFldName, facilityCounts)
 
-            # set the number of facilities in the reporting unit with below threshold views and above threshold views
-            # in the output row. Do this for each selected metric class 
-            for mBaseName in metricsBaseNameList:
-                metricFieldName = metricsFieldnameDict[mBaseName][0]
+    # set the number of facilities in the reporting unit with below threshold views and above threshold views. Do this
+    # for each selected metric class 
+    for i, mBaseName in enumerate(metricsBaseNameList):
+        metricFieldName = metricsFieldnameDict[mBaseName][0]
 
-                # assemble the name for the high count field    
-                outClassName = metricsFieldnameDict[mBaseName][1]
-                highFieldName = metricConst.highField[0]+outClassName+metricConst.highField[1]
+        # assemble the name for the high count field    
+        outClassName = metricsFieldnameDict[mBaseName][1]
+        highFieldName = metricConst.highField[0]+outClassName+metricConst.highField[1]
 
-                belowStatsFieldName = "SUM_" + mBaseName + belowSuffix
-                lowValue = inRow.getValue(belowStatsFieldName)
-                outTableRow.setValue(metricFieldName, lowValue )
+        lowValues = statsColumns[2 + 2*i]
+        highValues = statsColumns[3 + 2*i]
+        outTableWriter.addColumn(metricFieldName, lowValues)
+        outTableWriter.addColumn(highFieldName, highValues)
 
-                aboveStatsFieldName = "SUM_" + mBaseName + aboveSuffix
-                highValue = inRow.getValue(aboveStatsFieldName)
-                outTableRow.setValue(highFieldName, highValue)
+    outTableWriter.insertRows()
 
-            # commit the row to the output table
-            outTableRows.insertRow(outTableRow)
-
-            if (lowValue + highValue != facilityCount):
-                setWarning = True
+    if metricsBaseNameList:
+        # facilities without land cover data in their view radius are not counted in either the low or the high sum
+        setWarning = any(lowValue + highValue != facilityCount for lowValue, highValue, facilityCount 
+                         in zip(lowValues, highValues, facilityCounts))
 
         if (setWarning):
             arcpy.AddWarning("One or more facilities did not have land cover data within its view radius. "\
@@ -1420,14 +1613,3 @@ def landCoverViews(metricsBaseNameList, metricConst, viewRadius, viewThreshold,
                              "of the land cover grid or that the land cover raster extends beneath all facility features. "\
                              "Problematic reporting units have a value in the "+ cntFldName +" field higher than the sum "\
                              "of the values in the '"+ lowSuffix +"' and '"+ highSuffix +"' fields.")
-
-    finally:
-
-        # delete cursor and row objects to remove locks on the data
-        try:
-            del outTableRows
-            del outTableRow
-            del inRow
-            del inTableRows
-        except:
-            pass
@@ -0,0 +1,230 @@
+""" Array based core and edge classification
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They provide the in-memory
+    engine behind the Core and Edge Metrics tool: the cells of a land cover class are split into edge and core by their
+    distance to the nearest cell outside the class, and the result is a small uint8 category array that is tabulated by
+    reporting unit directly instead of being saved as a raster with a CATEGORY field.
+
+"""
+import math
+
+import numpy as np
+
+from . import patches
+from .zonal import iterBlocks
+
+# category codes, as used by raster.getEdgeCoreGrid. Code 0 marks NoData cells
+noDataCode = 0
+excludedCode = 1
+otherCode = 2
+edgeCode = 3
+coreCode = 4
+
+# labels of the category codes; they match the CATEGORY field values tabulated by the arcpy engine
+categoryNames = {excludedCode: "EXCLUDED", otherCode: "OTHER", edgeCode: "EDGE", coreCode: "CORE"}
+
+
+def getCategoryArray(landCoverArray, classValues, excludedValues, noDataMask=None):
+    """ Reclassify a land cover array to the excluded, other and edge codes.
+
+        All class cells start as edge; createCoreEdgeArray then promotes the class cells far enough from other cells
+        to core.
+
+        **Returns:**
+
+        * uint8 NumPy array; NoData cells are noDataCode
+
+    """
+    reclassArray = patches.reclassifyInOutOther(landCoverArray, classValues, excludedValues,
+                                                [edgeCode, excludedCode, otherCode], noDataMask)
+    reclassArray[reclassArray == patches.patchNoData] = noDataCode
+
+    return reclassArray.astype(np.uint8)
+
+
+def _getDistanceByOffsets(sourceMask, maxDistance):
+    """ Distance to the nearest source cell within maxDistance, for when SciPy is not installed
+
+        The source mask is shifted by every offset within maxDistance, from the closest offset out, and each cell takes
+        the distance of the first offset that reaches a source cell.
+    """
+    nRows, nCols = sourceMask.shape
+    distanceArray = np.full((nRows, nCols), np.inf, dtype=np.float32)
+
+    radius = int(maxDistance)
+    offsets = [(rowOffset * rowOffset + colOffset * colOffset, rowOffset, colOffset)
+               for rowOffset in range(-radius, radius + 1) for colOffset in range(-radius, radius + 1)]
+    for squaredDistance, rowOffset, colOffset in sorted(offsets):
+        if squaredDistance > maxDistance * maxDistance:
+            break
+
+        # the cells at (row, col) whose source neighbor is at (row + rowOffset, col + colOffset)
+        targetRows = slice(max(-rowOffset, 0), nRows - max(rowOffset, 0))
+        targetCols = slice(max(-colOffset, 0), nCols - max(colOffset, 0))
+        sourceRows = slice(max(rowOffset, 0), nRows - max(-rowOffset, 0))
+        sourceCols = slice(max(colOffset, 0), nCols - max(-colOffset, 0))
+
+        target = distanceArray[targetRows, targetCols]
+        target[sourceMask[sourceRows, sourceCols] & np.isinf(target)] = math.sqrt(squaredDistance)
+
+    return distanceArray
+
+
+def getDistanceToOther(sourceMask, maxDistance, blockSize=4096):
+    """ Compute the distance, in cells, from every cell to the center of the nearest source cell.
+
+        **Description:**
+
+        This is the in-memory equivalent of arcpy.sa.EucDistance for the distances the core and edge classification
+        needs. Only distances up to *maxDistance* are computed, so the mask is processed in tiles of *blockSize* rows
+        and columns, each read with a halo of maxDistance cells. The exact Euclidean distance transform from
+        scipy.ndimage is used when SciPy is installed; otherwise the distances are found by shifting the source mask.
+
+        **Arguments:**
+
+        * *sourceMask* - boolean NumPy array of the cells distances are measured from
+        * *maxDistance* - the largest distance of interest, in cells
+        * *blockSize* - number of rows and columns in a tile
+
+        **Returns:**
+
+        * float32 NumPy array; cells farther than maxDistance from any source cell are np.inf
+
+    """
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+
+    nRows, nCols = sourceMask.shape
+    halo = int(math.ceil(maxDistance))
+    distanceArray = np.full((nRows, nCols), np.inf, dtype=np.float32)
+
+    for rowOffset, colOffset, blockRows, blockCols in iterBlocks(nRows, nCols, blockSize):
+        haloTop = max(rowOffset - halo, 0)
+        haloLeft = max(colOffset - halo, 0)
+        haloMask = sourceMask[haloTop:min(rowOffset + blockRows + halo, nRows),
+                              haloLeft:min(colOffset + blockCols + halo, nCols)]
+        if not haloMask.any():
+            continue
+
+        if ndimage is None:
+            haloDistances = _getDistanceByOffsets(haloMask, maxDistance)
+        else:
+            haloDistances = ndimage.distance_transform_edt(~haloMask).astype(np.float32)
+
+        coreTop = rowOffset - haloTop
+        coreLeft = colOffset - haloLeft
+        distanceArray[rowOffset:rowOffset + blockRows, colOffset:colOffset + blockCols] = \
+            haloDistances[coreTop:coreTop + blockRows, coreLeft:coreLeft + blockCols]
+
+    distanceArray[distanceArray > maxDistance] = np.inf
+
+    return distanceArray
+
+
+def createCoreEdgeArray(landCoverArray, classValues, excludedValues, edgeWidths, noDataMask=None, blockSize=4096):
+    """ Classify a land cover array into excluded, other, edge and core cells for one land cover class.
+
+        **Description:**
+
+        The land cover is reclassified with getCategoryArray. The distance from every cell to the nearest excluded or
+        other cell is computed once with getDistanceToOther, up to the largest edge distance. Class cells within
+        edgeWidth + 0.5 cells of a non-class cell are edge for that width and the rest are core. The half cell matches
+        the edge distance of raster.getEdgeCoreGrid, where distances are measured between cell centers. NoData cells
+        are not distance sources, as in arcpy.sa.EucDistance.
+
+        Several edge widths are classified in the same array: each class cell is coded edgeCode plus the number of
+        widths for which it is core. With a single width, edge cells are edgeCode and core cells are coreCode. Use
+        getWidthAreaMatrices to split the tabulated codes into the areas of each width.
+
+        **Arguments:**
+
+        * *landCoverArray* - NumPy integer array of land cover values
+        * *classValues* - collection of the land cover values in the selected class
+        * *excludedValues* - collection of the land cover values tagged excluded in the LCC file
+        * *edgeWidths* - the edge width, or a list of edge widths, in cells
+        * *noDataMask* - optional boolean NumPy array marking the NoData cells
+        * *blockSize* - number of rows and columns in a distance transform tile
+
+        **Returns:**
+
+        * uint8 NumPy array of noDataCode, excludedCode, otherCode and the class cell codes
+
+    """
+    sortedWidths = getSortedWidths(edgeWidths)
+
+    categoryArray = getCategoryArray(landCoverArray, classValues, excludedValues, noDataMask)
+    sourceMask = (categoryArray == excludedCode) | (categoryArray == otherCode)
+    distanceArray = getDistanceToOther(sourceMask, sortedWidths[-1] + 0.5, blockSize)
+    del sourceMask
+
+    classMask = categoryArray == edgeCode
+    for edgeWidth in sortedWidths:
+        categoryArray[classMask & (distanceArray >= edgeWidth + 0.5)] += 1
+
+    return categoryArray
+
+
+def getSortedWidths(edgeWidths):
+    """ Return the distinct edge widths as a sorted list of floats """
+
+    if np.isscalar(edgeWidths) or isinstance(edgeWidths, str):
+        edgeWidths = [edgeWidths]
+
+    return sorted(set(float(edgeWidth) for edgeWidth in edgeWidths))
+
+
+def getCategoryLabels(edgeWidths):
+    """ Return a dictionary of the codes of createCoreEdgeArray to labels for a raster CATEGORY field
+
+        Class cells that are core for some of the widths are labeled with the largest width for which they are core
+        (e.g., "Core3" for cells that are core at widths up to 3).
+    """
+    sortedWidths = getSortedWidths(edgeWidths)
+
+    categoryLabels = {excludedCode: "Excluded", otherCode: "Other", edgeCode: "Edge"}
+    for coreCount, edgeWidth in enumerate(sortedWidths, 1):
+        if coreCount == len(sortedWidths):
+            categoryLabels[edgeCode + coreCount] = "Core"
+        else:
+            categoryLabels[edgeCode + coreCount] = "Core%g" % edgeWidth
+
+    return categoryLabels
+
+
+def getWidthAreaMatrices(gridValues, areaMatrix, edgeWidths):
+    """ Split the areas tabulated for the codes of createCoreEdgeArray into the categories of each edge width.
+
+        **Description:**
+
+        A class cell coded edgeCode + k is core for the k smallest edge widths and edge for the others, so the edge and
+        core areas of every width are sums of columns of the one tabulated area matrix.
+
+        **Arguments:**
+
+        * *gridValues* - list of the tabulated codes, one per column of *areaMatrix*
+        * *areaMatrix* - two dimensional NumPy array of areas (zones x codes)
+        * *edgeWidths* - list of edge widths, in the order the results are wanted
+
+        **Returns:**
+
+        * list of category names (the values of categoryNames)
+        * list of two dimensional NumPy arrays of areas (zones x categories), one per edge width
+
+    """
+    sortedWidths = getSortedWidths(edgeWidths)
+    gridValues = np.asarray(gridValues)
+    categoryCodes = list(categoryNames.keys())
+
+    widthMatrices = []
+    for edgeWidth in edgeWidths:
+        coreCount = sortedWidths.index(float(edgeWidth)) + 1
+        columnMasks = {excludedCode: gridValues == excludedCode,
+                       otherCode: gridValues == otherCode,
+                       edgeCode: (gridValues >= edgeCode) & (gridValues < edgeCode + coreCount),
+                       coreCode: gridValues >= edgeCode + coreCount}
+        widthMatrices.append(np.column_stack([areaMatrix[:, columnMasks[aCode]].sum(axis=1)
+                                              for aCode in categoryCodes]))
+
+    return [categoryNames[aCode] for aCode in categoryCodes], widthMatrices
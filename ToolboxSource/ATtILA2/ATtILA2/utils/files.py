@@ -27,6 +27,17 @@ def nameIntermediateFile(fileName,cleanupList):
     return fileName
 
 
+def getScratchTiffName(namePrefix):
+    ''' Return the path of a new .tif file in the scratch folder whose name starts with namePrefix
+    '''
+    index = 0
+    while True:
+        tiffName = os.path.join(env.scratchFolder, f"{namePrefix}{index}.tif")
+        if not os.path.exists(tiffName):
+            return tiffName
+        index += 1
+
+
 def getRasterName(namePrefix):
     ''' Routine for obtaining filenames for raster objects. 
     '''
@@ -0,0 +1,312 @@
+""" Array based focal (moving window) sums
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They provide the in-memory
+    engine behind the focal sums of the Neighborhood Proportions tool. The sum over every rectangular window is taken
+    from a summed area table (integral image) in four lookups per cell, so the cost does not depend on the window size.
+    Grids are processed in strips of whole rows, each read with a halo of the rows the windows reach into. Several land
+    cover classes are summed together as a stack of (classes, rows, cols) planes built from one read of each strip.
+
+    Circular neighborhoods, as used by the view tools, are summed by one of three methods chosen by the radius: direct
+    summation of shifted arrays for small radii, row runs (a circle is a set of horizontal runs, each summed from a
+    one dimensional prefix sum) for medium radii, and an overlap-add FFT convolution for large radii. All three give
+    exact integer counts. The circle footprints come from the kernels module.
+
+"""
+import numpy as np
+
+from . import kernels
+from .zonal import iterBlocks
+
+# NoData value of the arrays produced by the focal engine
+noDataValue = -1
+
+# Largest circle radii, in cells, summed by the direct and the row run methods; larger circles use the FFT method
+directMaxRadius = 2
+rowRunMaxRadius = 16
+
+# Size of the FFT, in rows and columns, of the overlap-add blocks; it grows to fit the circle when needed
+_fftBlockShape = 512
+
+
+def getRectangleOffsets(size):
+    """ Return the number of cells a window of *size* cells reaches before and after its processing cell
+
+        As with arcpy.sa.NbrRectangle, the processing cell of an even sized window is the one just before its center.
+    """
+    before = (size - 1) // 2
+
+    return before, size - 1 - before
+
+
+def getSummedAreaTable(array):
+    """ Return the summed area table of the last two dimensions of an array of 0 and 1 values (or a stack of them)
+
+        The table has one more row and column than the array; entry [..., i, j] is the sum of array[..., :i, :j]. It is
+        int32 when the number of cells allows, which halves its memory.
+    """
+    nRows, nCols = array.shape[-2:]
+    sumType = np.int32 if (nRows + 1) * (nCols + 1) < np.iinfo(np.int32).max else np.int64
+    summedAreaTable = np.zeros(array.shape[:-2] + (nRows + 1, nCols + 1), dtype=sumType)
+    np.cumsum(np.cumsum(array, axis=-2, dtype=sumType), axis=-1, out=summedAreaTable[..., 1:, 1:])
+
+    return summedAreaTable
+
+
+def rectangleSum(paddedArray, width, height):
+    """ Return the sum of every width x height window of an array padded with (height - 1) rows and (width - 1) columns
+
+        The result has the shape of the array before padding. Leading dimensions of a stacked array are kept.
+    """
+    summedAreaTable = getSummedAreaTable(paddedArray)
+
+    return (summedAreaTable[..., height:, width:] - summedAreaTable[..., :-height, width:]
+            - summedAreaTable[..., height:, :-width] + summedAreaTable[..., :-height, :-width])
+
+
+def getClassPlanes(classBits, numClasses):
+    """ Split an array of class bits into a uint8 stack of (classes, rows, cols) planes where plane k is 1 at the cells
+        with bit k set
+
+        The class bits come from one lookup of reclass.getClassBitsLookupTable, so a block is reclassified for every
+        class in a single pass over the grid values.
+    """
+    planes = np.empty((numClasses,) + classBits.shape, dtype=np.uint8)
+    for k in range(numClasses):
+        bit = classBits.dtype.type(k)
+        np.bitwise_and(classBits >> bit, 1, out=planes[k], casting="unsafe")
+
+    return planes
+
+
+def getPercentZoneBins(pctStep):
+    """ Return the upper bin edges, in percent, and the zone codes of the percent zones of Neighborhood Proportions
+
+        These are the RemapRange bins of raster.getRemapBinsByPercentStep for a maximum value of 100: the first bin
+        takes 0 through pctStep percent, every other bin takes the percentages above its lower edge up to and including
+        its upper edge, and the last bin is coded 100.
+    """
+    lowerEdges = list(range(0, 100, int(pctStep)))
+    zoneCodes = [int(pctStep) * i for i in range(1, len(lowerEdges))] + [100]
+
+    return lowerEdges[1:], zoneCodes
+
+
+def getPercentZones(sumArray, cellCount, pctStep):
+    """ Return the int16 percent zone codes (see getPercentZoneBins) of the window sums of a focal engine
+
+        The counts are binned with np.digitize against the bin edges scaled to counts, so cells on a bin edge are
+        binned exactly rather than by a rounded percentage.
+    """
+    upperEdges, zoneCodes = getPercentZoneBins(pctStep)
+    binIndexes = np.digitize(sumArray.astype(np.int64) * 100, np.array(upperEdges, dtype=np.int64) * int(cellCount),
+                             right=True)
+
+    return np.array(zoneCodes, dtype=np.int16)[binIndexes]
+
+
+def getCircleSumMethod(radius):
+    """ Return the method circleSum uses for a circle of *radius* cells: "DIRECT", "ROWRUNS" or "FFT" """
+
+    if radius <= directMaxRadius:
+        return "DIRECT"
+    if radius <= rowRunMaxRadius:
+        return "ROWRUNS"
+    return "FFT"
+
+
+def _circleSumDirect(paddedArray, radius, sumType):
+    """ Sum a circle over an array padded with radius cells on every side by adding one shifted view per circle cell """
+
+    nRows = paddedArray.shape[-2] - 2 * radius
+    nCols = paddedArray.shape[-1] - 2 * radius
+    sumArray = np.zeros(paddedArray.shape[:-2] + (nRows, nCols), dtype=sumType)
+
+    footprint = kernels.getCircleFootprint(radius)
+    for rowOffset, colOffset in zip(*np.nonzero(footprint)):
+        sumArray += paddedArray[..., rowOffset:rowOffset + nRows, colOffset:colOffset + nCols]
+
+    return sumArray
+
+
+def _circleSumByRowRuns(paddedArray, radius, sumType):
+    """ Sum a circle over an array padded with radius cells on every side from the prefix sums of its rows
+
+        Each run of the circle adds the difference of two prefix sums, so the cost grows with the diameter rather than
+        the area of the circle.
+    """
+    nRows = paddedArray.shape[-2] - 2 * radius
+    nCols = paddedArray.shape[-1] - 2 * radius
+    prefixSums = np.zeros(paddedArray.shape[:-1] + (paddedArray.shape[-1] + 1,), dtype=sumType)
+    np.cumsum(paddedArray, axis=-1, dtype=sumType, out=prefixSums[..., 1:])
+
+    sumArray = np.zeros(paddedArray.shape[:-2] + (nRows, nCols), dtype=sumType)
+    for rowOffset, halfWidth in kernels.getCircleRuns(radius):
+        rows = prefixSums[..., radius + rowOffset:radius + rowOffset + nRows, :]
+        sumArray += rows[..., radius + halfWidth + 1:radius + halfWidth + 1 + nCols]
+        sumArray -= rows[..., radius - halfWidth:radius - halfWidth + nCols]
+
+    return sumArray
+
+
+def _circleSumByFFT(paddedArray, radius, sumType):
+    """ Sum a circle over an array padded with radius cells on every side by overlap-add FFT convolution
+
+        The array is cut into blocks; each block is convolved with the circle through a real FFT of a fixed size and
+        added into the full convolution, and blocks without a nonzero cell are skipped. The sums are rounded back to
+        exact integers.
+    """
+    footprint = kernels.getCircleFootprint(radius)
+    diameter = footprint.shape[0]
+    fftSize = _fftBlockShape
+    while fftSize < 2 * diameter:
+        fftSize *= 2
+    blockSize = fftSize - diameter + 1
+    fftShape = (fftSize, fftSize)
+    kernelSpectrum = np.fft.rfft2(footprint.astype(np.float64), fftShape)
+
+    paddedRows, paddedCols = paddedArray.shape[-2:]
+    stackShape = paddedArray.shape[:-2]
+    planes = paddedArray.reshape((-1, paddedRows, paddedCols))
+    sumArray = np.empty((planes.shape[0], paddedRows - diameter + 1, paddedCols - diameter + 1), dtype=sumType)
+
+    for k, plane in enumerate(planes):
+        fullArray = np.zeros((paddedRows + diameter - 1, paddedCols + diameter - 1), dtype=np.float64)
+        for rowOffset, colOffset, blockRows, blockCols in iterBlocks(paddedRows, paddedCols, blockSize):
+            block = plane[rowOffset:rowOffset + blockRows, colOffset:colOffset + blockCols]
+            if not block.any():
+                continue
+            blockSum = np.fft.irfft2(np.fft.rfft2(block, fftShape) * kernelSpectrum, fftShape)
+            fullArray[rowOffset:rowOffset + blockRows + diameter - 1, colOffset:colOffset + blockCols + diameter - 1] += \
+                blockSum[:blockRows + diameter - 1, :blockCols + diameter - 1]
+
+        # the valid part of the full convolution is the sum around every cell of the unpadded array
+        sumArray[k] = np.rint(fullArray[diameter - 1:paddedRows, diameter - 1:paddedCols])
+
+    return sumArray.reshape(stackShape + sumArray.shape[-2:])
+
+
+def circleSum(paddedArray, radius):
+    """ Return the sum of a circle of *radius* cells around every cell of an array padded with radius cells on every
+        side, using the method getCircleSumMethod chooses for the radius
+
+        The result has the shape of the array before padding. Leading dimensions of a stacked array are kept.
+    """
+    radius = int(radius)
+    nRows, nCols = paddedArray.shape[-2:]
+    sumType = np.int32 if nRows * nCols < np.iinfo(np.int32).max else np.int64
+
+    method = getCircleSumMethod(radius)
+    if method == "DIRECT":
+        return _circleSumDirect(paddedArray, radius, sumType)
+    if method == "ROWRUNS":
+        return _circleSumByRowRuns(paddedArray, radius, sumType)
+    return _circleSumByFFT(paddedArray, radius, sumType)
+
+
+def _iterPaddedStrips(readRows, nRows, rowsBefore, rowsAfter, colsBefore, colsAfter, stripRows):
+    """ Read the grid in strips of at most stripRows output rows, each with the rows its windows reach into
+
+        Yields the row offset of the strip, the array read for it padded with zeros where the windows reach beyond the
+        grid edges, the NoData mask read for it (None when it has no NoData cells) and the padding of the array.
+    """
+    for rowOffset in range(0, nRows, stripRows):
+        stripCount = min(stripRows, nRows - rowOffset)
+        readStart = max(rowOffset - rowsBefore, 0)
+        readStop = min(rowOffset + stripCount + rowsAfter, nRows)
+        valueArray, noDataMask = readRows(readStart, readStop - readStart)
+
+        padding = ((readStart - (rowOffset - rowsBefore), rowOffset + stripCount + rowsAfter - readStop),
+                   (colsBefore, colsAfter))
+        stackPadding = ((0, 0),) * (valueArray.ndim - 2) + padding
+        if noDataMask is not None and not noDataMask.any():
+            noDataMask = None
+
+        yield rowOffset, np.pad(valueArray, stackPadding), noDataMask, padding
+
+
+def iterFocalRectangleSums(readRows, nRows, nCols, width, height, stripRows):
+    """ Compute the focal sum of a width x height rectangle over a grid, one strip of rows at a time.
+
+        **Description:**
+
+        For each strip of at most *stripRows* output rows, the rows the windows reach into are read with *readRows*,
+        padded with zeros beyond the grid edges, and summed with a summed area table. Cells outside the grid are
+        ignored. As with the NODATA option of arcpy.sa.FocalStatistics, a cell is NoData when any cell of its window is
+        NoData.
+
+        **Arguments:**
+
+        * *readRows* - function of (rowOffset, rowCount) that returns a NumPy array of that many grid rows, or a
+                       stack of (classes, rows, cols) planes, and a boolean NumPy array marking their NoData cells, or
+                       None when there are none
+        * *nRows*, *nCols* - the size of the grid in cells
+        * *width*, *height* - the size of the rectangle in cells
+        * *stripRows* - the largest number of output rows computed at once
+
+        **Yields:**
+
+        * the row offset of the strip
+        * NumPy integer array of the window sums of the strip, stacked like the arrays returned by readRows
+        * boolean NumPy array marking the strip's NoData cells, or None
+
+    """
+    top, bottom = getRectangleOffsets(height)
+    left, right = getRectangleOffsets(width)
+
+    for rowOffset, paddedArray, noDataMask, padding in _iterPaddedStrips(readRows, nRows, top, bottom, left, right,
+                                                                         stripRows):
+        sumArray = rectangleSum(paddedArray, width, height)
+
+        stripNoData = None
+        if noDataMask is not None:
+            stripNoData = rectangleSum(np.pad(noDataMask, padding), width, height) > 0
+
+        yield rowOffset, sumArray, stripNoData
+
+
+def iterFocalCircleSums(readRows, nRows, nCols, radius, stripRows):
+    """ Compute the focal sum of a circle of *radius* cells over a grid, one strip of rows at a time.
+
+        **Description:**
+
+        For each strip of at most *stripRows* output rows, the rows within radius of the strip are read with
+        *readRows*, padded with zeros beyond the grid edges, and summed with circleSum. Cells outside the grid are
+        ignored. As with the DATA option of arcpy.sa.FocalStatistics, NoData cells are left out of the sums and a cell
+        is NoData only when every cell of its circle is NoData or outside the grid.
+
+        **Arguments:**
+
+        * *readRows* - function of (rowOffset, rowCount) that returns a NumPy array of that many grid rows, or a
+                       stack of (classes, rows, cols) planes, with 0 at its NoData cells, and a boolean NumPy array
+                       marking the NoData cells, or None when the NoData cells need not be reported
+        * *nRows*, *nCols* - the size of the grid in cells
+        * *radius* - the radius of the circle in cells
+        * *stripRows* - the largest number of output rows computed at once
+
+        **Yields:**
+
+        * the row offset of the strip
+        * NumPy integer array of the circle sums of the strip, stacked like the arrays returned by readRows
+        * boolean NumPy array marking the strip's NoData cells, or None
+
+    """
+    radius = int(radius)
+
+    for rowOffset, paddedArray, noDataMask, padding in _iterPaddedStrips(readRows, nRows, radius, radius, radius,
+                                                                         radius, stripRows):
+        sumArray = circleSum(paddedArray, radius)
+
+        stripNoData = None
+        if noDataMask is not None:
+            # the padding beyond the grid edges is not data either
+            paddedData = np.pad(~noDataMask, padding).astype(np.uint8)
+            stripNoData = circleSum(paddedData, radius) == 0
+
+        yield rowOffset, sumArray, stripNoData
+
+
+def getStripRows(nCols, stripCells, halo=0):
+    """ Return the number of rows per strip for a grid of nCols columns so that a strip and its halo hold about
+        stripCells cells """
+
+    return max(1, stripCells // max(nCols, 1) - halo)
@@ -0,0 +1,67 @@
+""" Neighborhood kernel footprints and cell counts
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They generate the boolean
+    footprints of the circle and rectangle neighborhoods used by the focal engines and the view tools, with the same
+    cells as arcpy.sa.NbrCircle and arcpy.sa.NbrRectangle in cell units, and count their cells exactly. Results are
+    cached by shape and size, and the cached footprints are read-only so they can be shared between callers.
+
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Number of footprints of each shape kept in the cache
+cacheSize = 64
+
+
+def _readOnly(array):
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=cacheSize)
+def getCircleFootprint(radius):
+    """ Return the read-only boolean (2 * radius + 1) x (2 * radius + 1) footprint of a circle of *radius* cells
+
+        As with arcpy.sa.NbrCircle in cell units, a cell is in the circle when its center is within radius of the
+        processing cell center.
+    """
+    radius = int(radius)
+    offsets = np.arange(-radius, radius + 1)
+
+    return _readOnly(offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius * radius)
+
+
+@lru_cache(maxsize=cacheSize)
+def getCircleRuns(radius):
+    """ Return the horizontal runs of a circle of *radius* cells as a tuple of (rowOffset, halfWidth) tuples
+
+        The run of a row offset covers the column offsets -halfWidth through halfWidth.
+    """
+    radius = int(radius)
+
+    return tuple((rowOffset, math.isqrt(radius * radius - rowOffset * rowOffset))
+                 for rowOffset in range(-radius, radius + 1))
+
+
+@lru_cache(maxsize=cacheSize)
+def getCircleCellCount(radius):
+    """ Return the number of cells in a circle of *radius* cells, counted from its runs without building the footprint
+
+        This is the maximum focal SUM of an arcpy.sa.NbrCircle neighborhood of that radius in cell units.
+    """
+    return sum(2 * halfWidth + 1 for _rowOffset, halfWidth in getCircleRuns(radius))
+
+
+@lru_cache(maxsize=cacheSize)
+def getRectangleFootprint(width, height):
+    """ Return the read-only boolean height x width footprint of a rectangle of *width* by *height* cells """
+
+    return _readOnly(np.ones((int(height), int(width)), dtype=bool))
+
+
+def getRectangleCellCount(width, height):
+    """ Return the number of cells in a rectangle of *width* by *height* cells """
+
+    return int(width) * int(height)
@@ -1194,6 +1194,11 @@ class LandCoverClassification(LandCoverClassificationBase):
     __uniqueValueIds = None
     __uniqueValueIdsWithExcludes = None
     
+    # Dense array of coefficient values (values x coefficients) with its row value ids and column coefficient ids
+    _coefficientMatrix = None
+    _coefficientValueIds = None
+    _coefficientIds = None
+    
     def __init__(self, lccFilePath=None, excludeEmptyClasses=True):
         
         if not lccFilePath is None:
@@ -1204,6 +1209,7 @@ class LandCoverClassification(LandCoverClassificationBase):
             self.metadata = LandCoverMetadata()
             self.coefficients = LandCoverCoefficients()
             self.overwriteFieldDataList = []
+            self._loadCoefficientMatrix()
             
         self.overwriteFieldsNames = constants.overwriteFieldList
 #        map(str, constants.overwriteFieldList)
@@ -1249,6 +1255,64 @@ class LandCoverClassification(LandCoverClassificationBase):
             pass
         
         self.populateClassoverwriteFields()
+        self._loadCoefficientMatrix()
+        
+    def _loadCoefficientMatrix(self):
+        """ Build the dense (values x coefficients) array of coefficient values returned by getCoefficientMatrix """
+        import numpy as np
+        
+        self._coefficientValueIds = sorted(self.values.keys())
+        self._coefficientIds = list(self.coefficients.keys()) if self.coefficients else []
+        self._coefficientMatrix = np.zeros((len(self._coefficientValueIds), len(self._coefficientIds)), dtype=np.float64)
+        
+        for i, valueId in enumerate(self._coefficientValueIds):
+            for j, coeffId in enumerate(self._coefficientIds):
+                coeffValue = self.values[valueId].getCoefficientValueById(coeffId)
+                if coeffValue:
+                    self._coefficientMatrix[i, j] = coeffValue
+        
+    def getCoefficientMatrix(self, valueIds=None, coeffIds=None):
+        """  Get a dense NumPy array of coefficient values with one row per value and one column per coefficient.
+        
+        **Description:**
+            
+            The array is built once when the LCC file is loaded. Rows can be requested in any order of value ids (e.g.,
+            the grid values of a tabulate area table) so that the array can be multiplied directly with an area matrix.
+            Values that are not defined in the LCC file, and values without a coefficient, have a coefficient of 0.
+            
+        **Arguments:**
+            
+            * *valueIds* - list of value ids for the rows; defaults to all LCC values in ascending order
+            * *coeffIds* - list of coefficient ids for the columns (e.g., ["NITROGEN", "IMPERVIOUS"]); defaults to all 
+                           coefficients in the LCC file
+                        
+        **Returns:** 
+            
+            * two dimensional float64 NumPy array (values x coefficients)
+        
+        """
+        import numpy as np
+        
+        if valueIds is None and coeffIds is None:
+            return self._coefficientMatrix
+        
+        if valueIds is None:
+            valueIds = self._coefficientValueIds
+        if coeffIds is None:
+            coeffIds = self._coefficientIds
+        
+        rowLookup = dict((valueId, i) for i, valueId in enumerate(self._coefficientValueIds))
+        columnLookup = dict((coeffId, j) for j, coeffId in enumerate(self._coefficientIds))
+        
+        coefficientMatrix = np.zeros((len(valueIds), len(coeffIds)), dtype=np.float64)
+        rows = [(i, rowLookup[valueId]) for i, valueId in enumerate(valueIds) if valueId in rowLookup]
+        columns = [(j, columnLookup[coeffId]) for j, coeffId in enumerate(coeffIds) if coeffId in columnLookup]
+        if rows and columns:
+            outRows, lccRows = zip(*rows)
+            outColumns, lccColumns = zip(*columns)
+            coefficientMatrix[np.ix_(outRows, outColumns)] = self._coefficientMatrix[np.ix_(lccRows, lccColumns)]
+        
+        return coefficientMatrix
         
     def getUniqueValueIds(self):
         """  Get a `frozenset`_ containing all unique valueIds in the Land Cover Classification.
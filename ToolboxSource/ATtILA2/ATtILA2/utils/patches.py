@@ -0,0 +1,625 @@
+""" Array based patch labeling
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They provide the in-memory
+    engine behind raster.createPatchRaster: a land cover class mask is split into 8-connected patches, optionally
+    joining class cells within a maximum separation distance, patches below the minimum size are returned to the
+    other code and the excluded code is put back, in a single int32 array. The per reporting unit patch statistics of
+    calculate.getPatchNumbers are computed here from a sparse cross-tabulation of zones and patch labels.
+
+"""
+import numpy as np
+
+from . import reclass
+
+# NoData value of patch arrays. The other (0) and excluded (-9999) codes are valid patch array values.
+patchNoData = np.iinfo(np.int32).min
+
+
+def reclassifyInOutOther(landCoverArray, classValues, excludedValues, newValuesList, noDataMask=None):
+    """ Reclassify a land cover array into class, excluded and other codes with one lookup table pass.
+
+        **Arguments:**
+
+        * *landCoverArray* - NumPy integer array of land cover values
+        * *classValues* - collection of the land cover values in the selected class
+        * *excludedValues* - collection of the land cover values tagged excluded in the LCC file
+        * *newValuesList* - list of the new codes: [class code, excluded code, other code]
+        * *noDataMask* - optional boolean NumPy array marking the NoData cells, which are set to patchNoData
+
+        **Returns:**
+
+        * int32 NumPy array
+
+    """
+    lookupTable = reclass.getInOutOtherLookupTable(classValues, excludedValues, newValuesList, np.int32)
+
+    return lookupTable.apply(landCoverArray, noDataMask, patchNoData)
+
+
+def getRuns(classMask):
+    """ Return the row, start column and end column (exclusive) of each horizontal run of True cells, in scan order """
+
+    nRows, nCols = classMask.shape
+    padded = np.zeros((nRows, nCols + 2), dtype=np.int8)
+    padded[:, 1:-1] = classMask
+    edges = np.diff(padded, axis=1)
+    runRows, runStarts = np.nonzero(edges == 1)
+    runEnds = np.nonzero(edges == -1)[1]
+
+    return runRows, runStarts, runEnds
+
+
+def getTouchingRunPairs(runRows, runStarts, runEnds, nCols):
+    """ Return the index pairs of runs that touch a run in the previous row, diagonals included
+
+        Runs are numbered in scan order, so the runs of the previous row that touch a run form a contiguous range that
+        is found with two binary searches.
+    """
+
+    rowWidth = nCols + 2
+    startKeys = runRows * rowWidth + runStarts
+    endKeys = runRows * rowWidth + runEnds
+    previousRowKeys = (runRows - 1) * rowWidth
+
+    # previous row runs ending at or after this run's start column, and starting at or before its end column
+    firstTouching = np.searchsorted(endKeys, previousRowKeys + runStarts, side="left")
+    lastTouching = np.searchsorted(startKeys, previousRowKeys + runEnds, side="right") - 1
+    pairCounts = np.maximum(lastTouching - firstTouching + 1, 0)
+
+    runIndexes = np.repeat(np.arange(len(runStarts)), pairCounts)
+    pairOffsets = np.arange(pairCounts.sum()) - np.repeat(np.cumsum(pairCounts) - pairCounts, pairCounts)
+    touchingIndexes = np.repeat(firstTouching, pairCounts) + pairOffsets
+
+    return runIndexes, touchingIndexes
+
+
+def labelRuns(classMask):
+    """ Label the 8-connected patches of a boolean mask with a union-find over horizontal runs of cells.
+
+        **Description:**
+
+        Each run of class cells in a row is a node. Runs that touch a run in the previous row are joined, always
+        keeping the earlier run as the root, so each patch's root is its first run in scan order. Patches are then
+        numbered from 1 in scan order, matching scipy.ndimage.label.
+
+        **Arguments:**
+
+        * *classMask* - two dimensional boolean NumPy array
+
+        **Returns:**
+
+        * int32 NumPy array of patch labels; cells outside the mask are 0
+        * integer number of patches
+
+    """
+    nRows, nCols = classMask.shape
+    labelArray = np.zeros((nRows, nCols), dtype=np.int32)
+    runRows, runStarts, runEnds = getRuns(classMask)
+    numRuns = len(runStarts)
+    if numRuns == 0:
+        return labelArray, 0
+
+    parent = list(range(numRuns))
+    runIndexes, touchingIndexes = getTouchingRunPairs(runRows, runStarts, runEnds, nCols)
+    for i, j in zip(runIndexes.tolist(), touchingIndexes.tolist()):
+        # find both roots, halving the paths along the way
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        while parent[j] != j:
+            parent[j] = parent[parent[j]]
+            j = parent[j]
+        if i < j:
+            parent[j] = i
+        elif j < i:
+            parent[i] = j
+
+    # parents always precede their children, so a single forward pass resolves every run to its root
+    roots = parent
+    for i in range(numRuns):
+        roots[i] = roots[roots[i]]
+    roots = np.array(roots, dtype=np.int64)
+
+    uniqueRoots = np.unique(roots)
+    runLabels = (np.searchsorted(uniqueRoots, roots) + 1).astype(np.int32)
+
+    # paint the labels of the runs into the label array
+    runLengths = runEnds - runStarts
+    runOffsets = np.cumsum(runLengths) - runLengths
+    cellIndexes = (np.arange(runLengths.sum()) - np.repeat(runOffsets, runLengths) +
+                   np.repeat(runRows * nCols + runStarts, runLengths))
+    labelArray.ravel()[cellIndexes] = np.repeat(runLabels, runLengths)
+
+    return labelArray, len(uniqueRoots)
+
+
+def labelPatches(classMask):
+    """ Label the 8-connected patches of a boolean mask, numbered from 1 in scan order.
+
+        scipy.ndimage.label is used when SciPy is installed; otherwise the patches are found with labelRuns.
+
+        **Returns:**
+
+        * int32 NumPy array of patch labels; cells outside the mask are 0
+        * integer number of patches
+
+    """
+    try:
+        from scipy import ndimage
+    except ImportError:
+        return labelRuns(classMask)
+
+    labelArray, numPatches = ndimage.label(classMask, structure=np.ones((3, 3), dtype=bool), output=np.int32)
+    return labelArray, numPatches
+
+
+def _getSeamPairs(labelArray, blockSize):
+    """ Return the unique pairs of different labels that touch across a tile seam, diagonals included """
+
+    nRows, nCols = labelArray.shape
+    shifts = ((slice(None), slice(None)), (slice(None, -1), slice(1, None)), (slice(1, None), slice(None, -1)))
+    pairList = [np.zeros((0, 2), dtype=labelArray.dtype)]
+    for seamRow in range(blockSize, nRows, blockSize):
+        for firstShift, secondShift in shifts:
+            pairList.append(np.column_stack((labelArray[seamRow - 1][firstShift], labelArray[seamRow][secondShift])))
+    for seamCol in range(blockSize, nCols, blockSize):
+        for firstShift, secondShift in shifts:
+            pairList.append(np.column_stack((labelArray[:, seamCol - 1][firstShift],
+                                             labelArray[:, seamCol][secondShift])))
+
+    pairs = np.concatenate(pairList)
+    pairs = pairs[(pairs[:, 0] > 0) & (pairs[:, 1] > 0) & (pairs[:, 0] != pairs[:, 1])]
+
+    return np.unique(pairs, axis=0)
+
+
+def labelPatchesByTile(classMask, blockSize=4096):
+    """ Label the 8-connected patches of a boolean mask one tile at a time, with the same labels as labelPatches.
+
+        **Description:**
+
+        Each tile of *blockSize* rows and columns is labeled on its own, so the scratch memory used by the labeling is
+        bounded by the tile size. Tile labels that touch across a tile seam, diagonals included, are joined with a
+        union-find, and the joined patches are numbered from 1 in scan order of their first cell, so the labels are
+        the same as those of the whole mask labeled at once.
+
+        **Arguments:**
+
+        * *classMask* - two dimensional boolean NumPy array
+        * *blockSize* - number of rows and columns in a tile
+
+        **Returns:**
+
+        * int32 NumPy array of patch labels; cells outside the mask are 0
+        * integer number of patches
+
+    """
+    from .zonal import iterBlocks
+
+    nRows, nCols = classMask.shape
+    if nRows <= blockSize and nCols <= blockSize:
+        return labelPatches(classMask)
+
+    windows = [(slice(rowOffset, rowOffset + blockRows), slice(colOffset, colOffset + blockCols))
+               for rowOffset, colOffset, blockRows, blockCols in iterBlocks(nRows, nCols, blockSize)]
+
+    # label the tiles, numbering the labels of each tile after those of the tiles before it
+    labelArray = np.zeros((nRows, nCols), dtype=np.int32)
+    firstCellList = [np.zeros(1, dtype=np.int64)]
+    numLabels = 0
+    for rowWindow, colWindow in windows:
+        tileLabels, tileCount = labelPatches(classMask[rowWindow, colWindow])
+        if tileCount == 0:
+            continue
+
+        # the scan order of a tile follows the scan order of the whole mask, so the first cell of each label in the
+        # tile is its first cell in the mask
+        rows, cols = np.nonzero(tileLabels)
+        _tileLabelValues, firstIndexes = np.unique(tileLabels[rows, cols], return_index=True)
+        firstCellList.append((rows[firstIndexes] + rowWindow.start).astype(np.int64) * nCols +
+                             cols[firstIndexes] + colWindow.start)
+
+        tileLabels[rows, cols] += numLabels
+        labelArray[rowWindow, colWindow] = tileLabels
+        numLabels += tileCount
+
+    # join the labels touching across the seams, always keeping the smaller label as the root
+    parent = list(range(numLabels + 1))
+    for i, j in _getSeamPairs(labelArray, blockSize).tolist():
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        while parent[j] != j:
+            parent[j] = parent[parent[j]]
+            j = parent[j]
+        if i < j:
+            parent[j] = i
+        elif j < i:
+            parent[i] = j
+
+    # parents always precede their children, so a single forward pass resolves every label to its root
+    roots = parent
+    for i in range(numLabels + 1):
+        roots[i] = roots[roots[i]]
+    roots = np.array(roots, dtype=np.int64)
+
+    # number the patches in scan order of their first cell
+    firstCells = np.concatenate(firstCellList)
+    patchFirstCells = np.full(numLabels + 1, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(patchFirstCells, roots, firstCells)
+    uniqueRoots = np.unique(roots[1:])
+    patchNumbers = np.zeros(numLabels + 1, dtype=np.int32)
+    patchNumbers[uniqueRoots[np.argsort(patchFirstCells[uniqueRoots])]] = np.arange(1, len(uniqueRoots) + 1)
+    labelLookup = patchNumbers[roots]
+
+    for rowWindow, colWindow in windows:
+        labelArray[rowWindow, colWindow] = labelLookup[labelArray[rowWindow, colWindow]]
+
+    return labelArray, len(uniqueRoots)
+
+
+def _dilateWithDisk(classMask, maxSeparation):
+    """ Binary dilation of a boolean mask with a disk of radius maxSeparation cells, for when SciPy is not installed
+
+        The disk is processed one row offset at a time: the mask is first dilated along its rows by the half width of
+        the disk at that offset, using a cumulative sum, and then shifted by the row offset.
+    """
+    nRows, nCols = classMask.shape
+    grownMask = np.zeros_like(classMask)
+    cumulativeCounts = np.zeros((nRows, nCols + 1), dtype=np.int32)
+    np.cumsum(classMask, axis=1, out=cumulativeCounts[:, 1:])
+
+    columns = np.arange(nCols)
+    rowDilations = {}
+    for rowOffset in range(-maxSeparation, maxSeparation + 1):
+        halfWidth = int(np.sqrt(maxSeparation * maxSeparation - rowOffset * rowOffset))
+        if halfWidth not in rowDilations:
+            starts = np.maximum(columns - halfWidth, 0)
+            stops = np.minimum(columns + halfWidth + 1, nCols)
+            rowDilations[halfWidth] = cumulativeCounts[:, stops] > cumulativeCounts[:, starts]
+        rowDilation = rowDilations[halfWidth]
+
+        # shifts of the whole mask height or more move every cell off the mask
+        if abs(rowOffset) >= nRows:
+            continue
+        if rowOffset >= 0:
+            grownMask[rowOffset:] |= rowDilation[:nRows - rowOffset]
+        else:
+            grownMask[:rowOffset] |= rowDilation[-rowOffset:]
+
+    return grownMask
+
+
+def growClassMask(classMask, maxSeparation, blockSize=4096):
+    """ Return the cells whose center is within maxSeparation cells of the center of a class cell.
+
+        **Description:**
+
+        This is the in-memory equivalent of thresholding arcpy.sa.EucDistance at the maximum separation distance. The
+        mask is processed in tiles of *blockSize* rows and columns. Each tile is read with a halo of maxSeparation cells
+        so that class cells in the neighboring tiles are taken into account. The exact Euclidean distance transform from
+        scipy.ndimage is thresholded when SciPy is installed; otherwise the tile is dilated with a disk.
+
+        **Arguments:**
+
+        * *classMask* - boolean NumPy array of the class cells
+        * *maxSeparation* - integer distance in cells
+        * *blockSize* - number of rows and columns in a tile
+
+        **Returns:**
+
+        * boolean NumPy array
+
+    """
+    from .zonal import iterBlocks
+
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+
+    nRows, nCols = classMask.shape
+    grownMask = np.zeros_like(classMask, dtype=bool)
+
+    for rowOffset, colOffset, blockRows, blockCols in iterBlocks(nRows, nCols, blockSize):
+        haloTop = max(rowOffset - maxSeparation, 0)
+        haloLeft = max(colOffset - maxSeparation, 0)
+        haloBottom = min(rowOffset + blockRows + maxSeparation, nRows)
+        haloRight = min(colOffset + blockCols + maxSeparation, nCols)
+        haloMask = classMask[haloTop:haloBottom, haloLeft:haloRight]
+        if not haloMask.any():
+            continue
+
+        if ndimage is None:
+            haloGrown = _dilateWithDisk(haloMask, maxSeparation)
+        else:
+            haloGrown = ndimage.distance_transform_edt(~haloMask) <= maxSeparation
+
+        coreTop = rowOffset - haloTop
+        coreLeft = colOffset - haloLeft
+        grownMask[rowOffset:rowOffset + blockRows, colOffset:colOffset + blockCols] = \
+            haloGrown[coreTop:coreTop + blockRows, coreLeft:coreLeft + blockCols]
+
+    return grownMask
+
+
+def labelPatchesWithinSeparation(classMask, maxSeparation, blockSize=4096):
+    """ Label the patches of a boolean mask where class cells within maxSeparation cells belong to the same patch.
+
+        **Description:**
+
+        The class mask is grown by the maximum separation (see growClassMask), the grown mask is labeled as 8-connected
+        patches one tile at a time (see labelPatchesByTile), and the labels are projected back onto the class cells so
+        that each patch keeps its original boundaries. This matches the EucDistance, RegionGroup and Con steps of
+        raster.createPatchRaster. Every grown patch contains at least one class cell, so the labels stay numbered from 1
+        without gaps.
+
+        **Returns:**
+
+        * int32 NumPy array of patch labels; cells outside the mask are 0
+        * integer number of patches
+
+    """
+    if maxSeparation <= 0:
+        return labelPatchesByTile(classMask, blockSize)
+
+    labelArray, numPatches = labelPatchesByTile(growClassMask(classMask, maxSeparation, blockSize), blockSize)
+    labelArray[~classMask] = 0
+
+    return labelArray, numPatches
+
+
+def createPatchArray(reclassArray, classValue, otherValue, excludedValue, minPatchSize=1, maxSeparation=0, 
+                     blockSize=4096):
+    """ Create the patch array for a reclassified land cover array.
+
+        **Description:**
+
+        The class cells are labeled as 8-connected patches numbered from 1; when *maxSeparation* is greater than 0,
+        class cells within that distance of each other are in the same patch. Patches smaller than *minPatchSize* cells
+        are set to *otherValue* using a np.bincount of the labels; their label numbers are not reused. Other cells are
+        set to *otherValue*, excluded cells keep *excludedValue*, and NoData cells keep patchNoData.
+
+        **Arguments:**
+
+        * *reclassArray* - int32 NumPy array from reclassifyInOutOther
+        * *classValue* - the code of the class cells
+        * *otherValue* - the code of cells not in the class
+        * *excludedValue* - the code of excluded cells
+        * *minPatchSize* - the smallest number of cells in a patch
+        * *maxSeparation* - the largest distance, in cells, between class cells of the same patch
+        * *blockSize* - number of rows and columns in a tile
+
+        **Returns:**
+
+        * int32 NumPy array of patch labels, otherValue, excludedValue and patchNoData
+
+    """
+    patchArray, _numPatches = labelPatchesWithinSeparation(reclassArray == classValue, maxSeparation, blockSize)
+
+    if minPatchSize > 1:
+        patchSizes = np.bincount(patchArray.ravel())
+        smallPatches = patchSizes < minPatchSize
+        smallPatches[0] = False
+        patchArray[smallPatches[patchArray]] = otherValue
+
+    if otherValue != 0:
+        patchArray[patchArray == 0] = otherValue
+    patchArray[reclassArray == excludedValue] = excludedValue
+    patchArray[reclassArray == patchNoData] = patchNoData
+
+    return patchArray
+
+
+def getZonePatchStatistics(zoneIndexes, gridValues, areas, numZones, otherValue=0, excludedValue=-9999):
+    """ Compute the patch statistics of every zone from a sparse (zone, patch label) area cross-tabulation.
+
+        **Description:**
+
+        Each entry of the cross-tabulation is the area of one patch label, or of the other or excluded code, within
+        one zone. A patch that crosses zone boundaries contributes only its area inside each zone. Entries for the
+        same zone and label (e.g., from multipart reporting units) are summed first. Statistics are then grouped by
+        zone with np.bincount, and the median patch area is taken from a sort of the patch areas by zone and area.
+
+        **Arguments:**
+
+        * *zoneIndexes* - NumPy integer array of zero based zone indexes, one per entry
+        * *gridValues* - NumPy integer array of patch labels, otherValue or excludedValue, one per entry
+        * *areas* - NumPy array of the area of each entry
+        * *numZones* - the number of zones
+        * *otherValue* - the code of cells not in the class
+        * *excludedValue* - the code of excluded cells
+
+        **Returns:**
+
+        * dictionary of NumPy arrays, one value per zone, keyed to: numPatch, patchArea, lrgPatch, mdnPatch, avePatch,
+          lrgProportion, otherArea, excludedArea
+
+    """
+    zoneIndexes = np.asarray(zoneIndexes, dtype=np.int64)
+    gridValues = np.asarray(gridValues, dtype=np.int64)
+    areas = np.asarray(areas, dtype=np.float64)
+
+    # sum the entries sharing a zone and label; the unique keys are sorted by zone, then label
+    pairKeys, inverse = np.unique((zoneIndexes << 32) | (gridValues & 0xFFFFFFFF), return_inverse=True)
+    areas = np.bincount(inverse.ravel(), weights=areas, minlength=len(pairKeys))
+    zoneIndexes = pairKeys >> 32
+    gridValues = (pairKeys & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
+
+    isOther = gridValues == otherValue
+    isExcluded = gridValues == excludedValue
+    isPatch = ~isOther & ~isExcluded
+    otherArea = np.bincount(zoneIndexes[isOther], weights=areas[isOther], minlength=numZones)
+    excludedArea = np.bincount(zoneIndexes[isExcluded], weights=areas[isExcluded], minlength=numZones)
+
+    patchZones = zoneIndexes[isPatch]
+    patchAreas = areas[isPatch]
+    numPatch = np.bincount(patchZones, minlength=numZones)
+    patchArea = np.bincount(patchZones, weights=patchAreas, minlength=numZones)
+
+    lrgPatch = np.zeros(numZones, dtype=np.float64)
+    mdnPatch = np.zeros(numZones, dtype=np.float64)
+    if patchZones.size:
+        np.maximum.at(lrgPatch, patchZones, patchAreas)
+
+        # order the patch areas by zone, then by area, and pick the middle one or two of each zone
+        sortedAreas = patchAreas[np.lexsort((patchAreas, patchZones))]
+        zoneStarts = np.cumsum(numPatch) - numPatch
+        hasPatches = numPatch > 0
+        lowerMiddle = zoneStarts[hasPatches] + (numPatch[hasPatches] - 1) // 2
+        upperMiddle = zoneStarts[hasPatches] + numPatch[hasPatches] // 2
+        mdnPatch[hasPatches] = (sortedAreas[lowerMiddle] + sortedAreas[upperMiddle]) / 2.0
+
+    avePatch = np.zeros(numZones, dtype=np.float64)
+    lrgProportion = np.zeros(numZones, dtype=np.float64)
+    hasPatches = numPatch > 0
+    avePatch[hasPatches] = patchArea[hasPatches] / numPatch[hasPatches]
+    lrgProportion[hasPatches] = (lrgPatch[hasPatches] / patchArea[hasPatches]) * 100
+
+    return {"numPatch": numPatch, "patchArea": patchArea, "lrgPatch": lrgPatch, "mdnPatch": mdnPatch,
+            "avePatch": avePatch, "lrgProportion": lrgProportion, "otherArea": otherArea, "excludedArea": excludedArea}
+
+
+def getBoundaryCells(zoneArray, patchArray, zoneNoData=-1):
+    """ Return the row and column indexes of the patch cells on the boundary of their patch within their zone
+
+        A patch cell is on the boundary when one of its four neighbors lies in a different patch or zone, or outside
+        the array. The closest distance between two patches is always found between boundary cells.
+    """
+    nRows, nCols = patchArray.shape
+    boundary = np.zeros((nRows, nCols), dtype=bool)
+    boundary[0, :] = boundary[-1, :] = True
+    boundary[:, 0] = boundary[:, -1] = True
+
+    for first, second in (((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+                          ((slice(None), slice(1, None)), (slice(None), slice(None, -1)))):
+        differs = (patchArray[first] != patchArray[second]) | (zoneArray[first] != zoneArray[second])
+        boundary[first] |= differs
+        boundary[second] |= differs
+
+    boundary &= (patchArray > 0) & (zoneArray != zoneNoData)
+
+    return np.nonzero(boundary)
+
+
+def _getCellGaps(queryRows, queryCols, rows, cols):
+    """ Return the edge to edge distance, in cells, between square cells given their row and column indexes """
+
+    rowGaps = np.maximum(np.abs(rows - queryRows) - 1, 0)
+    colGaps = np.maximum(np.abs(cols - queryCols) - 1, 0)
+
+    return np.sqrt(rowGaps * rowGaps + colGaps * colGaps)
+
+
+def _getNearestOtherPatchGapsByTree(rows, cols, labels, cKDTree):
+    """ Return, for every boundary cell, the edge to edge distance to the closest cell of a different patch
+
+        The cells' centers are placed in a scipy.spatial.cKDTree, passed in as *cKDTree*. Each cell is queried for its k
+        nearest centers, with k doubled for cells whose neighbors are all in their own patch. The edge to edge gap
+        between two cells is at least their center distance minus the square root of 2, so once the nearest center of
+        another patch is at distance d, every cell with a smaller gap lies within d + sqrt(2) and is checked with the
+        exact gap.
+    """
+    points = np.column_stack((rows, cols)).astype(np.float64)
+    tree = cKDTree(points)
+    numCells = len(points)
+    gaps = np.full(numCells, np.inf)
+
+    pending = np.arange(numCells)
+    k = min(8, numCells)
+    while pending.size:
+        distances, indexes = tree.query(points[pending], k=k)
+        distances = distances.reshape(len(pending), k)
+        indexes = indexes.reshape(len(pending), k)
+
+        isOther = labels[indexes] != labels[pending][:, np.newaxis]
+        nearestOther = np.where(isOther, distances, np.inf).min(axis=1)
+        searchRadius = nearestOther + np.sqrt(2.0)
+        resolved = np.isfinite(nearestOther) & (distances[:, -1] > searchRadius)
+        if k == numCells:
+            resolved[:] = True
+
+        candidates = isOther & (distances <= searchRadius[:, np.newaxis])
+        cellGaps = _getCellGaps(rows[pending][:, np.newaxis], cols[pending][:, np.newaxis], rows[indexes], cols[indexes])
+        gaps[pending[resolved]] = np.where(candidates, cellGaps, np.inf).min(axis=1)[resolved]
+
+        pending = pending[~resolved]
+        k = min(k * 2, numCells)
+
+    return gaps
+
+
+def _getNearestOtherPatchGapsByChunks(rows, cols, labels, chunkSize=1024):
+    """ Brute force version of _getNearestOtherPatchGapsByTree for when SciPy is not installed """
+
+    gaps = np.full(len(rows), np.inf)
+    for start in range(0, len(rows), chunkSize):
+        stop = start + chunkSize
+        cellGaps = _getCellGaps(rows[start:stop, np.newaxis], cols[start:stop, np.newaxis], rows, cols)
+        cellGaps[labels[start:stop, np.newaxis] == labels] = np.inf
+        gaps[start:stop] = cellGaps.min(axis=1)
+
+    return gaps
+
+
+def getNearestPatchDistances(zoneArray, patchArray, cellSize, zoneNoData=-1):
+    """ Compute the mean distance to the closest patch (MDCP) of every zone.
+
+        **Description:**
+
+        Patches are clipped to each zone, as in vector.tabulateMDCP. Only the boundary cells of each patch are used.
+        For every patch, the distance to the closest other patch in the same zone is the smallest edge to edge
+        distance between their cells, which matches the polygon distance reported by GenerateNearTable. It is found
+        with a KD-tree per zone when SciPy is installed, otherwise by brute force in chunks.
+
+        **Arguments:**
+
+        * *zoneArray* - NumPy integer array of zone codes
+        * *patchArray* - NumPy integer array of patch labels (greater than 0) aligned with zoneArray
+        * *cellSize* - the width of a cell in map units
+        * *zoneNoData* - the code used for cells outside of any zone
+
+        **Returns:**
+
+        * dictionary keyed to zone code of a (PWN, PWON, MDCP) tuple: the number of patches with a neighbor, the 
+          number of patches without a neighbor and the mean distance to the closest patch. Zones without patches are
+          not included.
+
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        cKDTree = None
+
+    rows, cols = getBoundaryCells(zoneArray, patchArray, zoneNoData)
+    zones = zoneArray[rows, cols]
+    labels = patchArray[rows, cols]
+
+    # group the boundary cells by zone
+    order = np.argsort(zones, kind="stable")
+    rows, cols, zones, labels = rows[order], cols[order], zones[order], labels[order]
+    zoneCodes, zoneStarts, zoneCounts = np.unique(zones, return_index=True, return_counts=True)
+
+    results = {}
+    for zoneCode, start, count in zip(zoneCodes.tolist(), zoneStarts.tolist(), zoneCounts.tolist()):
+        zoneRows = rows[start:start + count].astype(np.int64)
+        zoneCols = cols[start:start + count].astype(np.int64)
+        zoneLabels = labels[start:start + count]
+        patchLabels, labelIndexes = np.unique(zoneLabels, return_inverse=True)
+        numPatch = len(patchLabels)
+
+        if numPatch == 1:
+            results[zoneCode] = (0, 1, 0.0)
+            continue
+
+        # the closest other patch of each patch is the smallest gap of any of its boundary cells
+        if cKDTree is None:
+            cellGaps = _getNearestOtherPatchGapsByChunks(zoneRows, zoneCols, zoneLabels)
+        else:
+            cellGaps = _getNearestOtherPatchGapsByTree(zoneRows, zoneCols, zoneLabels, cKDTree)
+        patchGaps = np.full(numPatch, np.inf)
+        np.minimum.at(patchGaps, labelIndexes.ravel(), cellGaps)
+
+        results[zoneCode] = (numPatch, 0, float(patchGaps.mean() * cellSize))
+
+    return results
@@ -91,57 +91,104 @@ def findOverlaps(polyFc):
         **Description:**
         Identify polygons that have overlapping areas with other polygons in the same theme and generate a set of their 
         OID field value. Nested polygons (i.e., polygons contained within the boundaries of another polygon) are also
-        selected with this routine. 
+        selected with this routine. The features are read once and their envelopes are indexed with an R-tree (see
+        spatialindex.iterIntersectingPairs), so the overlaps, contains and within tests only run on pairs of polygons
+        whose envelopes intersect.
         **Arguments:**
         * *polyFc* - Polygon Feature Class
            
          **Returns:** 
          * set - A set of OID field values, a dictionary of overlaps, and OID field name
 """ 
+    from . import spatialindex
+
     overlapSet = set()
     overlapDict = {}
     
     oidField = arcpy.ListFields(polyFc, '', 'OID')[0]
     
-    # Get a count of the number of reporting units to give an accurate progress estimate.
-    n = int(arcpy.GetCount_management(polyFc).getOutput(0))
+    oidList, shapeList, boxes = _getPolygonEnvelopes(polyFc)
+    
     # Initialize custom progress indicator
-    loopProgress = messages.loopProgress(n)
+    loopProgress = messages.loopProgress(len(oidList))
     
-    for row in arcpy.SearchCursor(polyFc, '', '', 'Shape; %s' % oidField.name):
-        idlist = []
-        for row2 in arcpy.SearchCursor(polyFc, '', '', 'Shape; %s' % oidField.name):
-            # check to see if the polygon overlaps the second shape, or if the second shape is nested within
-            if row2.Shape.overlaps(row.Shape) or row2.Shape.contains(row.Shape) and not row2.Shape.equals(row.Shape):
-                overlapSet.add(row.getValue(oidField.name))
-                overlapSet.add(row2.getValue(oidField.name))
-
-                if row.getValue(oidField.name) not in overlapDict.keys():
-                    idlist.append(row2.getValue(oidField.name))
-                    overlapDict[row.getValue(oidField.name)] = idlist
-                elif row.getValue(oidField.name) in overlapDict.keys():
-                    idlist = overlapDict[row.getValue(oidField.name)]
-                    idlist.append(row2.getValue(oidField.name))
-            elif row2.Shape.within(row.Shape)and not row2.Shape.equals(row.Shape):
-                print("Shape Within")
-                overlapSet.add(row.getValue(oidField.name))
-                overlapSet.add(row2.getValue(oidField.name))
-
-                if row.getValue(oidField.name) not in overlapDict.keys():
-                    idlist.append(row2.getValue(oidField.name))
-                    overlapDict[row.getValue(oidField.name)] = idlist
-                elif row.getValue(oidField.name) in overlapDict.keys():
-                    idlist = overlapDict[row.getValue(oidField.name)]
-                    idlist.append(row2.getValue(oidField.name))
-                    
+    # the overlapping polygons of each polygon, by cursor position
+    neighborLists = [[] for _oid in oidList]
+    lastIndex = -1
+    for i, j in spatialindex.iterIntersectingPairs(boxes):
+        for _index in range(lastIndex, i):
+            loopProgress.update()
+        lastIndex = i
+        
+        # the test is symmetric for the pair, so each pair is tested once
+        if _isOverlapPair(shapeList[i], shapeList[j]):
+            neighborLists[i].append(j)
+            neighborLists[j].append(i)
+    for _index in range(lastIndex, len(oidList) - 1):
         loopProgress.update()
+    
+    # the dictionary lists the overlapping OIDs of each polygon in cursor order, as a nested cursor would find them
+    for i, neighbors in enumerate(neighborLists):
+        if neighbors:
+            overlapSet.add(oidList[i])
+            overlapDict[oidList[i]] = [oidList[j] for j in sorted(neighbors)]
 
     return overlapSet, oidField.name, overlapDict
 
+
+def hasOverlaps(polyFc):
+    """ Check whether any polygon features in a theme overlap, or are nested within, one another.
+        **Description:**
+        Uses the same envelope index and overlap tests as findOverlaps, but stops at the first overlapping pair.
+        **Arguments:**
+        * *polyFc* - Polygon Feature Class
+           
+         **Returns:** 
+         * boolean - True if at least two polygons overlap
+"""
+    from . import spatialindex
+
+    _oidList, shapeList, boxes = _getPolygonEnvelopes(polyFc)
+    for i, j in spatialindex.iterIntersectingPairs(boxes):
+        if _isOverlapPair(shapeList[i], shapeList[j]):
+            return True
+
+    return False
+
+
+def _getPolygonEnvelopes(polyFc):
+    """ Read the OID, geometry and envelope of every polygon feature that has a geometry, in cursor order
+
+        Features with a null or empty geometry overlap nothing, so they are left out rather than given an envelope the
+        spatial index would reject. The envelopes are returned as a NumPy array of (xMin, yMin, xMax, yMax) rows.
+    """
+    import numpy as np
+
+    oidList = []
+    shapeList = []
+    boxList = []
+    with arcpy.da.SearchCursor(polyFc, ["OID@", "SHAPE@"]) as cursor:
+        for oid, shape in cursor:
+            if shape is None or not shape.pointCount:
+                continue
+            oidList.append(oid)
+            shapeList.append(shape)
+            boxList.append((shape.extent.XMin, shape.extent.YMin, shape.extent.XMax, shape.extent.YMax))
+
+    return oidList, shapeList, np.array(boxList, dtype=np.float64).reshape((-1, 4))
+
+
+def _isOverlapPair(shape1, shape2):
+    """ Return True if two polygons overlap, or if one is nested within the other """
+
+    return shape2.overlaps(shape1) or ((shape2.contains(shape1) or shape2.within(shape1)) and not shape2.equals(shape1))
+
 def findNonOverlapGroups(overlapDict):
     """ Create a dictionary of unique non overlapping polygons 
         *** Description: ****
-        Creates a dictionary of unique list of polygons that do not overlap.
+        Creates a dictionary of unique list of polygons that do not overlap. The groups are the colors of a greedy
+        DSATUR coloring of the overlap graph (see spatialindex.colorOverlapGraph), which keeps the number of groups,
+        and so of nonoverlapping layers, small.
         
         *** Arguments: ***  
         * *Dictionary* - Dictionary of overlapping OIDs
@@ -151,40 +198,9 @@ def findNonOverlapGroups(overlapDict):
         * dictionary - A dictionary of OIDs that belong to a group of nonoverlapping polygons 
       
     """ 
-    group = 1
-    nonoverlapGroupDict = {}
-    while len(overlapDict) != 0:
-        alist = []
-        #get the first OID in the overlap Dictionary
-        k = list(overlapDict.keys())[0]
-        # loop through the dictionary to check which polygons the first oid overlaps
-        for z in overlapDict.keys():
-            #if OID is not in the overlapDict value for a key then add that key to a list - this means these oids don't overlap the first OID
-            if k not in overlapDict[z]:
-                alist.append(z)
-        #for each of the OID in alist         
-        for a in alist:
-            #Loop through the overlapDict
-            for k in overlapDict.keys():
-                #if the OID is in alist
-                if k in alist:
-                    #then loop through alist
-                    for a in alist:
-                        #Check to see if any of the OIDs overlap any of the others in the list
-                        #if it does then remove it from alist
-                        if a in overlapDict[k]:
-                            alist.remove(a)
-
-
-        #Create a new dictionary that groups non overlapping polygons
-        nonoverlapGroupDict[group] = alist
-        #For each of the OIDs in alist remove them from the overlap Dictionary
-        for a in alist:
-            del overlapDict[a]
-        group = group + 1
-    print(nonoverlapGroupDict)
-
-    return nonoverlapGroupDict
+    from . import spatialindex
+
+    return spatialindex.colorOverlapGraph(overlapDict)
 
 def createNonOverlapLayers(overlapList, nonoverlapGroupDict, OID, inputLayer, outputLoc, ext):
     """ Create a series of nonoverlapping polygon layers
@@ -10,8 +10,15 @@ from .messages import AddMsg
 ## this is the code copied from pylet-master\pylet\arcpyutil\raster.py
 import arcpy as _arcpy
 from arcpy.sa.Functions import CreateConstantRaster
+from . import edgecore
 from . import files
+from . import focal
+from . import kernels
+from . import patches
+from . import rasterwriter
+from . import reclass
 from .log import logArcpy
+from ATtILA2.constants import globalConstants
 from ATtILA2.datetimeutil import DateTimer
 
 timer = DateTimer()
@@ -396,6 +403,99 @@ def getEdgeCoreGrid(m, lccObj, lccClassesDict, inLandCoverGrid, PatchEdgeWidth_s
     updateCategoryLabels(zonesGrid, categoryDict)
             
     return zonesGrid 
+
+
+def getEdgeCoreArrays(m, lccObj, lccClassesDict, inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, 
+                      edgeWidthList, timer, shortName, scratchNameReference, logFile, saveIntermediate=False):
+    """ Compute the core and edge categories of a land cover class as arrays aligned with the reporting unit zones.
+
+        **Description:**
+
+        This is the array counterpart of getEdgeCoreGrid. The reporting units are rasterized onto the land cover grid's
+        cells. The land cover is read over the zone extent plus a margin equal to the edge distance, so that cells just
+        outside the zones are taken into account. It is then classified with edgecore.createCoreEdgeArray for every
+        edge width at once. The category array is saved as a raster with a CATEGORY field only when *saveIntermediate*
+        is True.
+
+        **Arguments:**
+
+        * *m* - the class being processed
+        * *lccObj* - the LandCoverClassification object
+        * *lccClassesDict* - dictionary of the LCC classes
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *edgeWidthList* - list of the edge widths, in cells, as strings
+        * *timer* - DateTimer object used for progress messages
+        * *shortName* - the metric's short name used for the intermediate raster name
+        * *scratchNameReference* - one item list that receives the catalog path of the saved intermediate raster
+        * *logFile* - file object for recording process steps
+        * *saveIntermediate* - True to save the category array as a raster
+
+        **Returns:**
+
+        * NumPy array of zone codes; cells outside any reporting unit are -1
+        * uint8 NumPy array of edgecore category codes (see edgecore.createCoreEdgeArray)
+        * dictionary of zone code to reporting unit id value
+        * float of the area of one cell
+
+    """
+    import math
+
+    landCoverValues = getRasterValues(inLandCoverGrid, logFile)
+    classValuesList = lccClassesDict[m].uniqueValueIds.intersection(landCoverValues)
+    excludedValuesList = lccObj.values.getExcludedValueIds().intersection(landCoverValues)
+
+    landCoverRaster = Raster(inLandCoverGrid)
+    cellWidth = landCoverRaster.meanCellWidth
+    cellHeight = landCoverRaster.meanCellHeight
+    halo = int(math.ceil(edgecore.getSortedWidths(edgeWidthList)[-1] + 0.5))
+
+    # cells read outside of the land cover grid are NoData, which is not a distance source
+    valueNoData = landCoverRaster.noDataValue
+    if valueNoData is None:
+        valueNoData = min(landCoverValues) - 1
+
+    zoneRasterName, zoneIdLookup = _rasterizeReportingUnits(inReportingUnitFeature, reportingUnitIdField,
+                                                            inLandCoverGrid, timer, logFile)
+    try:
+        zoneRaster = Raster(zoneRasterName)
+        lowerLeft = arcpy.Point(zoneRaster.extent.XMin, zoneRaster.extent.YMin)
+        zoneArray = arcpy.RasterToNumPyArray(zoneRaster, lowerLeft, zoneRaster.width, zoneRaster.height, -1)
+        del zoneRaster
+    finally:
+        arcpy.Delete_management(zoneRasterName)
+    nRows, nCols = zoneArray.shape
+
+    AddMsg(f"{timer.now()} Reading the land cover grid into an array with a margin of {halo} cells", 0, logFile)
+    haloLowerLeft = arcpy.Point(lowerLeft.X - halo * cellWidth, lowerLeft.Y - halo * cellHeight)
+    landCoverArray = arcpy.RasterToNumPyArray(landCoverRaster, haloLowerLeft, nCols + 2 * halo, nRows + 2 * halo,
+                                              valueNoData)
+
+    AddMsg(f"{timer.now()} Delimiting Class areas to Edge and Core for edge widths {', '.join(edgeWidthList)} with a distance transform", 0, logFile)
+    coreEdgeArray = edgecore.createCoreEdgeArray(landCoverArray, classValuesList, excludedValuesList, edgeWidthList,
+                                                 landCoverArray == valueNoData, globalConstants.zonalBlockSize)
+    coreEdgeArray = coreEdgeArray[halo:halo + nRows, halo:halo + nCols]
+    del landCoverArray
+
+    if saveIntermediate:
+        namePrefix = f"{shortName}_Raster{m.upper()}{'_'.join(edgeWidthList)}_"
+        scratchName = arcpy.CreateScratchName(namePrefix, "", "RasterDataset")
+        logArcpy("arcpy.NumPyArrayToRaster", ("coreEdgeArray", lowerLeft, cellWidth, cellHeight, edgecore.noDataCode),
+                 logFile)
+        zonesGrid = arcpy.NumPyArrayToRaster(coreEdgeArray, lowerLeft, cellWidth, cellHeight, edgecore.noDataCode)
+        zonesGrid.save(scratchName)
+        del zonesGrid
+        arcpy.management.DefineProjection(scratchName, landCoverRaster.spatialReference)
+        scratchNameReference[0] = scratchName
+
+        buildRAT(scratchName, logFile)
+        logArcpy('arcpy.AddField_management', (scratchName, "CATEGORY", "TEXT", "#", "#", "10"), logFile)
+        arcpy.AddField_management(scratchName, "CATEGORY", "TEXT", "#", "#", "10")
+        updateCategoryLabels(scratchName, edgecore.getCategoryLabels(edgeWidthList))
+
+    cellArea = cellWidth * cellHeight
+    return zoneArray.astype("int64", copy=False), coreEdgeArray, zoneIdLookup, cellArea
     
     
 def createPatchRaster(m, lccObj, lccClassesDict, inLandCoverGrid, metricConst, maxSeparation, minPatchSize, 
@@ -410,6 +510,20 @@ def createPatchRaster(m, lccObj, lccClassesDict, inLandCoverGrid, metricConst, m
     # get the frozenset of excluded values (i.e., values not to use when calculating the reporting unit effective area)
     excludedValuesList = lccValuesDict.getExcludedValueIds().intersection(landCoverValues)
     
+    if globalConstants.patchEngine == "NUMPY":
+        landCoverRaster = Raster(inLandCoverGrid)
+        envConflicts = getArrayEnvironmentConflicts(landCoverRaster)
+        if envConflicts:
+            AddMsg(f"{timer.now()} The {', '.join(envConflicts)} environment settings change the land cover grid. "
+                   f"Building the patch grid with the Spatial Analyst tools.", 0, logFile)
+        elif landCoverRaster.height * landCoverRaster.width > globalConstants.patchEngineMaxCells:
+            AddMsg(f"{timer.now()} The land cover grid is too large to label in memory. Building the patch grid with "
+                   f"the Spatial Analyst tools.", 0, logFile)
+        else:
+            return createPatchRasterFromArray(m, inLandCoverGrid, metricConst, classValuesList, excludedValuesList,
+                                              int(minPatchSize), timer, scratchNameReference, logFile,
+                                              int(maxSeparation))
+    
     # create class (value = 3) / other (value = 0) / excluded grid (value = -9999) raster
     # define the reclass values
     classValue = metricConst.classValue
@@ -482,7 +596,275 @@ def createPatchRaster(m, lccObj, lccClassesDict, inLandCoverGrid, metricConst, m
     
     return regionOtherExcluded
 
+
+def getArrayEnvironmentConflicts(inRaster):
+    """ Get the processing environments that would change a raster read directly into a NumPy array.
+
+        **Description:**
+
+        Spatial Analyst tools honor the extent, cell size, mask, snap raster and output coordinate system environments,
+        but arcpy.RasterToNumPyArray reads the raster's own cells. An array engine gives the same result as the tools
+        only when none of these environments clips, resamples, masks, shifts or projects the raster.
+
+        **Arguments:**
+
+        * *inRaster* - arcpy Raster object
+
+        **Returns:**
+
+        * list of the names of the environments that would change the raster; empty when the array can be used as is
+
+    """
+    from arcpy import env
+
+    envConflicts = []
+    cellWidth = inRaster.meanCellWidth
+    cellHeight = inRaster.meanCellHeight
+    rasterExtent = inRaster.extent
+
+    if env.mask:
+        envConflicts.append("Mask")
+
+    envExtent = env.extent
+    if hasattr(envExtent, "XMin"):
+        extentOffsets = (envExtent.XMin - rasterExtent.XMin, envExtent.XMax - rasterExtent.XMax,
+                         envExtent.YMin - rasterExtent.YMin, envExtent.YMax - rasterExtent.YMax)
+        if max(abs(anOffset) for anOffset in extentOffsets) >= min(cellWidth, cellHeight) / 2:
+            envConflicts.append("Extent")
+
+    envCellSize = env.cellSize
+    if envCellSize and str(envCellSize).upper() not in ("MAXOF", "MINOF"):
+        try:
+            cellSize = float(envCellSize)
+        except (TypeError, ValueError):
+            cellSize = arcpy.Describe(envCellSize).meanCellWidth
+        if max(abs(cellSize - cellWidth), abs(cellSize - cellHeight)) > cellWidth * 1e-6:
+            envConflicts.append("Cell Size")
+
+    if env.snapRaster:
+        snapExtent = arcpy.Describe(env.snapRaster).extent
+        for anOffset, cellSize in ((rasterExtent.XMin - snapExtent.XMin, cellWidth),
+                                   (rasterExtent.YMin - snapExtent.YMin, cellHeight)):
+            cellShift = (anOffset / cellSize) % 1
+            if min(cellShift, 1 - cellShift) > 1e-6:
+                envConflicts.append("Snap Raster")
+                break
+
+    outputCoordinateSystem = env.outputCoordinateSystem
+    if outputCoordinateSystem and outputCoordinateSystem.name != inRaster.spatialReference.name:
+        envConflicts.append("Output Coordinate System")
+
+    return envConflicts
+
     
+def createPatchRasterFromArray(m, inLandCoverGrid, metricConst, classValuesList, excludedValuesList, minPatchSize,
+                               timer, scratchNameReference, logFile, maxSeparation=0):
+    """ Create the patch raster for createPatchRaster with the in-memory patch labeling engine.
+
+        **Description:**
+
+        The land cover grid is read into a NumPy array and reclassified to class, excluded and other codes. The whole
+        grid is held in memory, and the processing environments are not applied, so createPatchRaster only uses this
+        engine when getArrayEnvironmentConflicts finds no conflicts and the grid has at most
+        globalConstants.patchEngineMaxCells cells. The class
+        cells are labeled as 8-connected patches, patches smaller than *minPatchSize* cells become other, and the
+        excluded code is put back (see patches.createPatchArray). When *maxSeparation* is greater than 0, class cells
+        within that many cells of each other are joined with a tiled distance transform instead of EucDistance and a
+        second RegionGroup. The finished patch array is written to disk once.
+
+        **Arguments:**
+
+        * *m* - the class being processed
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *metricConst* - an object with constants specific to the metric being run
+        * *classValuesList* - the grid values in the class
+        * *excludedValuesList* - the grid values tagged excluded in the LCC file
+        * *minPatchSize* - the smallest number of cells in a patch
+        * *timer* - DateTimer object used for progress messages
+        * *scratchNameReference* - one item list that receives the catalog path of the saved patch raster
+        * *logFile* - file object for recording process steps
+        * *maxSeparation* - the largest distance, in cells, between class cells of the same patch
+
+        **Returns:**
+
+        * arcpy Raster object of the saved patch raster
+
+    """
+    classValue = metricConst.classValue
+    excludedValue = metricConst.excludedValue
+    otherValue = metricConst.otherValue
+
+    landCoverRaster = Raster(inLandCoverGrid)
+    lowerLeft = arcpy.Point(landCoverRaster.extent.XMin, landCoverRaster.extent.YMin)
+    valueNoData = landCoverRaster.noDataValue
+
+    AddMsg(f"{timer.now()} Reclassifying land cover to Class:{m} = {classValue}, Other = {otherValue}, and Excluded = {excludedValue}.", 0, logFile)
+    if valueNoData is None:
+        landCoverArray = arcpy.RasterToNumPyArray(landCoverRaster)
+        noDataMask = None
+    else:
+        landCoverArray = arcpy.RasterToNumPyArray(landCoverRaster, nodata_to_value=valueNoData)
+        noDataMask = landCoverArray == valueNoData
+    reclassArray = patches.reclassifyInOutOther(landCoverArray, classValuesList, excludedValuesList,
+                                                [classValue, excludedValue, otherValue], noDataMask)
+    del landCoverArray
+
+    if maxSeparation > 0:
+        AddMsg(f"{timer.now()} Connecting clusters of Class:{m} within maximum separation distance.", 0, logFile)
+    AddMsg(f"{timer.now()} Assigning unique numbers to each unconnected cluster of Class:{m}, eliminating clusters below "
+           f"minimum patch size, and adding excluded class areas.", 0, logFile)
+    patchArray = patches.createPatchArray(reclassArray, classValue, otherValue, excludedValue, minPatchSize,
+                                          maxSeparation, globalConstants.zonalBlockSize)
+    del reclassArray
+
+    namePrefix = f"{metricConst.shortName}_{m}_PatchRast_"
+    scratchName = arcpy.CreateScratchName(namePrefix, "", "RasterDataset")
+    logArcpy("arcpy.NumPyArrayToRaster", ("patchArray", lowerLeft, landCoverRaster.meanCellWidth,
+                                          landCoverRaster.meanCellHeight, patches.patchNoData), logFile)
+    patchRaster = arcpy.NumPyArrayToRaster(patchArray, lowerLeft, landCoverRaster.meanCellWidth,
+                                           landCoverRaster.meanCellHeight, patches.patchNoData)
+    patchRaster.save(scratchName)
+    del patchRaster
+    arcpy.management.DefineProjection(scratchName, landCoverRaster.spatialReference)
+    buildRAT(scratchName, logFile)
+
+    scratchNameReference[0] = arcpy.Describe(scratchName).catalogPath
+    
+    return Raster(scratchName)
+
+
+def getNeighborhoodProportionRasters(inLandCoverGrid, classValuesDict, neighborhoodSize, timer, logFile, keepCounts=False,
+                                     zoneBinStep=None):
+    """ Compute the percentage of class cells in the square neighborhood of every cell with the NumPy focal engine.
+
+        **Description:**
+
+        This replaces the Reclassify, FocalStatistics (NbrRectangle SUM, NODATA) and RasterCalculator steps of
+        Neighborhood Proportions for all of the selected classes at once. The land cover grid is read once, in strips of
+        rows, each with a halo of the rows the neighborhood reaches into. Every strip is reclassified to one uint8 plane
+        per class with a single lookup of class bits (see reclass.getClassBitsLookupTable), the class cells of all planes are counted over every
+        window with one summed area table of the stack (see focal.iterFocalRectangleSums), and the counts are converted
+        directly to a percentage of the window's cell count. When *zoneBinStep* is given, the counts of the same strips
+        are also binned into percent zones (see focal.getPercentZones), replacing the RemapRange Reclassify of the
+        saved proportions grid. Each strip of every grid is streamed into a tiled, compressed GeoTIFF in the scratch
+        folder (see openTiledRasterWriter), so no grid is held in memory whole.
+
+        **Arguments:**
+
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *classValuesDict* - dictionary of class keys (e.g., the class metric base names) to the grid values in each
+                              class
+        * *neighborhoodSize* - the width and height of the neighborhood in cells
+        * *timer* - DateTimer object used for progress messages
+        * *logFile* - file object for recording process steps
+        * *keepCounts* - True to also return the class cell counts (the focal sum grids)
+        * *zoneBinStep* - optional width, in percent, of the percent zones
+
+        **Returns:**
+
+        * dictionary of class keys to a tuple of the arcpy Raster objects of the class percentage, the class cell counts
+          (None when keepCounts is False) and the percent zones (None when zoneBinStep is not given); the rasters are
+          scratch .tif files the caller should delete once they are saved
+
+    """
+    import numpy as np
+
+    landCoverRaster = Raster(inLandCoverGrid)
+    nRows, nCols = landCoverRaster.height, landCoverRaster.width
+    cellWidth, cellHeight = landCoverRaster.meanCellWidth, landCoverRaster.meanCellHeight
+    valueNoData = landCoverRaster.noDataValue
+    reader = ArcpyRasterReader(inLandCoverGrid, landCoverRaster.extent.XMin, landCoverRaster.extent.YMax, nRows, nCols,
+                               cellWidth, cellHeight, valueNoData)
+    classKeys = list(classValuesDict.keys())
+    classBitsTable = reclass.getClassBitsLookupTable([classValuesDict[aKey] for aKey in classKeys])
+
+    def readRows(rowOffset, rowCount):
+        valueArray = reader.readBlock(rowOffset, 0, rowCount, nCols)
+        noDataMask = None if valueNoData is None else valueArray == valueNoData
+        return focal.getClassPlanes(classBitsTable.apply(valueArray), len(classKeys)), noDataMask
+
+    size = int(neighborhoodSize)
+    maxCellCount = kernels.getRectangleCellCount(size, size)
+    # the strip budget is shared by the planes of all classes
+    stripCells = max(globalConstants.focalStripCells // max(len(classKeys), 1), nCols)
+    stripRows = focal.getStripRows(nCols, stripCells, size - 1)
+
+    # one writer per class and grid; None for the grids that are not wanted
+    writersDict = {}
+    try:
+        for aKey in classKeys:
+            writersDict[aKey] = (openTiledRasterWriter(f"{aKey}_Prop_", landCoverRaster, np.float32, logFile),
+                                 openTiledRasterWriter(f"{aKey}_Cnt_", landCoverRaster, np.int32, logFile)
+                                 if keepCounts else None,
+                                 openTiledRasterWriter(f"{aKey}_Zone_", landCoverRaster, np.int16, logFile)
+                                 if zoneBinStep else None)
+
+        AddMsg(f"{timer.now()} Summing the cells of {len(classKeys)} classes in {size} x {size} cell neighborhoods in "
+               f"strips of {stripRows} rows.", 0, logFile)
+        for rowOffset, sumArrays, noDataMask in focal.iterFocalRectangleSums(readRows, nRows, nCols, size, size,
+                                                                             stripRows):
+            percentArrays = ((sumArrays / maxCellCount) * 100).astype(np.float32)
+            zoneArrays = focal.getPercentZones(sumArrays, maxCellCount, zoneBinStep) if zoneBinStep else None
+            if noDataMask is not None:
+                percentArrays[:, noDataMask] = focal.noDataValue
+                sumArrays[:, noDataMask] = focal.noDataValue
+                if zoneBinStep:
+                    zoneArrays[:, noDataMask] = focal.noDataValue
+
+            for k, aKey in enumerate(classKeys):
+                percentWriter, countWriter, zoneWriter = writersDict[aKey]
+                percentWriter.writeRows(percentArrays[k])
+                if countWriter:
+                    countWriter.writeRows(sumArrays[k])
+                if zoneWriter:
+                    zoneWriter.writeRows(zoneArrays[k])
+
+        rastersDict = {}
+        for aKey in classKeys:
+            rastersDict[aKey] = tuple(closeTiledRasterWriter(aWriter, landCoverRaster) if aWriter else None
+                                      for aWriter in writersDict[aKey])
+    except:
+        # abort deletes the unfinished .tif files; the ones already closed are deleted here
+        allWriters = [aWriter for writers in writersDict.values() for aWriter in writers if aWriter]
+        for aWriter in allWriters:
+            aWriter.abort()
+        for aWriter in allWriters:
+            if os.path.exists(aWriter.path):
+                arcpy.Delete_management(aWriter.path)
+        raise
+
+    return rastersDict
+
+
+def openTiledRasterWriter(namePrefix, templateRaster, dtype, logFile=None):
+    """ Open a rasterwriter.TiledRasterWriter for a new .tif in the scratch folder with the extent, cell size and
+        coordinate system of templateRaster. Its NoData value is focal.noDataValue. """
+
+    tiffName = files.getScratchTiffName(namePrefix)
+    spatialReference = templateRaster.spatialReference
+    epsgCode = spatialReference.factoryCode if spatialReference else None
+    logArcpy("rasterwriter.TiledRasterWriter", (tiffName, templateRaster.height, templateRaster.width, dtype), logFile)
+
+    return rasterwriter.TiledRasterWriter(tiffName, templateRaster.height, templateRaster.width, dtype,
+                                          templateRaster.extent.XMin, templateRaster.extent.YMax,
+                                          templateRaster.meanCellWidth, templateRaster.meanCellHeight,
+                                          focal.noDataValue, globalConstants.rasterTileSize,
+                                          compressLevel=globalConstants.rasterCompressLevel, queueSize=2,
+                                          epsgCode=epsgCode or None,
+                                          geographic=bool(spatialReference) and spatialReference.type == "Geographic")
+
+
+def closeTiledRasterWriter(writer, templateRaster):
+    """ Finish the .tif of a writer from openTiledRasterWriter and return it as an arcpy Raster object. The coordinate
+        system of templateRaster is defined when it has no EPSG code to write into the file. """
+
+    writer.close()
+    if not writer.epsgCode:
+        arcpy.management.DefineProjection(writer.path, templateRaster.spatialReference)
+
+    return Raster(writer.path)
+
+
 def getInOutOtherReclassPairs(allRasterValues, selectedValuesList, excludedValuesList, newValuesList):
     # Generate a reclass list where each item in the list is a two item list: the original grid value, and the reclass value
     # Three reclass categories are defined:
@@ -490,9 +872,13 @@ def getInOutOtherReclassPairs(allRasterValues, selectedValuesList, excludedValue
     #     second value in the newValuesList is the code for any values tagged excluded in the LCC XML
     #     third value in the newvaluesList is the new code for everything else
     
+    # The NumPy engines use the equivalent reclass.getInOutOtherLookupTable instead of remap pairs
+    
     newIncludedValue = newValuesList[0]
     newExcludedValue = newValuesList[1]
     newOtherValue = newValuesList[2]
+    selectedValuesList = set(selectedValuesList)
+    excludedValuesList = set(excludedValuesList)
     reclassPairs = []
     for val in allRasterValues:
         oldValNewValPair = []
@@ -544,47 +930,173 @@ def getRemapBinsByPercentStep(maxValue, pctStep):
     return reclassBins
 
 
-def getPatchViewGrid(m, classValuesList, excludedValuesList, inLandCoverGrid, landCoverValues, viewRadius, conValues, minimumPatchSize, timer, saveIntermediates, metricConst, logFile):
-    # create class (value = 1) / other (value = 0) / excluded grid (value = 0) raster
-    # define the reclass values
-    classValue = 1
-    excludedValue = 0
-    otherValue = 0
-    newValuesList = [classValue, excludedValue, otherValue]
-    
-    # generate a reclass list where each item in the list is a two item list: the original grid value, and the reclass value
-    reclassPairs = getInOutOtherReclassPairs(landCoverValues, classValuesList, excludedValuesList, newValuesList)
-      
+def getPatchViewGridFromArray(m, classValuesList, inLandCoverGrid, viewRadius, conValues, minimumPatchSize, timer,
+                              saveIntermediates, metricConst, logFile, cleanupList=None):
+    """ Create the view grid for getPatchViewGrid with the NumPy focal engine.
+
+        **Description:**
+
+        The land cover grid is read into a NumPy array and the cells of the class are marked. When *minimumPatchSize*
+        is greater than 1, the class cells are labeled as 8-connected patches and the cells of smaller patches are
+        dropped, as RegionGroup and Con do for the arcpy engine. The class cells within *viewRadius* cells of every cell
+        are then counted with focal.iterFocalCircleSums, which chooses the direct, row run or FFT method by the radius,
+        and cells whose count is greater than conValues[0] get conValues[1]. Each strip of the view grid is streamed
+        into a tiled, compressed GeoTIFF in the scratch folder (see openTiledRasterWriter).
+
+        **Arguments:**
+
+        * *m* - the class being processed
+        * *classValuesList* - the grid values in the class
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *viewRadius* - the radius of the circular neighborhood in cells
+        * *conValues* - list of the count a cell must exceed and the value it then gets
+        * *minimumPatchSize* - the smallest number of cells in a class patch
+        * *timer* - DateTimer object used for progress messages
+        * *saveIntermediates* - True to also return the patch grid
+        * *metricConst* - an object with constants specific to the metric being run
+        * *logFile* - file object for recording process steps
+        * *cleanupList* - optional list of cleanup steps that receives the deletion of the view grid
+
+        **Returns:**
+
+        * arcpy Raster object of the view grid .tif
+        * arcpy Raster object of the patch grid (1 = class, 0 = other), or None when saveIntermediates is False
+
+    """
+    import numpy as np
+
+    landCoverRaster = Raster(inLandCoverGrid)
+    nRows, nCols = landCoverRaster.height, landCoverRaster.width
+    cellWidth, cellHeight = landCoverRaster.meanCellWidth, landCoverRaster.meanCellHeight
+    lowerLeft = arcpy.Point(landCoverRaster.extent.XMin, landCoverRaster.extent.YMin)
+    valueNoData = landCoverRaster.noDataValue
+
     AddMsg(f"{timer.now()} Reclassifying selected {m.upper()} land cover class to 1. All other values = 0.", 0, logFile)
-    logArcpy("arcpy.sa.Reclassify",(inLandCoverGrid,"VALUE", RemapValue(reclassPairs)),logFile)
-    reclassGrid = arcpy.sa.Reclassify(inLandCoverGrid,"VALUE", RemapValue(reclassPairs))
- 
+    if valueNoData is None:
+        landCoverArray = arcpy.RasterToNumPyArray(landCoverRaster)
+        noDataMask = None
+    else:
+        landCoverArray = arcpy.RasterToNumPyArray(landCoverRaster, nodata_to_value=valueNoData)
+        noDataMask = landCoverArray == valueNoData
+    classTable = reclass.LookupTable(dict((aValue, True) for aValue in classValuesList), False, bool)
+    classMask = classTable.apply(landCoverArray, noDataMask, False)
+    del landCoverArray
+
     if int(minimumPatchSize) > 1:
-        # find patches of selected land cover >= the minimum patch size requirement
-                    
         AddMsg(f"{timer.now()} Calculating size of class patches.", 0, logFile)
-        logArcpy("arcpy.sa.RegionGroup",(reclassGrid,"EIGHT","WITHIN","ADD_LINK"),logFile)
-        regionGrid = arcpy.sa.RegionGroup(reclassGrid,"EIGHT","WITHIN","ADD_LINK")
-                    
+        labelArray, _numPatches = patches.labelPatches(classMask)
+
         AddMsg(f"{timer.now()} Assigning 1 to patches >= minimum size threshold of {minimumPatchSize} cells.", 0, logFile)
-        delimitedCOUNT = arcpy.AddFieldDelimiters(regionGrid,"COUNT")
-        whereClause = delimitedCOUNT+" >= " + minimumPatchSize + " AND LINK = 1"
-        logArcpy("arcpy.sa.Con",(regionGrid, classValue, 0, whereClause),logFile)
-        patchGrid = arcpy.sa.Con(regionGrid, classValue, 0, whereClause)
+        largePatches = np.bincount(labelArray.ravel()) >= int(minimumPatchSize)
+        largePatches[0] = False
+        classMask = largePatches[labelArray]
+        del labelArray
+    patchArray = classMask.astype(np.uint8)
+    del classMask
+
+    whereValue = conValues[0]
+    trueValue = conValues[1]
+
+    # With the DATA option a cell is NoData only when its whole circle is NoData, and its count is then 0. The NoData
+    # cells only need to be found when a count of 0 would pass the Con.
+    reportNoData = noDataMask is not None and whereValue < 0
+
+    def readRows(rowOffset, rowCount):
+        stripNoData = noDataMask[rowOffset:rowOffset + rowCount] if reportNoData else None
+        return patchArray[rowOffset:rowOffset + rowCount], stripNoData
+
+    radius = int(viewRadius)
+    stripRows = focal.getStripRows(nCols, globalConstants.focalStripCells, 2 * radius)
+    viewWriter = openTiledRasterWriter(f"{metricConst.shortName}_{m.upper()}{metricConst.viewRasterOutputName}_",
+                                       landCoverRaster, np.int32, logFile)
+    if cleanupList and not cleanupList[0] == "KeepIntermediates":
+        cleanupList.append((arcpy.Delete_management, (viewWriter.path,)))
+
+    AddMsg(f"{timer.now()} Performing focal SUM on patches of {m.upper()} using {viewRadius} cell radius circular "
+           f"neighborhood ({focal.getCircleSumMethod(radius)} method, strips of {stripRows} rows).", 0, logFile)
+    AddMsg(f"{timer.now()} Reclassifying focal SUM results into a single-value raster where 1 = potential view area.", 0, logFile)
+    try:
+        for rowOffset, sumArray, stripNoData in focal.iterFocalCircleSums(readRows, nRows, nCols, radius, stripRows):
+            viewMask = sumArray > whereValue
+            if stripNoData is not None:
+                viewMask &= ~stripNoData
+            viewWriter.writeRows(np.where(viewMask, trueValue, focal.noDataValue).astype(np.int32))
+    except:
+        viewWriter.abort()
+        raise
+    viewGrid = closeTiledRasterWriter(viewWriter, landCoverRaster)
+
+    patchGrid = None
+    if saveIntermediates:
+        patchGridArray = patchArray.astype(np.int16)
+        if noDataMask is not None:
+            patchGridArray[noDataMask] = focal.noDataValue
+        patchGrid = arcpy.NumPyArrayToRaster(patchGridArray, lowerLeft, cellWidth, cellHeight, focal.noDataValue)
+
+    return viewGrid, patchGrid
+
+
+def getPatchViewGrid(m, classValuesList, excludedValuesList, inLandCoverGrid, landCoverValues, viewRadius, conValues, minimumPatchSize, timer, saveIntermediates, metricConst, logFile, cleanupList=None):
+    # the NumPy engine reads the whole land cover grid into memory as it is, so it is only used for grids that fit the
+    # in-memory limit and that the processing environments leave unchanged
+    useArrays = False
+    if globalConstants.focalEngine == "NUMPY":
+        landCoverRaster = Raster(inLandCoverGrid)
+        envConflicts = getArrayEnvironmentConflicts(landCoverRaster)
+        if envConflicts:
+            AddMsg(f"{timer.now()} The {', '.join(envConflicts)} environment settings change the land cover grid. "
+                   f"Building the view grid with the Spatial Analyst tools.", 0, logFile)
+        elif landCoverRaster.height * landCoverRaster.width > globalConstants.patchEngineMaxCells:
+            AddMsg(f"{timer.now()} The land cover grid is too large to read into memory. Building the view grid with "
+                   f"the Spatial Analyst tools.", 0, logFile)
+        else:
+            useArrays = True
+
+    if useArrays:
+        viewGrid, patchGrid = getPatchViewGridFromArray(m, classValuesList, inLandCoverGrid, viewRadius, conValues,
+                                                        minimumPatchSize, timer, saveIntermediates, metricConst,
+                                                        logFile, cleanupList)
     else:
-        patchGrid = reclassGrid
+        # create class (value = 1) / other (value = 0) / excluded grid (value = 0) raster
+        # define the reclass values
+        classValue = 1
+        excludedValue = 0
+        otherValue = 0
+        newValuesList = [classValue, excludedValue, otherValue]
+    
+        # generate a reclass list where each item in the list is a two item list: the original grid value, and the reclass value
+        reclassPairs = getInOutOtherReclassPairs(landCoverValues, classValuesList, excludedValuesList, newValuesList)
+      
+        AddMsg(f"{timer.now()} Reclassifying selected {m.upper()} land cover class to 1. All other values = 0.", 0, logFile)
+        logArcpy("arcpy.sa.Reclassify",(inLandCoverGrid,"VALUE", RemapValue(reclassPairs)),logFile)
+        reclassGrid = arcpy.sa.Reclassify(inLandCoverGrid,"VALUE", RemapValue(reclassPairs))
+ 
+        if int(minimumPatchSize) > 1:
+            # find patches of selected land cover >= the minimum patch size requirement
+                    
+            AddMsg(f"{timer.now()} Calculating size of class patches.", 0, logFile)
+            logArcpy("arcpy.sa.RegionGroup",(reclassGrid,"EIGHT","WITHIN","ADD_LINK"),logFile)
+            regionGrid = arcpy.sa.RegionGroup(reclassGrid,"EIGHT","WITHIN","ADD_LINK")
+                    
+            AddMsg(f"{timer.now()} Assigning 1 to patches >= minimum size threshold of {minimumPatchSize} cells.", 0, logFile)
+            delimitedCOUNT = arcpy.AddFieldDelimiters(regionGrid,"COUNT")
+            whereClause = delimitedCOUNT+" >= " + minimumPatchSize + " AND LINK = 1"
+            logArcpy("arcpy.sa.Con",(regionGrid, classValue, 0, whereClause),logFile)
+            patchGrid = arcpy.sa.Con(regionGrid, classValue, 0, whereClause)
+        else:
+            patchGrid = reclassGrid
         
-    AddMsg(f"{timer.now()} Performing focal SUM on patches of {m.upper()} using {viewRadius} cell radius circular neighborhood.", 0, logFile)
-    neighborhood = arcpy.sa.NbrCircle(int(viewRadius), "CELL")
-    logArcpy("arcpy.sa.FocalStatistics",(f"patchGrid == {classValue}", neighborhood, "SUM", "DATA"),logFile)
-    focalGrid = arcpy.sa.FocalStatistics(patchGrid == classValue, neighborhood, "SUM", "DATA")
-    
+        AddMsg(f"{timer.now()} Performing focal SUM on patches of {m.upper()} using {viewRadius} cell radius circular neighborhood.", 0, logFile)
+        neighborhood = arcpy.sa.NbrCircle(int(viewRadius), "CELL")
+        logArcpy("arcpy.sa.FocalStatistics",(f"patchGrid == {classValue}", neighborhood, "SUM", "DATA"),logFile)
+        focalGrid = arcpy.sa.FocalStatistics(patchGrid == classValue, neighborhood, "SUM", "DATA")
     
-    AddMsg(f"{timer.now()} Reclassifying focal SUM results into a single-value raster where 1 = potential view area.", 0, logFile)
-    whereValue = conValues[0]
-    trueValue = conValues[1]
-    viewGrid = Con(Raster(focalGrid) > whereValue, trueValue)
     
+        AddMsg(f"{timer.now()} Reclassifying focal SUM results into a single-value raster where 1 = potential view area.", 0, logFile)
+        whereValue = conValues[0]
+        trueValue = conValues[1]
+        viewGrid = Con(Raster(focalGrid) > whereValue, trueValue)
+
     # save the intermediate raster if save intermediates option has been chosen
     if saveIntermediates: 
         namePrefix = f"{metricConst.shortName}_{m.upper()}{metricConst.patchGridName}_"
@@ -595,6 +1107,9 @@ def getPatchViewGrid(m, classValuesList, excludedValuesList, inLandCoverGrid, la
         except:
             pass
         patchGrid.save(scratchName)
+        if useArrays:
+            # grids created from NumPy arrays carry no spatial reference
+            arcpy.management.DefineProjection(scratchName, Raster(inLandCoverGrid).spatialReference)
         AddMsg(f"{timer.now()} Save intermediate grid complete: {basename(scratchName)}", 0, logFile)
         
         # add a CATEGORY field for raster labels; make it large enough to hold your longest category label.        
@@ -641,12 +1156,12 @@ def updateCategoryLabels(Raster, categoryDict):
 
 
 def getCircleCellCount(inRaster, radiusInCells):
-    maxCellCount = lookupCircleCellCount(radiusInCells)
-    
-    if maxCellCount == 0:
-        maxCellCount = calcCircleCellCount(inRaster, radiusInCells)
-        
-    return maxCellCount
+    """ Return the maximum cell count of a circular neighborhood of radiusInCells cells.
+
+        The count is computed exactly by kernels.getCircleCellCount; *inRaster* is no longer needed and is kept for
+        existing callers. calcCircleCellCount remains available to check a count with FocalStatistics.
+    """
+    return kernels.getCircleCellCount(int(radiusInCells))
 
 def calcCircleCellCount(inRaster,radiusInCells):
     """Utility for calculating the maximum cell count for a circular neighborhood of a given radius.
@@ -709,71 +1224,6 @@ def calcCircleCellCount(inRaster,radiusInCells):
     return circleCellCount
 
 
-def lookupCircleCellCount(radiusInCells):
-    radiusCellCountDict = dict({
-                                1: 5,
-                                2: 13,
-                                3: 29,
-                                4: 49,
-                                5: 81,
-                                6: 113,
-                                7: 149,
-                                8: 197,
-                                9: 253,
-                                10: 317,
-                                11: 377,
-                                12: 441,
-                                13: 529,
-                                14: 613,
-                                15: 709,
-                                16: 797,
-                                17: 901,
-                                18: 1009,
-                                19: 1129,
-                                20: 1257,
-                                21: 1373,
-                                22: 1517,
-                                23: 1653,
-                                24: 1793,
-                                25: 1961,
-                                26: 2121,
-                                27: 2289,
-                                28: 2453,
-                                29: 2629,
-                                30: 2821,
-                                31: 3001,
-                                32: 3209,
-                                33: 3409,
-                                40: 5025,
-                                45: 6361,
-                                50: 7845,
-                                55: 9477,
-                                60: 11289,
-                                66: 13673,
-                                70: 15373,
-                                75: 17665,
-                                80: 20081,
-                                90: 25445,
-                                100: 31417,
-                                125: 49077,
-                                150: 70681,
-                                200: 125629,
-                                250: 196321,
-                                300: 282697,
-                                333: 348281,
-                                350: 384765,
-                                400: 502625,
-                                450: 636121,
-                                500: 785349,
-                                750: 1767121,
-                                1000: 3141549
-                                })
-    
-    circleCellCount = radiusCellCountDict.get(radiusInCells, 0)
-
-    return circleCellCount
-
-
 def getWalkabilityGrid(vectorFeatures, inValue, inBaseValue, fileNameBase, cellSize, cleanupList, timer, logFile):
     """ Generate a binary raster with one value for where vector features exist, and another for everywhere else.
 
@@ -955,3 +1405,174 @@ def getParkRaster(metricConst,inParkFeature,oidFld,parkID,buffDist,costRaster,di
         arcpy.Delete_management("in_memory")
     
     return rasterName, nullRaster, popNone, popZero, valuesList
+
+
+def _rasterizeReportingUnits(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, timer, logFile=None):
+    """ Convert the reporting units to a scratch raster of object ids aligned with the land cover grid
+
+        The zone raster takes the land cover grid's cell size, so the array engines that use it must only be run when
+        the Cell Size environment leaves the land cover grid unchanged (see getArrayEnvironmentConflicts). Returns the
+        scratch raster name and a dictionary of object id to reporting unit id value. The caller deletes the scratch
+        raster.
+    """
+    cellWidth = Raster(inLandCoverGrid).meanCellWidth
+
+    oidFieldName = arcpy.Describe(inReportingUnitFeature).OIDFieldName
+    zoneIdLookup = dict(arcpy.da.SearchCursor(inReportingUnitFeature, [oidFieldName, reportingUnitIdField]))
+
+    AddMsg(f"{timer.now()} Converting reporting units to a zone array aligned with the land cover grid.", 0, logFile)
+    zoneRasterName = arcpy.CreateScratchName("xZone", "", "RasterDataset")
+    with arcpy.EnvManager(snapRaster=inLandCoverGrid, cellSize=cellWidth):
+        logArcpy("arcpy.conversion.PolygonToRaster",
+                 (inReportingUnitFeature, oidFieldName, zoneRasterName, "CELL_CENTER", "NONE", cellWidth), logFile)
+        arcpy.conversion.PolygonToRaster(inReportingUnitFeature, oidFieldName, zoneRasterName, "CELL_CENTER", "NONE",
+                                         cellWidth)
+
+    return zoneRasterName, zoneIdLookup
+
+
+def _getReadNoDataValue(landCoverRaster, inLandCoverGrid, logFile=None):
+    """ Return the value given to NoData cells when the land cover grid is read into an array
+
+        Cells of the zone extent that lie outside of the land cover grid are read as NoData. A grid without a NoData
+        value would have them filled with a value that could be a land cover class, so they are given a value one
+        below the grid's smallest value instead.
+    """
+    valueNoData = landCoverRaster.noDataValue
+    if valueNoData is None:
+        valueNoData = min(getRasterValues(inLandCoverGrid, logFile)) - 1
+
+    return valueNoData
+
+
+def getZoneAndValueArrays(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, timer, logFile=None):
+    """ Rasterize the reporting units and read them, together with the land cover grid, into aligned NumPy arrays.
+
+        **Description:**
+
+        The reporting units are converted to a raster of object ids using the cell size and cell alignment of the land
+        cover grid. The land cover grid is then read over the same extent so that both arrays share one cell
+        registration. Object ids are used as the zone codes so that reporting unit id fields of any type can be used;
+        the returned dictionary translates the codes back to reporting unit id values.
+
+        **Arguments:**
+
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *timer* - DateTimer object used for progress messages
+        * *logFile* - file object for recording process steps
+
+        **Returns:**
+
+        * NumPy array of zone codes; cells outside any reporting unit are -1
+        * NumPy array of land cover values
+        * dictionary of zone code to reporting unit id value
+        * float of the area of one cell
+        * the value of NoData land cover cells in the value array
+
+    """
+    import numpy as np
+
+    landCoverRaster = Raster(inLandCoverGrid)
+    valueNoData = _getReadNoDataValue(landCoverRaster, inLandCoverGrid, logFile)
+    zoneNoData = -1
+
+    zoneRasterName, zoneIdLookup = _rasterizeReportingUnits(inReportingUnitFeature, reportingUnitIdField,
+                                                            inLandCoverGrid, timer, logFile)
+
+    try:
+        zoneRaster = Raster(zoneRasterName)
+        lowerLeft = arcpy.Point(zoneRaster.extent.XMin, zoneRaster.extent.YMin)
+        zoneArray = arcpy.RasterToNumPyArray(zoneRaster, lowerLeft, zoneRaster.width, zoneRaster.height, zoneNoData)
+        del zoneRaster
+    finally:
+        arcpy.Delete_management(zoneRasterName)
+
+    AddMsg(f"{timer.now()} Reading the land cover grid into a value array.", 0, logFile)
+    nRows, nCols = zoneArray.shape
+    valueArray = arcpy.RasterToNumPyArray(landCoverRaster, lowerLeft, nCols, nRows, valueNoData)
+
+    cellArea = landCoverRaster.meanCellWidth * landCoverRaster.meanCellHeight
+    return zoneArray.astype(np.int64, copy=False), valueArray, zoneIdLookup, cellArea, valueNoData
+
+
+def getZoneAndValueReaders(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, timer, logFile=None):
+    """ Rasterize the reporting units and return aligned block readers for the zones and the land cover grid.
+
+        **Description:**
+
+        This is the tiled counterpart of getZoneAndValueArrays. Instead of reading both grids into memory, it returns
+        ArcpyRasterReader objects that read any block of the zone extent on request. The scratch zone raster is kept
+        for the readers to use and must be deleted by the caller once the tabulation is complete.
+
+        **Arguments:**
+
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *timer* - DateTimer object used for progress messages
+        * *logFile* - file object for recording process steps
+
+        **Returns:**
+
+        * ArcpyRasterReader for the zone codes; cells outside any reporting unit are -1
+        * ArcpyRasterReader for the land cover values
+        * dictionary of zone code to reporting unit id value
+        * float of the area of one cell
+        * the value of NoData land cover cells in the value blocks
+        * the name of the scratch zone raster
+
+    """
+    landCoverRaster = Raster(inLandCoverGrid)
+    valueNoData = _getReadNoDataValue(landCoverRaster, inLandCoverGrid, logFile)
+
+    zoneRasterName, zoneIdLookup = _rasterizeReportingUnits(inReportingUnitFeature, reportingUnitIdField,
+                                                            inLandCoverGrid, timer, logFile)
+
+    zoneRaster = Raster(zoneRasterName)
+    zoneReader = ArcpyRasterReader(zoneRasterName, zoneRaster.extent.XMin, zoneRaster.extent.YMax, zoneRaster.height,
+                                   zoneRaster.width, zoneRaster.meanCellWidth, zoneRaster.meanCellHeight, -1)
+    valueReader = ArcpyRasterReader(inLandCoverGrid, zoneRaster.extent.XMin, zoneRaster.extent.YMax, zoneRaster.height,
+                                    zoneRaster.width, zoneRaster.meanCellWidth, zoneRaster.meanCellHeight, valueNoData)
+    del zoneRaster
+
+    cellArea = landCoverRaster.meanCellWidth * landCoverRaster.meanCellHeight
+    return zoneReader, valueReader, zoneIdLookup, cellArea, valueNoData, zoneRasterName
+
+
+class ArcpyRasterReader(object):
+    """ Block reader over an arcpy raster for the tiled zonal engine
+
+        Blocks are addressed in rows and columns from the upper left corner of a fixed window so that readers of
+        different rasters built with the same window return aligned blocks.
+    """
+
+    def __init__(self, inRaster, originX, originY, nRows, nCols, cellWidth, cellHeight, noDataValue=None):
+        """ Constructor - Called when created
+
+            * inRaster - CatalogPath to the raster dataset
+            * originX, originY - the upper left corner of the window
+            * nRows, nCols - the size of the window in cells
+            * cellWidth, cellHeight - the cell size
+            * noDataValue - the value used for NoData cells, or None
+        """
+
+        self.inRaster = inRaster
+        self.originX = originX
+        self.originY = originY
+        self.shape = (nRows, nCols)
+        self.cellWidth = cellWidth
+        self.cellHeight = cellHeight
+        self.noDataValue = noDataValue
+
+
+    def readBlock(self, rowOffset, colOffset, blockRows, blockCols):
+        """ Return the block of cells starting at rowOffset, colOffset as a NumPy array """
+
+        lowerLeft = arcpy.Point(self.originX + colOffset * self.cellWidth,
+                                self.originY - (rowOffset + blockRows) * self.cellHeight)
+        if self.noDataValue is None:
+            return arcpy.RasterToNumPyArray(self.inRaster, lowerLeft, blockCols, blockRows)
+
+        return arcpy.RasterToNumPyArray(self.inRaster, lowerLeft, blockCols, blockRows, self.noDataValue)
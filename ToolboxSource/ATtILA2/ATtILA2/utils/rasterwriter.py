@@ -0,0 +1,353 @@
+""" Streaming tiled raster writer
+
+    The classes in this module operate on NumPy arrays only and do not require arcpy. They provide the output side of
+    the array engines: rows are streamed, a block at a time, into a tiled, deflate compressed GeoTIFF with internal
+    overviews, so a finished grid never has to be held in memory and map display does not need a separate pyramid
+    build. Tiles are compressed and written by a background thread while the next block is computed; zlib releases the
+    interpreter lock while it compresses, so the two overlap.
+
+"""
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+# TIFF field types
+_ASCII = 2
+_SHORT = 3
+_LONG = 4
+_DOUBLE = 12
+_LONG8 = 16
+
+# TIFF SampleFormat of the NumPy type kinds
+_sampleFormats = {"u": 1, "i": 2, "f": 3}
+
+# Uncompressed sizes, in bytes, above which the file is written as a BigTIFF
+bigTiffThreshold = 2 ** 31
+
+
+class TiledRasterWriter(object):
+    """ Stream the rows of a single band grid into a tiled, compressed GeoTIFF with internal overviews.
+
+        **Description:**
+
+        Rows are added in order with writeRows. Once a full row of tiles has been received it is handed to a
+        background thread, which compresses every tile with deflate and appends it to the file; at most *queueSize* tile
+        rows wait for the thread, which bounds the memory in use. Every overview level halves the rows and columns of
+        the level above by nearest neighbor sampling and is tiled and written the same way as its rows arrive. close
+        writes the image file directories and the georeferencing: the upper left corner and cell size, the NoData value
+        (as the GDAL_NODATA tag) and, when an EPSG code is given, the coordinate system. Otherwise the coordinate system
+        should be defined afterwards (e.g., with DefineProjection).
+
+        **Arguments:**
+
+        * *path* - the path of the .tif file to create
+        * *nRows*, *nCols* - the size of the grid in cells
+        * *dtype* - the NumPy type of the grid values
+        * *xMin*, *yMax* - the coordinates of the upper left corner of the grid
+        * *cellWidth*, *cellHeight* - the cell size
+        * *noDataValue* - the NoData value, or None
+        * *tileSize* - the number of rows and columns in a tile
+        * *overviewLevels* - the number of overview levels; by default levels are added until one fits in a tile
+        * *compressLevel* - the zlib compression level
+        * *queueSize* - the largest number of tile rows waiting to be compressed
+        * *epsgCode* - optional EPSG code of a projected coordinate system, or of a geographic one when *geographic*
+        * *geographic* - True when epsgCode is a geographic coordinate system
+
+    """
+    def __init__(self, path, nRows, nCols, dtype, xMin, yMax, cellWidth, cellHeight, noDataValue=None, tileSize=256,
+                 overviewLevels=None, compressLevel=6, queueSize=4, epsgCode=None, geographic=False):
+        self.path = path
+        self.nRows = int(nRows)
+        self.nCols = int(nCols)
+        self.dtype = np.dtype(np.uint8 if np.dtype(dtype) == np.bool_ else dtype).newbyteorder("<")
+        if self.dtype.kind not in _sampleFormats:
+            raise TypeError(f"Unsupported raster type: {self.dtype}")
+        self.xMin = xMin
+        self.yMax = yMax
+        self.cellWidth = cellWidth
+        self.cellHeight = cellHeight
+        self.noDataValue = noDataValue
+        self.tileSize = int(tileSize)
+        self.compressLevel = compressLevel
+        self.epsgCode = epsgCode
+        self.geographic = geographic
+        self.rowsWritten = 0
+
+        if overviewLevels is None:
+            overviewLevels = 0
+            levelRows, levelCols = self.nRows, self.nCols
+            while max(levelRows, levelCols) > self.tileSize:
+                levelRows, levelCols = (levelRows + 1) // 2, (levelCols + 1) // 2
+                overviewLevels += 1
+
+        fillValue = 0 if noDataValue is None else noDataValue
+        self._levels = []
+        levelRows, levelCols = self.nRows, self.nCols
+        for _level in range(overviewLevels + 1):
+            self._levels.append(_TileLevel(len(self._levels), levelRows, levelCols, self.tileSize, self.dtype,
+                                           fillValue))
+            levelRows, levelCols = (levelRows + 1) // 2, (levelCols + 1) // 2
+
+        uncompressedSize = sum(level.nRows * level.nCols for level in self._levels) * self.dtype.itemsize
+        self.bigTiff = uncompressedSize > bigTiffThreshold
+
+        self._file = open(path, "wb")
+        if self.bigTiff:
+            self._file.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self._file.write(b"II" + struct.pack("<HI", 42, 0))
+
+        self._queue = queue.Queue(maxsize=queueSize)
+        self._error = None
+        self._thread = threading.Thread(target=self._writeTileRows, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writeRows(self, block):
+        """ Add the next rows of the grid from a two dimensional NumPy array of nCols columns """
+
+        self._checkError()
+        block = np.asarray(block)
+        if block.ndim != 2 or block.shape[1] != self.nCols:
+            raise ValueError(f"Expected a block of {self.nCols} columns, got shape {block.shape}")
+        if self.rowsWritten + block.shape[0] > self.nRows:
+            raise ValueError(f"The grid has only {self.nRows} rows")
+
+        self.rowsWritten += block.shape[0]
+        self._addRows(self._levels[0], block)
+
+    def _addRows(self, level, rows):
+        """ Add rows to a level, submit its full tile rows and pass every other row and column to the next level """
+
+        firstRow = level.rowsReceived
+        for tileRow in level.addRows(rows):
+            self._submit(level, tileRow)
+
+        if level.index + 1 < len(self._levels):
+            # the overview keeps the even rows and columns of the level above
+            self._addRows(self._levels[level.index + 1], rows[firstRow % 2::2, ::2])
+
+    def _submit(self, level, tileRow):
+        while True:
+            self._checkError()
+            try:
+                self._queue.put((level, tileRow), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _writeTileRows(self):
+        """ Compress and append the tiles of the submitted tile rows; runs in the background thread """
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            level, (tileRowIndex, tileRowArray) = item
+            try:
+                for tileCol in range(level.tilesAcross):
+                    tile = tileRowArray[:, tileCol * self.tileSize:(tileCol + 1) * self.tileSize]
+                    data = zlib.compress(np.ascontiguousarray(tile, dtype=self.dtype).tobytes(), self.compressLevel)
+                    level.tileOffsets[tileRowIndex * level.tilesAcross + tileCol] = self._file.tell()
+                    level.tileByteCounts[tileRowIndex * level.tilesAcross + tileCol] = len(data)
+                    self._file.write(data)
+            except Exception as e:
+                self._error = e
+
+    def _checkError(self):
+        if self._error is not None:
+            error = self._error
+            self.abort()
+            raise error
+
+    def _stopThread(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """ Write the last partial tile rows and the image file directories, and close the file """
+
+        if self._file is None:
+            return
+        if self.rowsWritten != self.nRows:
+            self.abort()
+            raise ValueError(f"{self.rowsWritten} of {self.nRows} rows were written")
+
+        for level in self._levels:
+            tileRow = level.finish()
+            if tileRow is not None:
+                self._submit(level, tileRow)
+        self._stopThread()
+        self._checkError()
+
+        try:
+            ifdOffsets = []
+            nextOffsetPositions = []
+            for level in self._levels:
+                ifdOffset, nextOffsetPosition = self._writeDirectory(level)
+                ifdOffsets.append(ifdOffset)
+                nextOffsetPositions.append(nextOffsetPosition)
+
+            offsetFormat = "<Q" if self.bigTiff else "<I"
+            self._file.seek(8 if self.bigTiff else 4)
+            self._file.write(struct.pack(offsetFormat, ifdOffsets[0]))
+            for nextOffsetPosition, ifdOffset in zip(nextOffsetPositions[:-1], ifdOffsets[1:]):
+                self._file.seek(nextOffsetPosition)
+                self._file.write(struct.pack(offsetFormat, ifdOffset))
+        except:
+            self.abort()
+            raise
+
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """ Stop the background thread, close the unfinished file and delete it. A file that was already closed is
+            left alone. """
+
+        try:
+            self._stopThread()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def _getTags(self, level):
+        """ Return the (tag, type, values) entries of the image file directory of a level, sorted by tag """
+
+        offsetType = _LONG8 if self.bigTiff else _LONG
+        tags = [(254, _LONG, [0 if level.index == 0 else 1]),
+                (256, _LONG, [level.nCols]),
+                (257, _LONG, [level.nRows]),
+                (258, _SHORT, [8 * self.dtype.itemsize]),
+                (259, _SHORT, [8]),
+                (262, _SHORT, [1]),
+                (277, _SHORT, [1]),
+                (284, _SHORT, [1]),
+                (322, _SHORT, [self.tileSize]),
+                (323, _SHORT, [self.tileSize]),
+                (324, offsetType, level.tileOffsets),
+                (325, offsetType, level.tileByteCounts),
+                (339, _SHORT, [_sampleFormats[self.dtype.kind]])]
+
+        if level.index == 0:
+            geoKeys = [1, 1, 0, 2, 1024, 0, 1, 2 if self.geographic else 1, 1025, 0, 1, 1]
+            if self.epsgCode:
+                geoKeys += [2048 if self.geographic else 3072, 0, 1, int(self.epsgCode)]
+            geoKeys[3] = (len(geoKeys) - 4) // 4
+            tags += [(33550, _DOUBLE, [self.cellWidth, self.cellHeight, 0.0]),
+                     (33922, _DOUBLE, [0.0, 0.0, 0.0, self.xMin, self.yMax, 0.0]),
+                     (34735, _SHORT, geoKeys)]
+        if self.noDataValue is not None:
+            noDataText = repr(self.dtype.type(self.noDataValue).item())
+            tags.append((42113, _ASCII, noDataText.encode("ascii") + b"\0"))
+
+        return sorted(tags, key=lambda tag: tag[0])
+
+    def _writeDirectory(self, level):
+        """ Append the image file directory of a level and the values that do not fit in its entries
+
+            Returns the offset of the directory and the position of its next directory offset.
+        """
+        valueFormats = {_SHORT: "H", _LONG: "I", _DOUBLE: "d", _LONG8: "Q"}
+        if self.bigTiff:
+            countFormat, entryFormat, offsetFormat, inlineSize = "<Q", "<HHQ", "<Q", 8
+        else:
+            countFormat, entryFormat, offsetFormat, inlineSize = "<H", "<HHI", "<I", 4
+
+        self._file.seek(0, 2)
+        entries = []
+        for tag, fieldType, values in self._getTags(level):
+            if fieldType == _ASCII:
+                data = values
+            else:
+                data = struct.pack(f"<{len(values)}{valueFormats[fieldType]}", *values)
+            if len(data) > inlineSize:
+                if self._file.tell() % 2:
+                    self._file.write(b"\0")
+                valueField = struct.pack(offsetFormat, self._file.tell())
+                self._file.write(data)
+            else:
+                valueField = data.ljust(inlineSize, b"\0")
+            entries.append(struct.pack(entryFormat, tag, fieldType, len(values)) + valueField)
+
+        if self._file.tell() % 2:
+            self._file.write(b"\0")
+        ifdOffset = self._file.tell()
+        self._file.write(struct.pack(countFormat, len(entries)))
+        self._file.write(b"".join(entries))
+        nextOffsetPosition = self._file.tell()
+        self._file.write(struct.pack(offsetFormat, 0))
+
+        return ifdOffset, nextOffsetPosition
+
+
+class _TileLevel(object):
+    """ The row buffer and tile directory of one resolution level of a TiledRasterWriter """
+
+    def __init__(self, index, nRows, nCols, tileSize, dtype, fillValue):
+        self.index = index
+        self.nRows = nRows
+        self.nCols = nCols
+        self.tileSize = tileSize
+        self.fillValue = fillValue
+        self.tilesAcross = (nCols + tileSize - 1) // tileSize
+        self.tilesDown = (nRows + tileSize - 1) // tileSize
+        self.tileOffsets = [0] * (self.tilesAcross * self.tilesDown)
+        self.tileByteCounts = [0] * (self.tilesAcross * self.tilesDown)
+        self.buffer = np.full((tileSize, self.tilesAcross * tileSize), fillValue, dtype=dtype)
+        self.bufferRows = 0
+        self.tileRowIndex = 0
+        self.rowsReceived = 0
+
+    def addRows(self, rows):
+        """ Copy rows into the buffer and return the (tileRowIndex, array) of every tile row that is filled """
+
+        filled = []
+        position = 0
+        self.rowsReceived += rows.shape[0]
+        while position < rows.shape[0]:
+            count = min(self.tileSize - self.bufferRows, rows.shape[0] - position)
+            self.buffer[self.bufferRows:self.bufferRows + count, :self.nCols] = rows[position:position + count]
+            self.bufferRows += count
+            position += count
+            if self.bufferRows == self.tileSize:
+                filled.append(self._takeBuffer())
+
+        return filled
+
+    def finish(self):
+        """ Return the last, partial tile row padded with the fill value, or None """
+
+        if self.bufferRows == 0:
+            return None
+        self.buffer[self.bufferRows:] = self.fillValue
+
+        return self._takeBuffer()
+
+    def _takeBuffer(self):
+        tileRow = (self.tileRowIndex, self.buffer.copy())
+        self.tileRowIndex += 1
+        self.bufferRows = 0
+
+        return tileRow
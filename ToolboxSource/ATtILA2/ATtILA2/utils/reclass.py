@@ -0,0 +1,147 @@
+""" Lookup table reclassification of land cover arrays
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They are the in-memory
+    counterpart of arcpy.sa.Reclassify with the RemapValue pairs of raster.getInOutOtherReclassPairs: the class,
+    excluded and other sets of an LCC file are compiled once into a dense lookup array indexed by grid code, and each
+    raster block is reclassified with a single lookup (lut[block]) inside whatever step follows, so no reclassified
+    grid is ever written out.
+
+"""
+import numpy as np
+
+# Largest range of grid codes reclassified with a dense lookup array; blocks of wider ranges are reclassified code by
+# code
+maxLookupTableSize = 2 ** 20
+
+
+class LookupTable(object):
+    """ Reclassify the integer codes of NumPy arrays with a dense lookup array.
+
+        **Description:**
+
+        Codes in *codeMap* get their new code and all other codes get *defaultCode*. Blocks of 8 and 16 bit integers
+        are indexed directly into a lookup array covering every code of the type; negative codes wrap around to the
+        end of the array, as NumPy indexing does. These arrays are built once per type and reused for every block.
+        Blocks of wider types use a single lookup array covering a range of codes. It is reused for every block whose
+        codes fall within it and is rebuilt to cover the block as well when they do not, so it grows to the range of
+        codes of the whole raster instead of one array being kept per block.
+
+        **Arguments:**
+
+        * *codeMap* - dictionary of grid codes to new codes
+        * *defaultCode* - the new code of the grid codes not in codeMap
+        * *dtype* - the NumPy type of the reclassified arrays
+
+    """
+    def __init__(self, codeMap, defaultCode=0, dtype=np.int32):
+        self.codeMap = dict((int(aCode), newCode) for aCode, newCode in codeMap.items())
+        self.defaultCode = defaultCode
+        self.dtype = np.dtype(dtype)
+        self._wrapTables = {}
+        self._rangeTable = None
+        self._rangeLowCode = 0
+
+    def _buildTable(self, lowCode, size, wrap):
+        """ Return a new lookup array for the codes lowCode through lowCode + size - 1
+
+            A wrapping table puts each code at its position modulo size; otherwise codes start at position 0.
+        """
+        table = np.full(size, self.defaultCode, dtype=self.dtype)
+        for aCode, newCode in self.codeMap.items():
+            if lowCode <= aCode < lowCode + size:
+                table[aCode % size if wrap else aCode - lowCode] = newCode
+
+        return table
+
+    def _getWrapTable(self, lowCode, size):
+        """ Return the wrapping lookup array of an integer type, building it on first use """
+
+        key = (lowCode, size)
+        table = self._wrapTables.get(key)
+        if table is None:
+            table = self._buildTable(lowCode, size, True)
+            self._wrapTables[key] = table
+
+        return table
+
+    def _getRangeTable(self, minCode, maxCode):
+        """ Return the range lookup array and its lowest code, rebuilt when it does not cover minCode to maxCode
+
+            A rebuilt array covers the old range as well when the combined range is small enough, so that blocks
+            alternating between ranges do not rebuild it every time.
+        """
+        table = self._rangeTable
+        lowCode = self._rangeLowCode
+        if table is None or minCode < lowCode or maxCode >= lowCode + len(table):
+            if table is not None and max(maxCode + 1, lowCode + len(table)) - min(minCode, lowCode) <= maxLookupTableSize:
+                maxCode = max(maxCode, lowCode + len(table) - 1)
+                minCode = min(minCode, lowCode)
+            table = self._buildTable(minCode, maxCode - minCode + 1, False)
+            lowCode = minCode
+            self._rangeTable = table
+            self._rangeLowCode = lowCode
+
+        return table, lowCode
+
+    def apply(self, block, noDataMask=None, noDataCode=None):
+        """ Return the reclassified copy of an integer NumPy array
+
+            Cells marked in the optional boolean *noDataMask* are set to *noDataCode*.
+        """
+        block = np.asarray(block)
+        if block.dtype.kind in "ui" and block.dtype.itemsize <= 2:
+            typeInfo = np.iinfo(block.dtype)
+            table = self._getWrapTable(int(typeInfo.min), 1 << (8 * block.dtype.itemsize))
+            result = table[block]
+        elif block.size == 0:
+            result = np.full(block.shape, self.defaultCode, dtype=self.dtype)
+        else:
+            minCode = int(block.min())
+            maxCode = int(block.max())
+            if maxCode - minCode < maxLookupTableSize:
+                table, lowCode = self._getRangeTable(minCode, maxCode)
+                result = table[block - lowCode]
+            else:
+                result = np.full(block.shape, self.defaultCode, dtype=self.dtype)
+                for aCode, newCode in self.codeMap.items():
+                    if minCode <= aCode <= maxCode:
+                        result[block == aCode] = newCode
+
+        if noDataMask is not None:
+            result[noDataMask] = noDataCode
+
+        return result
+
+
+def getInOutOtherLookupTable(classValues, excludedValues, newValuesList, dtype=np.int32):
+    """ Return the LookupTable equivalent of the RemapValue pairs of raster.getInOutOtherReclassPairs
+
+        The first code of *newValuesList* is for the class values, the second for the excluded values and the third
+        for every other value. A value in both the class and the excluded values is a class value.
+    """
+    classCode, excludedCode, otherCode = newValuesList
+
+    codeMap = dict((aValue, excludedCode) for aValue in excludedValues)
+    codeMap.update((aValue, classCode) for aValue in classValues)
+
+    return LookupTable(codeMap, otherCode, dtype)
+
+
+def getClassBitsLookupTable(classValueLists):
+    """ Return a LookupTable whose codes have bit k set for the values of classValueLists[k]
+
+        A value may belong to several classes. The codes are the smallest unsigned type that holds a bit per class.
+    """
+    numClasses = len(classValueLists)
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if numClasses <= 8 * np.dtype(dtype).itemsize:
+            break
+    else:
+        raise ValueError(f"Too many classes for a class bits lookup table: {numClasses}")
+
+    codeMap = {}
+    for k, classValues in enumerate(classValueLists):
+        for aValue in classValues:
+            codeMap[aValue] = codeMap.get(aValue, 0) | (1 << k)
+
+    return LookupTable(codeMap, 0, dtype)
@@ -0,0 +1,211 @@
+""" Bounding box spatial index
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They find the pairs of features
+    whose envelopes intersect, so that exact (and expensive) geometry predicates only run on those candidate pairs
+    instead of on every pair of features. The index is a Sort-Tile-Recursive (STR) packed R-tree built once from the
+    feature envelopes; when the rtree package (libspatialindex) is installed it is used instead. The overlap graph the
+    exact predicates produce is split into groups of nonoverlapping features with colorOverlapGraph.
+
+"""
+import heapq
+import math
+
+import numpy as np
+
+# Number of entries in a node of the STR packed R-tree
+nodeCapacity = 16
+
+
+class STRTree(object):
+    """ A static R-tree packed with the Sort-Tile-Recursive algorithm.
+
+        **Description:**
+
+        The boxes are sorted into vertical slices by the x of their centers and, within each slice, by the y of their
+        centers, and every run of *nodeCapacity* boxes becomes a leaf node. The node envelopes are packed the same way
+        into the next level, up to a single root. Since the children of a node are contiguous in the level below, each
+        level is stored as arrays of envelopes and child ranges, and queries walk the tree one level at a time with
+        vectorized box tests.
+
+        **Arguments:**
+
+        * *boxes* - NumPy array of (xMin, yMin, xMax, yMax) rows, one per feature
+        * *capacity* - the largest number of entries in a node
+
+    """
+    def __init__(self, boxes, capacity=nodeCapacity):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape((-1, 4))
+        self.capacity = max(int(capacity), 2)
+
+        # the leaf level holds the boxes themselves, in packed order
+        self.order = self._packOrder(self.boxes)
+        levelBoxes = self.boxes[self.order]
+        self.levels = []
+        while len(levelBoxes) > 1:
+            nodeBoxes, childStarts = self._groupLevel(levelBoxes)
+            self.levels.append((nodeBoxes, childStarts, len(levelBoxes)))
+            if len(nodeBoxes) > 1:
+                nodeOrder = self._packOrder(nodeBoxes)
+                if not np.array_equal(nodeOrder, np.arange(len(nodeBoxes))):
+                    # reorder the nodes, and the child ranges with them, so the next level is packed as well
+                    self.levels[-1] = (nodeBoxes[nodeOrder], childStarts[nodeOrder], len(levelBoxes))
+            levelBoxes = self.levels[-1][0]
+        self.levels.reverse()
+        self.leafBoxes = self.boxes[self.order]
+
+    def _packOrder(self, boxes):
+        """ Return the STR order of boxes: vertical slices by center x, each sorted by center y """
+
+        count = len(boxes)
+        if count <= self.capacity:
+            return np.arange(count)
+
+        centerX = (boxes[:, 0] + boxes[:, 2]) / 2
+        centerY = (boxes[:, 1] + boxes[:, 3]) / 2
+        nodeCount = math.ceil(count / self.capacity)
+        sliceCount = math.ceil(math.sqrt(nodeCount))
+        sliceSize = sliceCount * self.capacity
+
+        byX = np.argsort(centerX, kind="stable")
+        order = []
+        for sliceStart in range(0, count, sliceSize):
+            sliceIndexes = byX[sliceStart:sliceStart + sliceSize]
+            order.append(sliceIndexes[np.argsort(centerY[sliceIndexes], kind="stable")])
+
+        return np.concatenate(order)
+
+    def _groupLevel(self, levelBoxes):
+        """ Group runs of capacity boxes into nodes; return the node envelopes and the start of each node's run """
+
+        childStarts = np.arange(0, len(levelBoxes), self.capacity)
+        nodeBoxes = np.column_stack([np.minimum.reduceat(levelBoxes[:, 0], childStarts),
+                                     np.minimum.reduceat(levelBoxes[:, 1], childStarts),
+                                     np.maximum.reduceat(levelBoxes[:, 2], childStarts),
+                                     np.maximum.reduceat(levelBoxes[:, 3], childStarts)])
+
+        return nodeBoxes, childStarts
+
+    def query(self, box):
+        """ Return the indexes (into the boxes the tree was built from) of the boxes that intersect *box*
+
+            Boxes that only touch along an edge or at a corner are included.
+        """
+        xMin, yMin, xMax, yMax = box
+        if self.levels:
+            rootBoxes = self.levels[0][0]
+            candidates = np.flatnonzero(_intersects(rootBoxes, xMin, yMin, xMax, yMax))
+            for levelIndex, (_nodeBoxes, childStarts, childCount) in enumerate(self.levels):
+                if len(candidates) == 0:
+                    return candidates
+                childBoxes = self.levels[levelIndex + 1][0] if levelIndex + 1 < len(self.levels) else self.leafBoxes
+                children = (childStarts[candidates][:, None] + np.arange(self.capacity)).ravel()
+                children = children[children < childCount]
+                candidates = children[_intersects(childBoxes[children], xMin, yMin, xMax, yMax)]
+        else:
+            candidates = np.flatnonzero(_intersects(self.leafBoxes, xMin, yMin, xMax, yMax))
+
+        return np.sort(self.order[candidates])
+
+
+def _intersects(boxes, xMin, yMin, xMax, yMax):
+    """ Return a boolean NumPy array marking the boxes that intersect (or touch) a box """
+
+    return (boxes[:, 0] <= xMax) & (boxes[:, 2] >= xMin) & (boxes[:, 1] <= yMax) & (boxes[:, 3] >= yMin)
+
+
+def _getRtreeIndex(boxes):
+    """ Return an rtree (libspatialindex) index of the boxes, bulk loaded, or None when rtree is not installed """
+
+    try:
+        from rtree import index
+    except ImportError:
+        return None
+
+    return index.Index((i, tuple(box), None) for i, box in enumerate(boxes))
+
+
+def iterIntersectingPairs(boxes, useRtree=True):
+    """ Yield every pair (i, j), i < j, of the indexes of boxes that intersect or touch, in order of i and then j.
+
+        **Description:**
+
+        The boxes are indexed once, with the rtree package when *useRtree* is True and it is installed, and otherwise
+        with an STRTree, and the index is queried with each box in turn. Boxes with a NaN coordinate or a minimum
+        greater than its maximum are empty; they are left out of the index and intersect nothing.
+
+        **Arguments:**
+
+        * *boxes* - NumPy array of (xMin, yMin, xMax, yMax) rows, one per feature
+        * *useRtree* - False to always use the STRTree
+
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape((-1, 4))
+
+    # comparisons with NaN are False, so this also drops boxes with a NaN coordinate
+    validIndexes = np.flatnonzero((boxes[:, 0] <= boxes[:, 2]) & (boxes[:, 1] <= boxes[:, 3]))
+    validBoxes = boxes[validIndexes]
+
+    rtreeIndex = _getRtreeIndex(validBoxes) if useRtree and len(validBoxes) else None
+    if rtreeIndex is not None:
+        def query(box):
+            return np.sort(np.fromiter(rtreeIndex.intersection(tuple(box)), dtype=np.int64))
+    else:
+        query = STRTree(validBoxes).query
+
+    for position, box in enumerate(validBoxes):
+        for j in query(box):
+            if j > position:
+                yield int(validIndexes[position]), int(validIndexes[j])
+
+
+def colorOverlapGraph(overlapDict):
+    """ Return a dictionary of group number to the list of OIDs of nonoverlapping polygons in that group.
+
+        **Description:**
+
+        The groups are the colors of a greedy DSATUR coloring of the overlap graph: polygons are colored one at a time,
+        always picking the uncolored polygon whose overlapping polygons already have the most distinct colors (then the
+        one with the most overlapping polygons, then the first in *overlapDict*), and each gets the lowest color, from
+        1, none of its overlapping polygons has. No group holds two overlapping polygons, and each OID of the graph is
+        in exactly one group.
+
+        **Arguments:**
+
+        * *overlapDict* - Dictionary of OID to the list of the OIDs of the polygons it overlaps
+
+    """
+    # adjacency sets of the overlap graph; overlaps are symmetric, but make sure of it
+    adjacencyDict = dict((oid, set(overlapOIDs)) for oid, overlapOIDs in overlapDict.items())
+    for oid, overlapOIDs in overlapDict.items():
+        for overlapOID in overlapOIDs:
+            adjacencyDict.setdefault(overlapOID, set()).add(oid)
+    positionDict = dict((oid, position) for position, oid in enumerate(adjacencyDict))
+
+    colorDict = {}
+    neighborColorsDict = dict((oid, set()) for oid in adjacencyDict)
+    # priority queue of (-saturation, -degree, position, OID); entries made stale by a later push are skipped
+    queue = [(0, -len(adjacencyDict[oid]), positionDict[oid], oid) for oid in adjacencyDict]
+    heapq.heapify(queue)
+    while queue:
+        negSaturation, _negDegree, _position, oid = heapq.heappop(queue)
+        if oid in colorDict or -negSaturation != len(neighborColorsDict[oid]):
+            continue
+    
+        neighborColors = neighborColorsDict[oid]
+        color = 1
+        while color in neighborColors:
+            color = color + 1
+        colorDict[oid] = color
+    
+        for overlapOID in adjacencyDict[oid]:
+            if overlapOID not in colorDict and color not in neighborColorsDict[overlapOID]:
+                neighborColorsDict[overlapOID].add(color)
+                heapq.heappush(queue, (-len(neighborColorsDict[overlapOID]), -len(adjacencyDict[overlapOID]),
+                                       positionDict[overlapOID], overlapOID))
+
+    # group the OIDs by color
+    nonoverlapGroupDict = {}
+    for oid in adjacencyDict:
+        nonoverlapGroupDict.setdefault(colorDict[oid], []).append(oid)
+
+    return dict(sorted(nonoverlapGroupDict.items()))
@@ -1,9 +1,160 @@
+import os
 import arcpy
+import numpy as np
+from ATtILA2.constants import globalConstants
 from ATtILA2.utils.log import logArcpy
+from ATtILA2.utils.messages import AddMsg
+from ATtILA2.utils import tabcache
+from ATtILA2.utils import zonal
+
+
+def getTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, tableName=None,
+                         lccObj=None, timer=None, useCache=None):
+    """ Return a tabulate area helper for the reporting units and land cover grid.
+
+        **Description:**
+
+        The tabulation is done by the engine named in globalConstants.zonalEngine. The "NUMPY" engine falls back to the
+        Tabulate Area tool when the reporting units overlap or the environments change the land cover grid (see
+        canTabulateInMemory). When the tabulation cache is enabled, the resulting area matrix is stored under a
+        fingerprint of the inputs and an identical later request is served from the cache. A named (intermediate)
+        table is always tabulated with the Tabulate Area tool, without the cache, so that it is written to disk.
+
+        **Arguments:**
+
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *logFile* - file object for recording process steps
+        * *tableName* - if given, the name of the tabulate area table to keep as an intermediate
+        * *lccObj* - the LandCoverClassification object used to identify excluded values
+        * *timer* - DateTimer object used for progress messages
+        * *useCache* - True or False to override globalConstants.tabulationCache
+
+        **Returns:**
+
+        * TabulateAreaTable, ArrayTabulateAreaTable or MatrixTabulateAreaTable object
+
+    """
+    if useCache is None:
+        useCache = globalConstants.tabulationCache
+
+    engine = globalConstants.zonalEngine
+    # a named (intermediate) table is written by the Tabulate Area tool, so it bypasses the cache and the NumPy engine
+    if tableName:
+        useCache = False
+        engine = "ARCPY"
+
+    if useCache:
+        fingerprint = tabcache.getFingerprint(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, engine)
+        tabulationCache = getTabulationCache()
+        cached = tabulationCache.load(fingerprint)
+        if cached:
+            AddMsg("Reusing the cached zonal tabulation for these reporting units and land cover grid", 0, logFile)
+            return MatrixTabulateAreaTable(*cached, lccObj=lccObj)
+
+    if engine == "NUMPY" and canTabulateInMemory(inReportingUnitFeature, inLandCoverGrid, timer, logFile):
+        from ATtILA2.utils import raster
+
+        landCoverRaster = arcpy.Raster(inLandCoverGrid)
+        blockSize = globalConstants.zonalBlockSize
+        if max(landCoverRaster.height, landCoverRaster.width) > blockSize:
+            tabAreaTable = getTiledTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid,
+                                                     logFile, blockSize, lccObj, timer or raster.timer)
+        else:
+            zoneArray, valueArray, zoneIdLookup, cellArea, valueNoData = raster.getZoneAndValueArrays(
+                inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, timer or raster.timer, logFile)
+            tabAreaTable = ArrayTabulateAreaTable(zoneArray, valueArray, cellArea, lccObj, zoneIdLookup, -1, valueNoData)
+    else:
+        tabAreaTable = TabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile,
+                                         tableName, lccObj)
+
+    if useCache:
+        tabulationCache.store(fingerprint, *tabAreaTable.getAreaMatrix())
+
+    return tabAreaTable
+
+
+def canTabulateInMemory(inReportingUnitFeature, inLandCoverGrid, timer=None, logFile=None):
+    """ Check whether the "NUMPY" zonal engine gives the same areas as the Tabulate Area tool for these inputs
+
+        The NumPy engine rasterizes all reporting units into one zone grid on the land cover grid's own cells, so each
+        cell is counted for one reporting unit only. The Tabulate Area tool is used instead when the reporting units
+        overlap or when the processing environments would clip, resample, mask or shift the land cover grid.
+    """
+    from ATtILA2.utils import polygons
+    from ATtILA2.utils import raster
+
+    timer = timer or raster.timer
+    envConflicts = raster.getArrayEnvironmentConflicts(arcpy.Raster(inLandCoverGrid))
+    if envConflicts:
+        AddMsg(f"{timer.now()} The {', '.join(envConflicts)} environment settings change the land cover grid. "
+               f"Tabulating areas with the Tabulate Area tool.", 0, logFile)
+        return False
+
+    if polygons.hasOverlaps(inReportingUnitFeature):
+        AddMsg(f"{timer.now()} Overlapping reporting units found. Tabulating areas with the Tabulate Area tool.", 1,
+               logFile)
+        return False
+
+    return True
+
+
+def getTiledTabulateAreaTable(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, blockSize,
+                              lccObj=None, timer=None):
+    """ Tabulate the land cover grid by reporting unit one block at a time and return a MatrixTabulateAreaTable """
+    from ATtILA2.utils import raster
+
+    zoneReader, valueReader, zoneIdLookup, cellArea, valueNoData, zoneRasterName = raster.getZoneAndValueReaders(
+        inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, timer, logFile)
+    workers = getZonalWorkerCount()
+    try:
+        AddMsg(f"{timer.now()} Tabulating the land cover grid in blocks of {blockSize} x {blockSize} cells "
+               f"using {workers} process(es).", 0, logFile)
+        zoneCodes, gridValues, areaMatrix = zonal.tiledZonalHistogram(zoneReader, valueReader, cellArea, -1,
+                                                                      valueNoData, blockSize, workers)
+    finally:
+        arcpy.Delete_management(zoneRasterName)
+
+    zoneIdValues, areaMatrix = zonal.mergeZones(zoneCodes, areaMatrix, zoneIdLookup)
+    return MatrixTabulateAreaTable(zoneIdValues, gridValues.tolist(), areaMatrix, lccObj)
+
+
+def getZonalWorkerCount():
+    """ Return the number of processes for tiled tabulation from the user's Parallel Processing Factor
+
+        The geoprocessing tools run with the factor disabled (see setupAndRestore.standardSetup), but the tiled
+        engine's blocks are independent and are tabulated in separate processes.
+    """
+    import multiprocessing
+    import sys
+    from ATtILA2 import setupAndRestore
+
+    workers = zonal.getWorkerCount(setupAndRestore.getRequestedParallelProcessingFactor())
+    if workers > 1 and os.path.basename(sys.executable) == globalConstants.arcExecutable:
+        # worker processes must be started with the python interpreter, not the ArcGIS Pro application
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+
+    return workers
+
+
+def getTabulationCache():
+    """ Return the TabulationCache in the configured folder, or the scratch folder if none is configured """
+
+    cacheDirectory = globalConstants.tabulationCacheFolder
+    if not cacheDirectory:
+        cacheDirectory = os.path.join(arcpy.env.scratchFolder, "attilaTabulationCache")
+
+    return tabcache.TabulationCache(cacheDirectory, globalConstants.tabulationCacheMaxSize)
 
 
 class TabulateAreaTable(object):
-    """ Tabluate area helper"""
+    """ Tabluate area helper
+
+        The TabulateArea output is read once into a zones x values area matrix. Iterating the object yields a
+        TabulateAreaRow view of each zone; the excluded, effective and total areas of all zones are computed with
+        vectorized row sums when the matrix is loaded.
+    """
     
     _value = "Value"
     _tempTableName = "xtmp"
@@ -15,8 +166,9 @@ class TabulateAreaTable(object):
     _tableName = None
     _table = None
     _tabAreaValueFields = None
-    _tabAreaTableRows = None
     _destroyTable = True
+    _zoneIdValues = None
+    _areaMatrix = None
     
 
     def __init__(self, inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, logFile, tableName=None, lccObj=None):
@@ -38,6 +190,7 @@ class TabulateAreaTable(object):
             self._excludedValues = []
         
         self._createNewTable()
+        self._loadAreaMatrix(*self._readAreaMatrix())
         
         
     def _createNewTable(self):
@@ -52,94 +205,220 @@ class TabulateAreaTable(object):
         logArcpy('arcpy.gp.TabulateArea_sa', (self._inReportingUnitFeature, self._reportingUnitIdField, self._inLandCoverGrid, self._value, self._tableName), self._logFile)
         arcpy.gp.TabulateArea_sa(self._inReportingUnitFeature, self._reportingUnitIdField, self._inLandCoverGrid, self._value, self._tableName)
         
-        self._tabAreaTableRows = arcpy.SearchCursor(self._tableName)        
         self._tabAreaValueFields = arcpy.ListFields(self._tableName, self._valueFieldPrefix + "*" )
         self._tabAreaValues = [int(aFld.name.replace(self._valueFieldPrefix,"")) for aFld in self._tabAreaValueFields]
-         
-        self._tabAreaDict = dict(zip(self._tabAreaValues,[])) 
         
         
+    def _readAreaMatrix(self):
+        """ Read the arcpy table with a single TableToNumPyArray call instead of a row cursor """
+
+        fieldNames = [aFld.name for aFld in self._tabAreaValueFields]
+        tableArray = arcpy.da.TableToNumPyArray(self._tableName, [self._reportingUnitIdField] + fieldNames)
+        areaMatrix = np.empty((len(tableArray), len(fieldNames)), dtype=np.float64)
+        for i, fieldName in enumerate(fieldNames):
+            areaMatrix[:, i] = tableArray[fieldName]
+
+        return tableArray[self._reportingUnitIdField].tolist(), list(self._tabAreaValues), areaMatrix
+
+
+    def _loadAreaMatrix(self, zoneIdValues, tabAreaValues, areaMatrix):
+        """ Store an area matrix and precompute the excluded, effective and total area of every zone """
+
+        self._zoneIdValues = zoneIdValues
+        self._tabAreaValues = tabAreaValues
+        self._areaMatrix = areaMatrix
+        self._valueColumns = dict((aValue, i) for i, aValue in enumerate(tabAreaValues))
+
+        self._excludedMask = np.array([aValue in self._excludedValues for aValue in tabAreaValues], dtype=bool)
+        self._excludedAreas = areaMatrix[:, self._excludedMask].sum(axis=1)
+        self._effectiveAreas = areaMatrix[:, ~self._excludedMask].sum(axis=1)
+        self._totalAreas = self._excludedAreas + self._effectiveAreas
+        self._rowIndex = 0
+
+
+    def getAreaMatrix(self):
+        """ Return the tabulated areas as arrays
+
+            Returns a list of zone id values, a list of the tabulated values and a two dimensional float64 NumPy array
+            of areas (zones x values).
+        """
+
+        return self._zoneIdValues, self._tabAreaValues, self._areaMatrix
+
+
+    def getValueColumn(self, tabAreaValue):
+        """ Return the area matrix column of a tabulated value, or None if the value was not tabulated """
+
+        return self._valueColumns.get(tabAreaValue)
+
+
     def __del__(self):
         """ Destructor - Called when deleted (Housekeeping)"""
         
-        del self._tabAreaTableRows
+        self._areaMatrix = None
         
-        if self._destroyTable:
+        if self._destroyTable and self._tableName:
             arcpy.Delete_management(self._tableName)
     
     
     def __iter__(self):
-        """ Return iterator object """
+        """ Return iterator object starting at the first zone. The table can be iterated more than once. """
         
+        self._rowIndex = 0
         return self
 
 
     def __next__(self):
         """ Iterate items"""
         
-        row = self._tabAreaTableRows.__next__()
-        
-        if row:
-            return TabulateAreaRow(row, self._reportingUnitIdField, self._tabAreaValueFields, self._tabAreaValues, 
-                                   self._tabAreaDict, self._excludedValues)
-        else:
+        i = self._rowIndex
+        if i >= len(self._zoneIdValues):
             raise StopIteration
+
+        self._rowIndex += 1
+        return TabulateAreaRow(self, i)
     
 
 
 class TabulateAreaRow(object):    
-    """"""
-    _row = None
-    _tabAreaValueFields = None
-    _tabAreaValues = None
-    _excludedValues = []
-    
-    tabAreaDict = None
-    zoneIdValue = -1
-    excludedArea = -1
-    effectiveArea = -1
-    totalArea = -1
+    """ View of one zone of a tabulate area table
+
+        The row holds only a reference to its table and its row number; areas are read from the table's area matrix
+        and precomputed sums. tabAreaDict is built on first use for calculations that look areas up by grid value.
+    """
+
+    __slots__ = ("_table", "_rowIndex", "_tabAreaDict")
     
     
-    def __init__(self, row, reportingUnitIdField, tabAreaValueFields, tabAreaValues, tabAreaDict, excludedValues):
+    def __init__(self, table, rowIndex):
         """ Constructor - Called when created 
         
-            * row - arcpy row object
+            * table - the TabulateAreaTable holding the area matrix
+            * rowIndex - the matrix row of the zone
         """
         
-        self._row = row
-        self._tabAreaValueFields = tabAreaValueFields
-        self._tabAreaValues = tabAreaValues
-        self.tabAreaDict = tabAreaDict
-        self._reportingUnitIdField = reportingUnitIdField
-        self._excludedValues = excludedValues
-        self._loadRow()
-        
-        
-    def _loadRow(self):
-        
-        self.zoneIdValue = self._row.getValue(self._reportingUnitIdField)
-        
-        self.excludedArea = 0  #area of reporting unit not used in metric calculations e.g., water area
-        self.effectiveArea = 0  #effective area of the reporting unit e.g., land area
-    
-        for i, aFld in enumerate(self._tabAreaValueFields):
-            # store the grid code and it's area value into the dictionary
-            valKey = self._tabAreaValues[i]
-            valArea = self._row.getValue(aFld.name)
-            self.tabAreaDict[valKey] = valArea
-    
-            #add the area of each grid value to the appropriate area sum i.e., effective or excluded area
-            if valKey in self._excludedValues:
-                self.excludedArea += valArea
-            else:
-                self.effectiveArea += valArea               
-        
-        self.totalArea = self.effectiveArea + self.excludedArea
+        self._table = table
+        self._rowIndex = rowIndex
+        self._tabAreaDict = None
 
-    def __del__(self):
-        """ Destructor - Called when deleted (Housekeeping)"""
-        
-        del self._row
 
+    @property
+    def zoneIdValue(self):
+        return self._table._zoneIdValues[self._rowIndex]
+
+
+    @property
+    def excludedArea(self):
+        """ area of reporting unit not used in metric calculations e.g., water area """
+        return float(self._table._excludedAreas[self._rowIndex])
+
+
+    @property
+    def effectiveArea(self):
+        """ effective area of the reporting unit e.g., land area """
+        return float(self._table._effectiveAreas[self._rowIndex])
+
+
+    @property
+    def totalArea(self):
+        return float(self._table._totalAreas[self._rowIndex])
+
+
+    @property
+    def areaRow(self):
+        """ NumPy view of the zone's area for each tabulated value, in the order of the table's values """
+        return self._table._areaMatrix[self._rowIndex]
+
+
+    @property
+    def tabAreaDict(self):
+        """ dictionary of the zone's area keyed to each tabulated value """
+        if self._tabAreaDict is None:
+            self._tabAreaDict = dict(zip(self._table._tabAreaValues, self.areaRow.tolist()))
+        return self._tabAreaDict
+
+
+    def getArea(self, tabAreaValue):
+        """ Return the zone's area for a tabulated value, or 0 if the value was not tabulated """
+
+        column = self._table.getValueColumn(tabAreaValue)
+        if column is None:
+            return 0
+        return float(self._table._areaMatrix[self._rowIndex, column])
+
+
+
+class ArrayTabulateAreaTable(TabulateAreaTable):
+    """ Tabulate area helper backed by NumPy arrays instead of a TabulateArea table
+
+        The zones x values area matrix is computed in memory with zonal.zonalHistogram. Iterating the object yields the
+        same TabulateAreaRow views as the arcpy backend.
+    """
+
+    _zoneArray = None
+    _valueArray = None
+    _destroyTable = False
+
+
+    def __init__(self, zoneArray, valueArray, cellArea=1.0, lccObj=None, zoneIdLookup=None, zoneNoData=None,
+                 valueNoData=None):
+        """ Constructor - Called when created
+
+            * zoneArray - NumPy integer array of zone codes
+            * valueArray - NumPy integer array of land cover values aligned with zoneArray
+            * cellArea - area of a single cell
+            * zoneIdLookup - optional dictionary of zone code to reporting unit id value. Codes sharing an id are merged
+            * zoneNoData, valueNoData - codes used for NoData cells in each array
+
+        """
+
+        self._zoneArray = zoneArray
+        self._valueArray = valueArray
+        self._cellArea = cellArea
+        self._zoneIdLookup = zoneIdLookup
+        self._zoneNoData = zoneNoData
+        self._valueNoData = valueNoData
+
+        if lccObj:
+            self._excludedValues = lccObj.values.getExcludedValueIds()
+        else:
+            self._excludedValues = []
+
+        self._createNewTable()
+
+
+    def _createNewTable(self):
+        """ Compute the zones x values area matrix """
+
+        zoneCodes, gridValues, areaMatrix = zonal.zonalHistogram(self._zoneArray, self._valueArray, self._cellArea,
+                                                                 self._zoneNoData, self._valueNoData)
+        if self._zoneIdLookup:
+            zoneIdValues, areaMatrix = zonal.mergeZones(zoneCodes, areaMatrix, self._zoneIdLookup)
+        else:
+            zoneIdValues = zoneCodes.tolist()
+
+        # the input arrays are not needed once the matrix exists
+        self._zoneArray = None
+        self._valueArray = None
+
+        self._loadAreaMatrix(zoneIdValues, gridValues.tolist(), areaMatrix)
+
+
+
+class MatrixTabulateAreaTable(ArrayTabulateAreaTable):
+    """ Tabulate area helper for an area matrix that has already been computed (e.g., loaded from the cache) """
+
+    def __init__(self, zoneIdValues, tabAreaValues, areaMatrix, lccObj=None):
+        """ Constructor - Called when created
+
+            * zoneIdValues - list of zone id values, one per matrix row
+            * tabAreaValues - list of grid values, one per matrix column
+            * areaMatrix - two dimensional NumPy array of areas (zones x values)
+        """
+
+        if lccObj:
+            self._excludedValues = lccObj.values.getExcludedValueIds()
+        else:
+            self._excludedValues = []
 
+        self._loadAreaMatrix(zoneIdValues, tabAreaValues, areaMatrix)
@@ -0,0 +1,187 @@
+""" Content-addressed cache of zonal tabulation results
+
+    Tools run one after another on the same reporting units and land cover grid (e.g., Land Cover Proportions, Land
+    Cover Coefficient Calculator and Land Cover Diversity in a batch script) all need the same zones x values area
+    matrix. The matrix from the first tool is stored here under a fingerprint of its inputs so that later tools can
+    load it instead of tabulating again.
+
+"""
+import hashlib
+import os
+
+import numpy as np
+
+_cacheFileExtension = ".npz"
+
+
+def getFingerprint(inReportingUnitFeature, reportingUnitIdField, inLandCoverGrid, engine=""):
+    """ Compute a fingerprint of everything that determines a tabulate area result.
+
+        **Description:**
+
+        The fingerprint covers the geometry and id value of every reporting unit feature, the properties and value
+        counts of the land cover grid (or, for a grid without an attribute table, a checksum of its cells), and the
+        cell size, snap raster, extent and output coordinate system environments. Any change to one of these produces
+        a different fingerprint. Reading the reporting units and, for grids without an attribute table, every cell
+        takes time of its own, which is why the cache is off unless globalConstants.tabulationCache is set.
+
+        **Arguments:**
+
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *inLandCoverGrid* - CatalogPath to an input raster dataset
+        * *engine* - name of the tabulation engine, as results can differ slightly between engines
+
+        **Returns:**
+
+        * hexadecimal string
+
+    """
+    import arcpy
+    from arcpy import env
+
+    fingerprint = hashlib.sha256()
+
+    def addPart(part):
+        fingerprint.update(str(part).encode("utf-8"))
+        fingerprint.update(b"\0")
+
+    addPart(engine)
+    addPart(reportingUnitIdField)
+
+    # reporting units: spatial reference and the id value and geometry of each feature
+    addPart(arcpy.Describe(inReportingUnitFeature).spatialReference.exportToString())
+    with arcpy.da.SearchCursor(inReportingUnitFeature, [reportingUnitIdField, "SHAPE@WKB"]) as ruRows:
+        for idValue, shapeWKB in ruRows:
+            addPart(idValue)
+            if shapeWKB:
+                fingerprint.update(bytes(shapeWKB))
+
+    # land cover grid: its georeferencing and the cell count of each value
+    gridDesc = arcpy.Describe(inLandCoverGrid)
+    for gridProperty in (gridDesc.catalogPath, gridDesc.extent.JSON, gridDesc.meanCellWidth, gridDesc.meanCellHeight,
+                         gridDesc.width, gridDesc.height, gridDesc.pixelType, gridDesc.spatialReference.exportToString()):
+        addPart(gridProperty)
+    fieldNames = [aFld.name.upper() for aFld in arcpy.ListFields(inLandCoverGrid)]
+    if "VALUE" in fieldNames and "COUNT" in fieldNames:
+        with arcpy.da.SearchCursor(inLandCoverGrid, ["VALUE", "COUNT"]) as gridRows:
+            addPart(sorted(gridRows))
+    else:
+        # without value counts, hash the cells themselves; a modification time is not available for rasters inside a
+        # geodatabase and would miss edits made in place
+        addGridChecksum(fingerprint, inLandCoverGrid)
+
+    # processing environments
+    addPart(env.cellSize)
+    addPart(env.snapRaster)
+    addPart(env.extent.JSON if hasattr(env.extent, "JSON") else env.extent)
+    addPart(env.outputCoordinateSystem.exportToString() if env.outputCoordinateSystem else "")
+
+    return fingerprint.hexdigest()
+
+
+def addGridChecksum(fingerprint, inRaster, stripCells=2 ** 24):
+    """ Add the cell values of a raster, read in strips of rows, to a hashlib object
+
+        **Arguments:**
+
+        * *fingerprint* - hashlib object to update
+        * *inRaster* - CatalogPath to an input raster dataset
+        * *stripCells* - the number of cells read at a time
+
+    """
+    import arcpy
+    from .raster import ArcpyRasterReader
+
+    gridRaster = arcpy.Raster(inRaster)
+    nRows, nCols = gridRaster.height, gridRaster.width
+    noDataValue = gridRaster.noDataValue
+    reader = ArcpyRasterReader(inRaster, gridRaster.extent.XMin, gridRaster.extent.YMax, nRows, nCols,
+                               gridRaster.meanCellWidth, gridRaster.meanCellHeight, noDataValue)
+    fingerprint.update(str(noDataValue).encode("utf-8"))
+    stripRows = max(stripCells // max(nCols, 1), 1)
+    for rowOffset in range(0, nRows, stripRows):
+        stripArray = reader.readBlock(rowOffset, 0, min(stripRows, nRows - rowOffset), nCols)
+        fingerprint.update(np.ascontiguousarray(stripArray).tobytes())
+
+
+class TabulationCache(object):
+    """ Directory of stored area matrices keyed by input fingerprint, with least recently used eviction by size """
+
+    def __init__(self, cacheDirectory, maxCacheSize):
+        """ Constructor - Called when created
+
+            * cacheDirectory - folder used to store the cached matrices. It is created if it does not exist
+            * maxCacheSize - largest total size, in bytes, of the stored matrices
+        """
+
+        self.cacheDirectory = cacheDirectory
+        self.maxCacheSize = maxCacheSize
+
+
+    def _getFilePath(self, fingerprint):
+        return os.path.join(self.cacheDirectory, fingerprint + _cacheFileExtension)
+
+
+    def load(self, fingerprint):
+        """ Return the cached (zoneIdValues, tabAreaValues, areaMatrix) for the fingerprint, or None """
+
+        filePath = self._getFilePath(fingerprint)
+        if not os.path.exists(filePath):
+            return None
+
+        try:
+            with np.load(filePath, allow_pickle=False) as cached:
+                result = (cached["zoneIdValues"].tolist(), cached["tabAreaValues"].tolist(), cached["areaMatrix"])
+        except (OSError, ValueError, KeyError):
+            # an unreadable entry is treated as a miss and replaced on the next store
+            return None
+
+        # mark the entry as recently used
+        os.utime(filePath, None)
+        return result
+
+
+    def store(self, fingerprint, zoneIdValues, tabAreaValues, areaMatrix):
+        """ Store an area matrix under the fingerprint, then evict old entries beyond the size limit """
+
+        os.makedirs(self.cacheDirectory, exist_ok=True)
+        filePath = self._getFilePath(fingerprint)
+
+        # write to a temporary name first so that an interrupted write never leaves a partial entry
+        tempFilePath = filePath + ".tmp" + _cacheFileExtension
+        np.savez(tempFilePath, zoneIdValues=np.asarray(zoneIdValues), tabAreaValues=np.asarray(tabAreaValues),
+                 areaMatrix=np.asarray(areaMatrix, dtype=np.float64))
+        os.replace(tempFilePath, filePath)
+
+        self.evict()
+
+
+    def evict(self):
+        """ Delete the least recently used entries until the cache fits within maxCacheSize """
+
+        if not os.path.isdir(self.cacheDirectory):
+            return
+
+        entries = []
+        for fileName in os.listdir(self.cacheDirectory):
+            if fileName.endswith(_cacheFileExtension):
+                filePath = os.path.join(self.cacheDirectory, fileName)
+                fileStat = os.stat(filePath)
+                entries.append((fileStat.st_mtime, fileStat.st_size, filePath))
+
+        totalSize = sum(entry[1] for entry in entries)
+        for _mtime, fileSize, filePath in sorted(entries):
+            if totalSize <= self.maxCacheSize:
+                break
+            os.remove(filePath)
+            totalSize -= fileSize
+
+
+    def clear(self):
+        """ Delete every cached entry """
+
+        if os.path.isdir(self.cacheDirectory):
+            for fileName in os.listdir(self.cacheDirectory):
+                if fileName.endswith(_cacheFileExtension):
+                    os.remove(os.path.join(self.cacheDirectory, fileName))
@@ -0,0 +1,251 @@
+""" Bulk writers for ATtILA metric output tables
+
+    Metric calculations collect their results column by column (one value per reporting unit) in a writer object.
+    The writer then puts all the values in the output table at once instead of one row and one field at a time.
+    ArcpyTableWriter writes to geodatabase and INFO tables; FileTableWriter writes the same columns to a CSV or Parquet
+    file so that the calculations can run and be checked without ArcGIS.
+
+"""
+import csv
+import os
+from abc import ABC, abstractmethod
+
+
+def getTableWriter(newTable, idFieldName):
+    """ Return the writer appropriate for the output table.
+
+        **Arguments:**
+
+        * *newTable* - the ATtILA created output table, or the path of a .csv or .parquet file
+        * *idFieldName* - the name of the reporting unit id field in the output table
+
+        **Returns:**
+
+        * FileTableWriter for .csv and .parquet paths, otherwise ArcpyTableWriter
+
+    """
+    if os.path.splitext(str(newTable))[1].lower() in FileTableWriter.fileExtensions:
+        return FileTableWriter(newTable, idFieldName)
+
+    return ArcpyTableWriter(newTable, idFieldName)
+
+
+def _toList(values):
+    """ Convert a NumPy array or any other sequence of values to a list of python values """
+    if hasattr(values, "tolist"):
+        return values.tolist()
+
+    return list(values)
+
+
+class MetricTableWriter(ABC):
+    """ Collects metric output values by column and writes them to a table in bulk
+
+        Columns are added with addColumn after the reporting unit ids are set with setIds. The values for each
+        column are stored as python lists in the order of the ids. Subclasses implement getRowCount, insertRows and
+        updateRows for their kind of table.
+    """
+
+    def __init__(self, newTable, idFieldName):
+        """ Constructor - Called when created
+
+            * newTable - the output table
+            * idFieldName - the name of the reporting unit id field in the output table
+        """
+
+        self.newTable = newTable
+        self.idFieldName = idFieldName
+        self.columns = {}
+        self._idValues = []
+
+
+    def setIds(self, idValues):
+        """ Set the reporting unit id values; one output row is written per id """
+
+        self._idValues = _toList(idValues)
+
+
+    def addColumn(self, fieldName, values):
+        """ Add the values for one output field. Values must be in the same order as the ids """
+
+        values = _toList(values)
+        if len(values) != len(self._idValues):
+            raise ValueError("Column %s has %s values for %s reporting units" % (fieldName, len(values),
+                                                                               len(self._idValues)))
+        self.columns[fieldName] = values
+
+
+    def getFieldNames(self):
+        """ Return the output field names, starting with the id field """
+
+        return [self.idFieldName] + list(self.columns.keys())
+
+
+    def getRows(self):
+        """ Return an iterator of row tuples in the order of getFieldNames """
+
+        return zip(self._idValues, *self.columns.values())
+
+
+    @abstractmethod
+    def getRowCount(self):
+        """ Return the number of rows already in the output table """
+
+
+    @abstractmethod
+    def insertRows(self):
+        """ Append a new row for every reporting unit """
+
+
+    @abstractmethod
+    def updateRows(self, defaultValues=None):
+        """ Update the rows already in the output table, matching them by reporting unit id
+
+            * defaultValues - optional dictionary of field name to value used for rows whose id has no result. Rows
+                              without a result are left unchanged for fields that are not in the dictionary.
+        """
+
+
+    def writeRows(self, defaultValues=None):
+        """ Insert the rows if the output table is empty, otherwise update the existing rows """
+
+        if self.getRowCount() == 0:
+            self.insertRows()
+        else:
+            self.updateRows(defaultValues)
+
+
+    def _getUpdatedRow(self, row, resultIndex, defaultValues):
+        """ Return the new values for an existing row, or None if the row should be left as it is """
+
+        rowIndex = resultIndex.get(row[0])
+        if rowIndex is not None:
+            return [row[0]] + [values[rowIndex] for values in self.columns.values()]
+
+        if defaultValues:
+            return [row[0]] + [defaultValues.get(fieldName, row[i + 1])
+                               for i, fieldName in enumerate(self.columns.keys())]
+
+        return None
+
+
+
+class ArcpyTableWriter(MetricTableWriter):
+    """ Writes collected columns to an ArcGIS table with arcpy.da cursors """
+
+    def getRowCount(self):
+        import arcpy
+
+        return int(arcpy.GetCount_management(self.newTable).getOutput(0))
+
+
+    def insertRows(self):
+        import arcpy
+
+        with arcpy.da.InsertCursor(self.newTable, self.getFieldNames()) as outTableRows:
+            for outRow in self.getRows():
+                outTableRows.insertRow(outRow)
+
+
+    def updateRows(self, defaultValues=None):
+        import arcpy
+
+        resultIndex = dict((idValue, i) for i, idValue in enumerate(self._idValues))
+        with arcpy.da.UpdateCursor(self.newTable, self.getFieldNames()) as outTableRows:
+            for row in outTableRows:
+                newRow = self._getUpdatedRow(row, resultIndex, defaultValues)
+                if newRow is not None:
+                    outTableRows.updateRow(newRow)
+
+
+
+class FileTableWriter(MetricTableWriter):
+    """ Writes collected columns to a CSV file, or to a Parquet file when pandas and a Parquet engine are available
+
+        This stand-in for ArcpyTableWriter lets the metric calculations be run and checked without ArcGIS. Existing
+        rows are read back from the file so that insertRows and updateRows behave as they do for an ArcGIS table.
+    """
+
+    fileExtensions = [".csv", ".parquet"]
+
+
+    def _isParquet(self):
+        return str(self.newTable).lower().endswith(".parquet")
+
+
+    def _readTable(self):
+        """ Return the field names and rows currently stored in the file """
+
+        if not os.path.exists(self.newTable):
+            return [], []
+
+        if self._isParquet():
+            import pandas as pd
+
+            dataFrame = pd.read_parquet(self.newTable)
+            return list(dataFrame.columns), [list(row) for row in dataFrame.itertuples(index=False)]
+
+        with open(self.newTable, newline="") as csvFile:
+            rows = list(csv.reader(csvFile))
+        if not rows:
+            return [], []
+
+        return rows[0], rows[1:]
+
+
+    def _writeTable(self, fieldNames, rows):
+        if self._isParquet():
+            import pandas as pd
+
+            pd.DataFrame(rows, columns=fieldNames).to_parquet(self.newTable, index=False)
+            return
+
+        with open(self.newTable, "w", newline="") as csvFile:
+            csvWriter = csv.writer(csvFile)
+            csvWriter.writerow(fieldNames)
+            csvWriter.writerows(rows)
+
+
+    def _alignRows(self, fieldNames, rows):
+        """ Add the writer's fields to the stored field names and return the widened rows """
+
+        for fieldName in self.getFieldNames():
+            if fieldName not in fieldNames:
+                fieldNames.append(fieldName)
+        return fieldNames, [list(row) + [None] * (len(fieldNames) - len(row)) for row in rows]
+
+
+    def getRowCount(self):
+        return len(self._readTable()[1])
+
+
+    def insertRows(self):
+        fieldNames, rows = self._alignRows(*self._readTable())
+        positions = [fieldNames.index(fieldName) for fieldName in self.getFieldNames()]
+        for outRow in self.getRows():
+            newRow = [None] * len(fieldNames)
+            for position, value in zip(positions, outRow):
+                newRow[position] = value
+            rows.append(newRow)
+
+        self._writeTable(fieldNames, rows)
+
+
+    def updateRows(self, defaultValues=None):
+        fieldNames, rows = self._alignRows(*self._readTable())
+        positions = [fieldNames.index(fieldName) for fieldName in self.getFieldNames()]
+
+        # ids read back from a CSV file are text, so match on the text form of the id
+        if self._isParquet():
+            resultIndex = dict((idValue, i) for i, idValue in enumerate(self._idValues))
+        else:
+            resultIndex = dict((str(idValue), i) for i, idValue in enumerate(self._idValues))
+
+        for row in rows:
+            currentRow = [row[position] for position in positions]
+            newRow = self._getUpdatedRow(currentRow, resultIndex, defaultValues)
+            if newRow is not None:
+                for position, value in zip(positions[1:], newRow[1:]):
+                    row[position] = value
+
+        self._writeTable(fieldNames, rows)
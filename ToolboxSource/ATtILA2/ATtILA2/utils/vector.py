@@ -12,6 +12,7 @@ from arcpy.sa.Functions import SetNull
 from .log import logArcpy
 from arcpy import env
 from os.path import basename
+from ATtILA2.constants import globalConstants
 
 
 def bufferFeaturesByID(inFeatures, repUnits, outFeatures, bufferDist, ruIDField, ruLinkField, timer, logFile):
@@ -793,8 +794,78 @@ def addCalculateField(inFeatures,fieldName,fieldType,calcExpression,codeBlock='#
     return fieldName   
 
 
+def tabulateMDCPFromArray(inPatchRaster, inReportingUnitFeature, reportingUnitIdField, zoneAreaDict, timer, logFile):
+    """ Compute the mean distance to closest patch for every reporting unit directly from the patch raster cells.
+
+        **Description:**
+
+        The reporting units are rasterized onto the patch raster's cells and both are read into NumPy arrays. The
+        distances between patches are then measured between the boundary cells of the patches in each reporting unit
+        (see patches.getNearestPatchDistances) instead of converting the patches to polygons and running Clip and
+        GenerateNearTable once per reporting unit. Patches are clipped to a reporting unit by cell center. Each cell
+        is given to only one reporting unit, so tabulateMDCP only uses this when the reporting units do not overlap.
+
+        **Arguments:**
+
+        * *inPatchRaster* - raster of patch labels; patches have values greater than 0
+        * *inReportingUnitFeature* - CatalogPath to an input vector feature
+        * *reportingUnitIdField* - the name of the field in the reporting unit feature to use as its identifier
+        * *zoneAreaDict* - dictionary of reporting unit id values to their area
+        * *timer* - DateTimer object used for progress messages
+        * *logFile* - file object for recording process steps
+
+        **Returns:**
+
+        * dictionary keyed to reporting unit id of a (PWN, PWON, MDCP) tuple
+
+    """
+    import math
+    from . import patches
+    from . import raster
+
+    AddMsg(f"{timer.now()} Reading reporting units and patches into arrays", 0, logFile)
+    zoneArray, patchArray, zoneIdLookup, cellArea, patchNoData = raster.getZoneAndValueArrays(inReportingUnitFeature, 
+                                                                                              reportingUnitIdField, 
+                                                                                              inPatchRaster, timer, 
+                                                                                              logFile)
+    if patchNoData is not None:
+        patchArray[patchArray == patchNoData] = 0
+
+    AddMsg(f"{timer.now()} Finding the closest patch to each patch in every reporting unit", 0, logFile)
+    zoneResults = patches.getNearestPatchDistances(zoneArray, patchArray, math.sqrt(cellArea))
+    del zoneArray, patchArray
+
+    resultDict = dict((zoneIdLookup[zoneCode], mdcpValues) for zoneCode, mdcpValues in zoneResults.items())
+
+    noPatches = 0
+    singlePatch = 0
+    for aZone in zoneAreaDict.keys():
+        if aZone not in resultDict:
+            resultDict[aZone] = (-9999, -9999, -9999)
+            noPatches += 1
+        elif resultDict[aZone][1] == 1:
+            singlePatch += 1
+
+    if noPatches > 0:
+        AddMsg(f"{noPatches} reporting units contained no patches. MDCP was set to -9999 for these units.", 1, logFile)
+
+    if singlePatch > 0:
+        AddMsg(f"{singlePatch} reporting units contained a single patch. MDCP was set to 0 for these units.", 1, logFile)
+
+    return dict((aZone, resultDict[aZone]) for aZone in zoneAreaDict.keys())
+
+
 def tabulateMDCP(inPatchRaster, inReportingUnitFeature, reportingUnitIdField, rastoPolyFeature, patchCentroidsFeature, 
-                 patchDissolvedFeature, nearPatchTable, zoneAreaDict, timer, pmResultsDict, logFile):
+                 patchDissolvedFeature, nearPatchTable, zoneAreaDict, timer, pmResultsDict, logFile, useArrays=None):
+    # the rasterized reporting units give each cell to one unit, so overlapping reporting units are clipped one at a time
+    if useArrays is None:
+        from . import polygons
+        useArrays = globalConstants.patchEngine == "NUMPY" and not polygons.hasOverlaps(inReportingUnitFeature)
+    
+    if useArrays:
+        return tabulateMDCPFromArray(inPatchRaster, inReportingUnitFeature, reportingUnitIdField, zoneAreaDict, timer, 
+                                     logFile)
+
     resultDict = {}
     
     # put the proper field delimiters around the ID field name for SQL expressions
@@ -970,7 +1041,7 @@ def tabulateMDCP(inPatchRaster, inReportingUnitFeature, reportingUnitIdField, ra
                     arcpy.Delete_management(nearPatchTable)
     
                                   
-            resultDict[aZone] = f"{pwnCount},{pwonCount},{meanDist}"
+            resultDict[aZone] = (pwnCount, pwonCount, meanDist)
             
             # delete the single reporting unit layer
             arcpy.Delete_management(aReportingUnitLayer)
@@ -1005,7 +1076,7 @@ def tabulateMDCP(inPatchRaster, inReportingUnitFeature, reportingUnitIdField, ra
             pwnCount = -9999
             pwonCount = -9999
             
-            resultDict[aZone] = f"{pwnCount},{pwonCount},{meanDist}"
+            resultDict[aZone] = (pwnCount, pwonCount, meanDist)
               
     return resultDict
 
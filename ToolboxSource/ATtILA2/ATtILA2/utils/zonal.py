@@ -0,0 +1,453 @@
+""" Array based zonal tabulation
+
+    The functions in this module operate on NumPy arrays only and do not require arcpy. They provide the engine behind
+    the array backend of the TabulateAreaTable helper and can be exercised with synthetic grids.
+
+"""
+import numpy as np
+
+# Largest range of integer codes that will be indexed with a dense lookup array instead of a sort
+_maxDenseRange = 2 ** 24
+
+
+def getDenseIndex(codeArray):
+    """ Map an array of codes to a compact, zero-based index.
+
+        **Description:**
+
+        Returns the sorted unique codes found in *codeArray* and an index array of the same length as *codeArray* that
+        holds the position of each code in the unique list. Integer codes spanning a modest range are indexed with a
+        single bincount and lookup array; anything else falls back to a sort.
+
+        **Arguments:**
+
+        * *codeArray* - one dimensional NumPy array of codes
+
+        **Returns:**
+
+        * NumPy array of sorted unique codes
+        * NumPy integer array of indexes into the unique codes
+
+    """
+    if codeArray.size == 0:
+        return codeArray[:0], np.zeros(0, dtype=np.intp)
+
+    if codeArray.dtype.kind in "iub":
+        minCode = int(codeArray.min())
+        maxCode = int(codeArray.max())
+        if maxCode - minCode < _maxDenseRange:
+            offsetArray = codeArray.astype(np.int64) - minCode
+            present = np.bincount(offsetArray, minlength=maxCode - minCode + 1) > 0
+            uniqueCodes = (np.flatnonzero(present) + minCode).astype(codeArray.dtype)
+            lookup = np.cumsum(present) - 1
+            return uniqueCodes, lookup[offsetArray]
+
+    uniqueCodes, indexArray = np.unique(codeArray, return_inverse=True)
+    return uniqueCodes, indexArray.ravel()
+
+
+def getValidCellMask(zoneArray, valueArray, zoneNoData=None, valueNoData=None):
+    """ Return a boolean mask of the cells that have both a zone and a grid value.
+
+        **Arguments:**
+
+        * *zoneArray* - NumPy array of zone codes
+        * *valueArray* - NumPy array of grid values with the same shape as *zoneArray*
+        * *zoneNoData* - the code used for cells outside of any zone, or None
+        * *valueNoData* - the code used for NoData grid cells, or None
+
+        **Returns:**
+
+        * boolean NumPy array with the same shape as the inputs
+
+    """
+    validMask = np.ones(zoneArray.shape, dtype=bool)
+    for anArray, noData in ((zoneArray, zoneNoData), (valueArray, valueNoData)):
+        if noData is not None:
+            validMask &= anArray != noData
+        if anArray.dtype.kind == "f":
+            validMask &= ~np.isnan(anArray)
+
+    return validMask
+
+
+def zonalHistogram(zoneArray, valueArray, cellArea=1.0, zoneNoData=None, valueNoData=None):
+    """ Compute the zones x values area matrix for a zone array and a grid value array.
+
+        **Description:**
+
+        Cells that carry a zone code and a grid value are reduced to a single combined (zone, value) key, and the
+        number of cells for every key is counted with one np.bincount pass. The counts are multiplied by the cell
+        area to give the area of each grid value within each zone. Only zones and values present in the valid cells
+        appear in the output.
+
+        **Arguments:**
+
+        * *zoneArray* - NumPy integer array of zone codes
+        * *valueArray* - NumPy integer array of grid values with the same shape as *zoneArray*
+        * *cellArea* - area represented by a single cell
+        * *zoneNoData* - the code used for cells outside of any zone, or None
+        * *valueNoData* - the code used for NoData grid cells, or None
+
+        **Returns:**
+
+        * NumPy array of zone codes, one per matrix row
+        * NumPy array of grid values, one per matrix column
+        * two dimensional float64 NumPy array of areas (zones x values)
+
+    """
+    if zoneArray.shape != valueArray.shape:
+        raise ValueError("Zone array shape %s does not match grid value array shape %s" %
+                         (zoneArray.shape, valueArray.shape))
+
+    validMask = getValidCellMask(zoneArray, valueArray, zoneNoData, valueNoData)
+    zoneCodes, zoneIndex = getDenseIndex(zoneArray[validMask])
+    gridValues, valueIndex = getDenseIndex(valueArray[validMask])
+
+    numZones = len(zoneCodes)
+    numValues = len(gridValues)
+    combinedKeys = zoneIndex.astype(np.int64) * numValues + valueIndex
+    cellCounts = np.bincount(combinedKeys, minlength=numZones * numValues)
+    areaMatrix = cellCounts.reshape(numZones, numValues) * float(cellArea)
+
+    return zoneCodes, gridValues, areaMatrix
+
+
+def mergeZones(zoneCodes, areaMatrix, zoneIdLookup):
+    """ Combine the matrix rows of zone codes that belong to the same reporting unit id.
+
+        **Description:**
+
+        Zone arrays are usually rasterized from an object id so that any reporting unit id field type can be used.
+        Multipart reporting units can be stored as several features sharing an id value; their rows are summed here.
+
+        **Arguments:**
+
+        * *zoneCodes* - NumPy array of zone codes, one per matrix row
+        * *areaMatrix* - two dimensional NumPy array of areas (zones x values)
+        * *zoneIdLookup* - dictionary of zone code to reporting unit id value
+
+        **Returns:**
+
+        * list of reporting unit id values in ascending order
+        * two dimensional float64 NumPy array of areas (reporting units x values)
+
+    """
+    idValues = [zoneIdLookup[code] for code in zoneCodes.tolist()]
+    uniqueIds = sorted(set(idValues))
+    if len(uniqueIds) == len(idValues):
+        order = sorted(range(len(idValues)), key=idValues.__getitem__)
+        return uniqueIds, areaMatrix[order]
+
+    idPosition = dict((idValue, i) for i, idValue in enumerate(uniqueIds))
+    rowIndex = np.array([idPosition[idValue] for idValue in idValues], dtype=np.intp)
+    mergedMatrix = np.zeros((len(uniqueIds), areaMatrix.shape[1]), dtype=np.float64)
+    np.add.at(mergedMatrix, rowIndex, areaMatrix)
+
+    return uniqueIds, mergedMatrix
+
+
+def iterBlocks(nRows, nCols, blockSize):
+    """ Yield the (rowOffset, colOffset, blockRows, blockCols) windows that tile a grid of nRows x nCols cells """
+
+    for rowOffset in range(0, nRows, blockSize):
+        for colOffset in range(0, nCols, blockSize):
+            yield rowOffset, colOffset, min(blockSize, nRows - rowOffset), min(blockSize, nCols - colOffset)
+
+
+class ZonalAccumulator(object):
+    """ Running sparse (zone, value) cell count accumulator
+
+        Each zone and grid value pair is packed into a single int64 key with the zone code in the upper 32 bits and the
+        grid value in the lower 32 bits. The unique keys and cell counts of each block are appended to a list of pending
+        parts, and the parts are merged into sorted keys and totals once, when the results are read. Only the keys that
+        have been seen and their cell counts are kept, so the memory used grows with the number of zone and value pairs,
+        not with the number of cells.
+    """
+
+    # number of pending keys beyond which the parts are merged early, to bound memory on grids with many blocks
+    maxPendingKeys = 2 ** 24
+
+    def __init__(self):
+        """ Constructor - Called when created """
+
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pendingKeys = []
+        self._pendingCounts = []
+        self._pendingSize = 0
+
+
+    @property
+    def keys(self):
+        """ Sorted unique int64 keys of the pairs counted so far """
+
+        self._mergePending()
+        return self._keys
+
+
+    @property
+    def counts(self):
+        """ Cell counts of the pairs counted so far, in the order of keys """
+
+        self._mergePending()
+        return self._counts
+
+
+    def addBlock(self, zoneBlock, valueBlock, zoneNoData=None, valueNoData=None):
+        """ Count the valid cells of one pair of aligned zone and grid value blocks """
+
+        validMask = getValidCellMask(zoneBlock, valueBlock, zoneNoData, valueNoData)
+        zoneCodes = zoneBlock[validMask].astype(np.int64)
+        gridValues = valueBlock[validMask].astype(np.int64)
+        if zoneCodes.size == 0:
+            return
+
+        if zoneCodes.min() < 0 or zoneCodes.max() > 0x7FFFFFFF:
+            raise ValueError("Zone codes must be between 0 and 2147483647 for tiled tabulation")
+        if gridValues.min() < -0x80000000 or gridValues.max() > 0x7FFFFFFF:
+            raise ValueError("Grid values must fit in a 32 bit integer for tiled tabulation")
+
+        blockKeys, blockCounts = np.unique((zoneCodes << 32) | (gridValues & 0xFFFFFFFF), return_counts=True)
+        self.addCounts(blockKeys, blockCounts)
+
+
+    def addCounts(self, keys, counts):
+        """ Add the cell counts of keys to the running totals; the keys are merged when the results are read """
+
+        keys = np.asarray(keys, dtype=np.int64)
+        if keys.size == 0:
+            return
+
+        self._pendingKeys.append(keys)
+        self._pendingCounts.append(np.asarray(counts, dtype=np.int64))
+        self._pendingSize += keys.size
+        if self._pendingSize > max(self.maxPendingKeys, 2 * self._keys.size):
+            self._mergePending()
+
+
+    def _mergePending(self):
+        """ Merge the pending parts into the sorted keys and totals with one sort """
+
+        if not self._pendingKeys:
+            return
+
+        allKeys = np.concatenate([self._keys] + self._pendingKeys)
+        allCounts = np.concatenate([self._counts] + self._pendingCounts)
+        mergedKeys, inverse = np.unique(allKeys, return_inverse=True)
+        self._keys = mergedKeys
+        self._counts = np.bincount(inverse.ravel(), weights=allCounts, minlength=mergedKeys.size).astype(np.int64)
+        self._pendingKeys = []
+        self._pendingCounts = []
+        self._pendingSize = 0
+
+
+    def merge(self, other):
+        """ Add the totals of another ZonalAccumulator to this one """
+
+        self._pendingKeys.extend([other._keys] + other._pendingKeys)
+        self._pendingCounts.extend([other._counts] + other._pendingCounts)
+        self._pendingSize += other._keys.size + other._pendingSize
+
+
+    def getSparseCounts(self):
+        """ Return NumPy arrays of the zone code, grid value and cell count of every pair, sorted by zone then value """
+
+        return self.keys >> 32, (self.keys & 0xFFFFFFFF).astype(np.uint32).view(np.int32), self.counts
+
+
+    def getAreaMatrix(self, cellArea=1.0):
+        """ Return the zone codes, grid values and zones x values area matrix, as returned by zonalHistogram """
+
+        zoneCodes, zoneIndex = getDenseIndex(self.keys >> 32)
+        gridValues, valueIndex = getDenseIndex((self.keys & 0xFFFFFFFF).astype(np.uint32).view(np.int32))
+        areaMatrix = np.zeros((len(zoneCodes), len(gridValues)), dtype=np.float64)
+        areaMatrix[zoneIndex, valueIndex] = self.counts * float(cellArea)
+
+        return zoneCodes, gridValues, areaMatrix
+
+
+def tiledZonalHistogram(zoneReader, valueReader, cellArea=1.0, zoneNoData=None, valueNoData=None, blockSize=4096,
+                        workers=1):
+    """ Compute the zones x values area matrix one aligned block at a time.
+
+        **Description:**
+
+        Grids too large to be held in memory are read in blocks of at most blockSize x blockSize cells. The cell counts
+        of each block are added to a ZonalAccumulator, so peak memory is bounded by the block size and the number of
+        zone and value pairs rather than by the size of the grid. Value blocks are only read where the zone block holds
+        at least one zone.
+
+        With more than one worker, the blocks are divided among worker processes. Each worker reads its own blocks
+        through the (picklable) readers and returns a partial accumulator; the partial results are combined with
+        mergeAccumulators.
+
+        **Arguments:**
+
+        * *zoneReader* - block reader for the zone grid (see MemmapRasterReader)
+        * *valueReader* - block reader for the grid values, aligned with and the same shape as *zoneReader*
+        * *cellArea* - area represented by a single cell
+        * *zoneNoData* - the code used for cells outside of any zone, or None
+        * *valueNoData* - the code used for NoData grid cells, or None
+        * *blockSize* - the number of rows and columns in a block
+        * *workers* - the number of worker processes
+
+        **Returns:**
+
+        * NumPy array of zone codes, one per matrix row
+        * NumPy array of grid values, one per matrix column
+        * two dimensional float64 NumPy array of areas (zones x values)
+
+    """
+    accumulator = tabulateBlocks(zoneReader, valueReader, zoneNoData, valueNoData, blockSize, workers)
+
+    return accumulator.getAreaMatrix(cellArea)
+
+
+def tabulateBlocks(zoneReader, valueReader, zoneNoData=None, valueNoData=None, blockSize=4096, workers=1):
+    """ Count the cells of every (zone, value) pair one aligned block at a time and return the ZonalAccumulator
+
+        This is the sparse form of tiledZonalHistogram, for grids such as patch labels where a dense zones x values
+        matrix would be mostly zeros. See tiledZonalHistogram for the arguments.
+    """
+    if zoneReader.shape != valueReader.shape:
+        raise ValueError("Zone grid shape %s does not match grid value shape %s" % (zoneReader.shape, valueReader.shape))
+
+    windows = list(iterBlocks(zoneReader.shape[0], zoneReader.shape[1], blockSize))
+    if workers > 1 and len(windows) > 1:
+        return _tabulateWindowsInParallel(zoneReader, valueReader, windows, zoneNoData, valueNoData, workers)
+
+    return _tabulateWindows(zoneReader, valueReader, windows, zoneNoData, valueNoData)
+
+
+def _tabulateWindows(zoneReader, valueReader, windows, zoneNoData, valueNoData):
+    """ Return a ZonalAccumulator of the cell counts in the given block windows """
+
+    accumulator = ZonalAccumulator()
+    for window in windows:
+        zoneBlock = zoneReader.readBlock(*window)
+        if zoneNoData is not None and not (zoneBlock != zoneNoData).any():
+            continue
+        accumulator.addBlock(zoneBlock, valueReader.readBlock(*window), zoneNoData, valueNoData)
+
+    return accumulator
+
+
+def _tabulateWindowsInParallel(zoneReader, valueReader, windows, zoneNoData, valueNoData, workers):
+    """ Tabulate groups of block windows in worker processes and merge their accumulators """
+    from concurrent.futures import ProcessPoolExecutor
+
+    # interleave the windows so that each group covers a similar share of the grid's zones and empty areas
+    numGroups = min(len(windows), workers * 4)
+    windowGroups = [windows[i::numGroups] for i in range(numGroups)]
+
+    # the readers are sent to the workers, and each worker reads its own blocks from the grid files
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_tabulateWindows, zoneReader, valueReader, windowGroup, zoneNoData, valueNoData)
+                   for windowGroup in windowGroups]
+        accumulators = [future.result() for future in futures]
+
+    return mergeAccumulators(accumulators)
+
+
+def mergeAccumulators(accumulators):
+    """ Merge a list of ZonalAccumulator objects and return the total
+
+        The accumulators are merged in a pairwise tree reduction: neighbouring pairs are merged level by level until one
+        total is left, so each merge combines two totals of similar size rather than adding every part to one growing
+        total. The inputs are merged in place; the first accumulator holds the total.
+    """
+
+    accumulators = list(accumulators)
+    if not accumulators:
+        return ZonalAccumulator()
+
+    while len(accumulators) > 1:
+        mergedAccumulators = []
+        for i in range(0, len(accumulators) - 1, 2):
+            accumulators[i].merge(accumulators[i + 1])
+            accumulators[i]._mergePending()
+            mergedAccumulators.append(accumulators[i])
+        if len(accumulators) % 2:
+            mergedAccumulators.append(accumulators[-1])
+        accumulators = mergedAccumulators
+
+    return accumulators[0]
+
+
+def getWorkerCount(parallelProcessingFactor, cpuCount=None):
+    """ Convert a Parallel Processing Factor environment value to a number of worker processes.
+
+        **Description:**
+
+        The factor follows the ArcGIS convention: a whole number of processes (e.g., "4") or a percentage of the
+        available cores (e.g., "50%"). An empty, zero or None factor gives a single process.
+
+        **Arguments:**
+
+        * *parallelProcessingFactor* - the factor as a string or number, or None
+        * *cpuCount* - the number of available cores; defaults to os.cpu_count()
+
+        **Returns:**
+
+        * integer of at least 1
+
+    """
+    import os
+
+    factor = str(parallelProcessingFactor).strip() if parallelProcessingFactor is not None else ""
+    if factor in ("", "None", "0"):
+        return 1
+
+    cpuCount = cpuCount or os.cpu_count() or 1
+    try:
+        if factor.endswith("%"):
+            workers = int(cpuCount * float(factor[:-1]) / 100.0)
+        else:
+            workers = int(float(factor))
+    except ValueError:
+        return 1
+
+    return max(1, min(workers, cpuCount))
+
+
+class MemmapRasterReader(object):
+    """ Block reader over a grid stored as a NumPy .npy file or a raw binary file
+
+        The file is memory mapped, so only the blocks that are read are brought into memory. This stand-in for an arcpy
+        raster lets the tiled engine be run and timed on machines without ArcGIS; a grid can be written for it with
+        np.save.
+    """
+
+    def __init__(self, filePath, shape=None, dtype=None, noDataValue=None, offset=0):
+        """ Constructor - Called when created
+
+            * filePath - path of a .npy file, or of a raw row-major binary file
+            * shape - (rows, columns) of a raw binary file
+            * dtype - NumPy data type of a raw binary file
+            * noDataValue - the NoData value of the grid, or None
+            * offset - number of header bytes to skip in a raw binary file
+        """
+
+        if filePath.lower().endswith(".npy"):
+            self._array = np.load(filePath, mmap_mode="r")
+        else:
+            self._array = np.memmap(filePath, dtype=dtype, mode="r", offset=offset, shape=tuple(shape))
+        self.shape = self._array.shape
+        self.noDataValue = noDataValue
+        self._arguments = (filePath, shape, dtype, noDataValue, offset)
+
+
+    def __getstate__(self):
+        # send the file description to worker processes instead of the mapped cells
+        return self._arguments
+
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+    def readBlock(self, rowOffset, colOffset, blockRows, blockCols):
+        """ Return the block of cells starting at rowOffset, colOffset as an in-memory array """
+
+        return np.array(self._array[rowOffset:rowOffset + blockRows, colOffset:colOffset + blockCols])
@@ -0,0 +1,49 @@
+""" Pytest setup for the tests of the NumPy engines in ATtILA2.utils
+
+    The engine modules operate on NumPy arrays only, but importing the ATtILA2 package runs its __init__, which imports
+    arcpy. Unless the package is already loaded, ATtILA2 and ATtILA2.utils are registered here as bare packages over
+    the source folders, so the engine modules are imported from source on machines without ArcGIS.
+
+"""
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+_toolboxFolder = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_packageFolder = os.path.join(_toolboxFolder, "ATtILA2", "ATtILA2")
+
+
+def _registerPackage(name, folder):
+    """ Register an empty package whose submodules are loaded from folder """
+
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [folder]
+        sys.modules[name] = package
+
+
+_registerPackage("ATtILA2", _packageFolder)
+_registerPackage("ATtILA2.utils", os.path.join(_packageFolder, "utils"))
+
+
+@pytest.fixture
+def rng():
+    """ A seeded random generator, so failures can be reproduced """
+
+    return np.random.default_rng(20260930)
+
+
+@pytest.fixture(params=["scipy", "numpy"])
+def scipyMode(request, monkeypatch):
+    """ Run a test with SciPy, when it is installed, and again with SciPy hidden so the NumPy fallbacks are used """
+
+    if request.param == "scipy":
+        pytest.importorskip("scipy")
+    else:
+        for name in ("scipy", "scipy.ndimage", "scipy.spatial"):
+            monkeypatch.setitem(sys.modules, name, None)
+
+    return request.param
@@ -0,0 +1,150 @@
+""" Tests of the matrix metric calculations in ATtILA2.utils.calculate against the per reporting unit helpers
+
+    The calculate module imports arcpy, so these tests only run where ArcGIS Pro is installed. The output tables are
+    written to CSV files with tablewriter.FileTableWriter.
+"""
+import csv
+import os
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("arcpy")
+
+from ATtILA2.constants import globalConstants
+from ATtILA2.constants import metricConstants
+from ATtILA2.utils import calculate
+from ATtILA2.utils import lcc
+from ATtILA2.utils import tabarea
+
+_lccFolder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          "LandCoverClassifications")
+
+
+def readCsvColumns(csvPath):
+    """ Return a dictionary of field name to the list of the field's values, read as floats """
+
+    with open(csvPath, newline="") as csvFile:
+        rows = list(csv.reader(csvFile))
+
+    return dict((fieldName, [float(row[i]) for row in rows[1:]]) for i, fieldName in enumerate(rows[0]))
+
+
+def getTabAreaDict(tabAreaValues, areaRow):
+    """ Return the per reporting unit dictionary of grid value to area used by the row by row calculations """
+
+    return dict((aValue, anArea) for aValue, anArea in zip(tabAreaValues, areaRow.tolist()) if anArea > 0)
+
+
+@pytest.fixture
+def lccObj():
+    return lcc.LandCoverClassification(os.path.join(_lccFolder, "NLCD LAND.xml"))
+
+
+@pytest.fixture
+def tabAreaInputs(rng, lccObj):
+    # 99 is not defined in the LCC file; the last zone has only excluded values
+    tabAreaValues = sorted(lccObj.values.keys()) + [99]
+    areaMatrix = rng.integers(0, 40, size=(9, len(tabAreaValues))).astype(np.float64) * 900
+    areaMatrix[:, rng.random(len(tabAreaValues)) < 0.3] = 0
+    areaMatrix[-1] = 0
+    areaMatrix[-1, tabAreaValues.index(11)] = 2700
+    zoneIdValues = [101, 102, 103, 104, 105, 106, 107, 108, 109]
+    return zoneIdValues, tabAreaValues, areaMatrix
+
+
+def testGetLandCoverProportionArrays(lccObj, tabAreaInputs):
+    _zoneIdValues, tabAreaValues, areaMatrix = tabAreaInputs
+    excludedValues = lccObj.values.getExcludedValueIds()
+    metricsBaseNameList = ["for", "dev", "agr", "wtl"]
+
+    classPercents, classAreas, effectiveAreas, excludedAreas = calculate.getLandCoverProportionArrays(
+        lccObj.classes, metricsBaseNameList, tabAreaValues, areaMatrix, excludedValues)
+
+    for i, areaRow in enumerate(areaMatrix):
+        tabAreaDict = getTabAreaDict(tabAreaValues, areaRow)
+        effectiveArea = sum(anArea for aValue, anArea in tabAreaDict.items() if aValue not in excludedValues)
+        assert effectiveAreas[i] == effectiveArea
+        assert excludedAreas[i] == sum(tabAreaDict.values()) - effectiveArea
+        for j, mBaseName in enumerate(metricsBaseNameList):
+            expected = calculate.getMetricPercentAreaAndSum(lccObj.classes[mBaseName].uniqueValueIds, tabAreaDict,
+                                                            effectiveArea, excludedValues)
+            assert classPercents[i, j] == pytest.approx(expected[0])
+            assert classAreas[i, j] == pytest.approx(expected[1])
+
+
+def testLandCoverProportionsByMatrix(tmp_path, lccObj, tabAreaInputs):
+    zoneIdValues, tabAreaValues, areaMatrix = tabAreaInputs
+    tabAreaTable = tabarea.MatrixTabulateAreaTable(zoneIdValues, tabAreaValues, areaMatrix, lccObj)
+    excludedValues = lccObj.values.getExcludedValueIds()
+    metricConst = metricConstants.lcpConstants()
+    metricsBaseNameList = ["for", "dev", "agr"]
+    metricsFieldnameDict = dict((mBaseName, ("p" + mBaseName, mBaseName)) for mBaseName in metricsBaseNameList)
+    zoneAreaDict = dict((zoneId, 250000.0) for zoneId in zoneIdValues)
+    # zone 102 has less than one person and zone 103 does not overlap the population data
+    zoneValueDict = dict((zoneId, 40.0) for zoneId in zoneIdValues)
+    zoneValueDict[102] = 0.5
+    del zoneValueDict[103]
+
+    csvPath = str(tmp_path / "lcp.csv")
+    calculate.landCoverProportionsByMatrix(lccObj.classes, metricsBaseNameList,
+                                           [globalConstants.metricAddName, globalConstants.qaCheckName], metricConst,
+                                           types.SimpleNamespace(name="ZONEID"), csvPath, tabAreaTable,
+                                           metricsFieldnameDict, zoneAreaDict, None, zoneValueDict, 2.0)
+    columns = readCsvColumns(csvPath)
+    assert columns["ZONEID"] == zoneIdValues
+
+    qaFieldNames = [aFldParams[0] for aFldParams in metricConst.qaCheckFieldParameters]
+    areaSuffix = globalConstants.areaFieldParameters[0]
+    for i, zoneId in enumerate(zoneIdValues):
+        tabAreaDict = getTabAreaDict(tabAreaValues, areaMatrix[i])
+        totalArea = sum(tabAreaDict.values())
+        effectiveArea = sum(anArea for aValue, anArea in tabAreaDict.items() if aValue not in excludedValues)
+        for mBaseName in metricsBaseNameList:
+            metricPercent, metricArea = calculate.getMetricPercentAreaAndSum(lccObj.classes[mBaseName].uniqueValueIds,
+                                                                             tabAreaDict, effectiveArea,
+                                                                             excludedValues)
+            assert columns["p" + mBaseName][i] == pytest.approx(metricPercent)
+            assert columns["p" + mBaseName + areaSuffix][i] == pytest.approx(metricArea)
+
+            classSqM = metricArea * 2.0
+            if zoneId not in zoneValueDict:
+                perValueCalc = -55555
+            elif zoneValueDict[zoneId] >= 1:
+                perValueCalc = classSqM / zoneValueDict[zoneId]
+            else:
+                perValueCalc = -99999
+            assert columns[mBaseName + metricConst.perCapitaSuffix][i] == pytest.approx(perValueCalc)
+            assert columns[mBaseName + metricConst.meterSquaredSuffix][i] == pytest.approx(classSqM)
+
+        assert columns[qaFieldNames[0]][i] == pytest.approx(totalArea / zoneAreaDict[zoneId] * 100)
+        assert columns[qaFieldNames[1]][i] == pytest.approx(totalArea)
+        assert columns[qaFieldNames[2]][i] == pytest.approx(effectiveArea)
+        assert columns[qaFieldNames[3]][i] == pytest.approx(totalArea - effectiveArea)
+
+
+def testLandCoverCoefficientCalculator(tmp_path, lccObj, tabAreaInputs):
+    zoneIdValues, tabAreaValues, areaMatrix = tabAreaInputs
+    tabAreaTable = tabarea.MatrixTabulateAreaTable(zoneIdValues, tabAreaValues, areaMatrix, lccObj)
+    metricConst = metricConstants.lcccConstants()
+    metricsBaseNameList = ["NITROGEN", "PHOSPHORUS", "IMPERVIOUS"]
+    metricsFieldnameDict = dict((mBaseName, (mBaseName, mBaseName)) for mBaseName in metricsBaseNameList)
+    zoneAreaDict = dict((zoneId, 250000.0) for zoneId in zoneIdValues)
+
+    csvPath = str(tmp_path / "lccc.csv")
+    calculate.landCoverCoefficientCalculator(lccObj, metricsBaseNameList, [globalConstants.qaCheckName], metricConst,
+                                             types.SimpleNamespace(name="ZONEID"), csvPath, tabAreaTable,
+                                             metricsFieldnameDict, zoneAreaDict, 0.5)
+    columns = readCsvColumns(csvPath)
+    assert columns["ZONEID"] == zoneIdValues
+
+    for i, zoneId in enumerate(zoneIdValues):
+        tabAreaDict = getTabAreaDict(tabAreaValues, areaMatrix[i])
+        for coeffId in ("NITROGEN", "PHOSPHORUS"):
+            expected = calculate.getCoefficientPerUnitArea(tabAreaDict, lccObj.values, coeffId, 0.5)
+            assert columns[coeffId][i] == pytest.approx(expected)
+        expected = calculate.getCoefficientPercentage(tabAreaDict, lccObj.values, "IMPERVIOUS")
+        assert columns["IMPERVIOUS"][i] == pytest.approx(expected)
+        overlapFieldName = metricConst.qaCheckFieldParameters[0][0]
+        assert columns[overlapFieldName][i] == pytest.approx(sum(tabAreaDict.values()) / zoneAreaDict[zoneId] * 100)
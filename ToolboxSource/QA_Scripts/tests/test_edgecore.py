@@ -0,0 +1,100 @@
+""" Tests of ATtILA2.utils.edgecore against cell by cell distance checks """
+import numpy as np
+import pytest
+
+from ATtILA2.utils import edgecore
+
+
+def bruteForceDistances(sourceMask):
+    """ Distance, in cells, from every cell center to the nearest source cell center """
+
+    sourceRows, sourceCols = np.nonzero(sourceMask)
+    rows, cols = np.indices(sourceMask.shape)
+    if sourceRows.size == 0:
+        return np.full(sourceMask.shape, np.inf)
+    return np.sqrt(((rows[..., None] - sourceRows) ** 2 + (cols[..., None] - sourceCols) ** 2).min(axis=-1))
+
+
+def bruteForceCategories(landCoverArray, classValues, excludedValues, edgeWidth, noDataMask):
+    """ Classify every cell as excluded, other, edge or core with a whole grid distance check """
+
+    classMask = np.isin(landCoverArray, list(classValues)) & ~noDataMask
+    excludedMask = np.isin(landCoverArray, list(excludedValues)) & ~classMask & ~noDataMask
+    otherMask = ~classMask & ~excludedMask & ~noDataMask
+    distances = bruteForceDistances(excludedMask | otherMask)
+
+    categoryArray = np.full(landCoverArray.shape, edgecore.noDataCode, dtype=np.uint8)
+    categoryArray[excludedMask] = edgecore.excludedCode
+    categoryArray[otherMask] = edgecore.otherCode
+    categoryArray[classMask] = np.where(distances[classMask] >= edgeWidth + 0.5, edgecore.coreCode, edgecore.edgeCode)
+
+    return categoryArray
+
+
+@pytest.fixture
+def landCover(rng):
+    landCoverArray = rng.choice([0, 11, 21, 41, 42], size=(33, 27), p=[0.02, 0.03, 0.1, 0.6, 0.25])
+    # a block of forest large enough to have core at every width tested
+    landCoverArray[8:26, 5:22] = 41
+    return landCoverArray, landCoverArray == 0
+
+
+@pytest.mark.parametrize("maxDistance", [1.5, 2.5, 4.5])
+@pytest.mark.parametrize("blockSize", [5, 11, 4096])
+def testGetDistanceToOther(rng, scipyMode, maxDistance, blockSize):
+    sourceMask = rng.random((29, 24)) < 0.03
+    distances = edgecore.getDistanceToOther(sourceMask, maxDistance, blockSize)
+
+    expected = bruteForceDistances(sourceMask)
+    expected[expected > maxDistance] = np.inf
+    np.testing.assert_allclose(distances, expected, rtol=1e-6)
+
+
+def testGetDistanceToOtherWithoutSources(scipyMode):
+    distances = edgecore.getDistanceToOther(np.zeros((6, 7), dtype=bool), 3.5, 4)
+    assert np.isinf(distances).all()
+
+
+def testGetCategoryArray(landCover):
+    landCoverArray, noDataMask = landCover
+    categoryArray = edgecore.getCategoryArray(landCoverArray, [41, 42], [11], noDataMask)
+
+    expected = np.full(landCoverArray.shape, edgecore.otherCode, dtype=np.uint8)
+    expected[np.isin(landCoverArray, [41, 42])] = edgecore.edgeCode
+    expected[landCoverArray == 11] = edgecore.excludedCode
+    expected[noDataMask] = edgecore.noDataCode
+    np.testing.assert_array_equal(categoryArray, expected)
+
+
+@pytest.mark.parametrize("edgeWidth", [1, 2, 3])
+def testCreateCoreEdgeArray(landCover, scipyMode, edgeWidth):
+    landCoverArray, noDataMask = landCover
+    categoryArray = edgecore.createCoreEdgeArray(landCoverArray, [41, 42], [11], edgeWidth, noDataMask, blockSize=7)
+
+    expected = bruteForceCategories(landCoverArray, [41, 42], [11], edgeWidth, noDataMask)
+    np.testing.assert_array_equal(categoryArray, expected)
+    assert (categoryArray == edgecore.coreCode).any()
+
+
+def testCreateCoreEdgeArrayWithSeveralWidths(landCover):
+    landCoverArray, noDataMask = landCover
+    edgeWidths = [3, 1, 2]
+    categoryArray = edgecore.createCoreEdgeArray(landCoverArray, [41, 42], [11], edgeWidths, noDataMask, blockSize=7)
+
+    # tabulate the codes of the whole grid as a single zone
+    gridValues, cellCounts = np.unique(categoryArray[categoryArray != edgecore.noDataCode], return_counts=True)
+    categoryNames, widthMatrices = edgecore.getWidthAreaMatrices(gridValues, cellCounts[np.newaxis, :].astype(float),
+                                                                 edgeWidths)
+    assert categoryNames == ["EXCLUDED", "OTHER", "EDGE", "CORE"]
+
+    for edgeWidth, widthMatrix in zip(edgeWidths, widthMatrices):
+        expected = bruteForceCategories(landCoverArray, [41, 42], [11], edgeWidth, noDataMask)
+        expectedCounts = [np.count_nonzero(expected == aCode) for aCode in edgecore.categoryNames]
+        np.testing.assert_array_equal(widthMatrix, [expectedCounts])
+
+
+def testGetCategoryLabels():
+    assert edgecore.getCategoryLabels(2) == {1: "Excluded", 2: "Other", 3: "Edge", 4: "Core"}
+    assert edgecore.getCategoryLabels(["3", 1, 1.5]) == {1: "Excluded", 2: "Other", 3: "Edge", 4: "Core1",
+                                                         5: "Core1.5", 6: "Core"}
+    assert edgecore.getSortedWidths(["2", 1, 2.0]) == [1.0, 2.0]
@@ -0,0 +1,153 @@
+""" Tests of ATtILA2.utils.focal against window by window sums """
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import focal
+from ATtILA2.utils import reclass
+
+
+def bruteForceFocalSum(array, offsets, noDataMask=None, anyNoData=True):
+    """ Sum array over the (rowOffset, colOffset) offsets around every cell, ignoring cells outside the grid
+
+        With anyNoData, a cell is NoData when any cell of its window is NoData; otherwise only when every cell of its
+        window is NoData or outside the grid. NoData cells are left out of the sums.
+    """
+    nRows, nCols = array.shape
+    sumArray = np.zeros((nRows, nCols), dtype=np.int64)
+    outNoData = np.zeros((nRows, nCols), dtype=bool)
+    for row in range(nRows):
+        for col in range(nCols):
+            windowCells = [(row + rowOffset, col + colOffset) for rowOffset, colOffset in offsets
+                           if 0 <= row + rowOffset < nRows and 0 <= col + colOffset < nCols]
+            if noDataMask is not None:
+                dataCells = [cell for cell in windowCells if not noDataMask[cell]]
+                outNoData[row, col] = len(dataCells) < len(windowCells) if anyNoData else not dataCells
+                windowCells = dataCells
+            sumArray[row, col] = sum(int(array[cell]) for cell in windowCells)
+
+    return sumArray, outNoData
+
+
+def getRectangleWindowOffsets(width, height):
+    top, bottom = focal.getRectangleOffsets(height)
+    left, right = focal.getRectangleOffsets(width)
+    return [(rowOffset, colOffset) for rowOffset in range(-top, bottom + 1) for colOffset in range(-left, right + 1)]
+
+
+def getCircleWindowOffsets(radius):
+    return [(rowOffset, colOffset) for rowOffset in range(-radius, radius + 1) for colOffset in range(-radius, radius + 1)
+            if rowOffset * rowOffset + colOffset * colOffset <= radius * radius]
+
+
+def collectStrips(stripIterator, nRows, nCols, numPlanes=None):
+    """ Assemble the strips of a focal iterator into whole grid sum and NoData arrays """
+
+    shape = (nRows, nCols) if numPlanes is None else (numPlanes, nRows, nCols)
+    sumArray = np.zeros(shape, dtype=np.int64)
+    noDataMask = np.zeros((nRows, nCols), dtype=bool)
+    for rowOffset, stripSums, stripNoData in stripIterator:
+        stripCount = stripSums.shape[-2]
+        sumArray[..., rowOffset:rowOffset + stripCount, :] = stripSums
+        if stripNoData is not None:
+            noDataMask[rowOffset:rowOffset + stripCount] = stripNoData
+
+    return sumArray, noDataMask
+
+
+@pytest.mark.parametrize("width, height", [(1, 1), (3, 3), (4, 4), (5, 2), (9, 9)])
+@pytest.mark.parametrize("stripRows", [1, 4, 100])
+def testIterFocalRectangleSums(rng, width, height, stripRows):
+    valueArray = (rng.random((17, 13)) < 0.4).astype(np.uint8)
+    noDataMask = rng.random(valueArray.shape) < 0.03
+
+    def readRows(rowOffset, rowCount):
+        return valueArray[rowOffset:rowOffset + rowCount], noDataMask[rowOffset:rowOffset + rowCount]
+
+    sumArray, outNoData = collectStrips(focal.iterFocalRectangleSums(readRows, 17, 13, width, height, stripRows),
+                                        17, 13)
+    expectedSums, expectedNoData = bruteForceFocalSum(valueArray, getRectangleWindowOffsets(width, height), noDataMask)
+    np.testing.assert_array_equal(outNoData, expectedNoData)
+    np.testing.assert_array_equal(sumArray[~expectedNoData], expectedSums[~expectedNoData])
+
+
+def testIterFocalRectangleSumsOfClassPlanes(rng):
+    landCoverArray = rng.choice(np.array([11, 21, 41, 42, 90], dtype=np.uint8), size=(19, 16))
+    classValueLists = [[41, 42], [21], [42, 90]]
+    classBitsTable = reclass.getClassBitsLookupTable(classValueLists)
+
+    def readRows(rowOffset, rowCount):
+        classBits = classBitsTable.apply(landCoverArray[rowOffset:rowOffset + rowCount])
+        return focal.getClassPlanes(classBits, len(classValueLists)), None
+
+    sumArrays, _noDataMask = collectStrips(focal.iterFocalRectangleSums(readRows, 19, 16, 5, 5, 6), 19, 16,
+                                           len(classValueLists))
+    for k, classValues in enumerate(classValueLists):
+        classArray = np.isin(landCoverArray, classValues).astype(np.uint8)
+        expectedSums, _expectedNoData = bruteForceFocalSum(classArray, getRectangleWindowOffsets(5, 5))
+        np.testing.assert_array_equal(sumArrays[k], expectedSums)
+
+
+@pytest.mark.parametrize("radius", [1, 2, 3, 7, 17, 25])
+def testCircleSumMethods(rng, radius):
+    planes = (rng.random((2, 23, 31)) < 0.3).astype(np.uint8)
+    paddedPlanes = np.pad(planes, ((0, 0), (radius, radius), (radius, radius)))
+    offsets = getCircleWindowOffsets(radius)
+
+    for sumMethod in (focal._circleSumDirect, focal._circleSumByRowRuns, focal._circleSumByFFT, None):
+        if sumMethod is None:
+            sumArrays = focal.circleSum(paddedPlanes, radius)
+        else:
+            sumArrays = sumMethod(paddedPlanes, radius, np.int32)
+        for plane, sumArray in zip(planes, sumArrays):
+            np.testing.assert_array_equal(sumArray, bruteForceFocalSum(plane, offsets)[0])
+
+
+def testGetCircleSumMethod():
+    assert focal.getCircleSumMethod(focal.directMaxRadius) == "DIRECT"
+    assert focal.getCircleSumMethod(focal.directMaxRadius + 1) == "ROWRUNS"
+    assert focal.getCircleSumMethod(focal.rowRunMaxRadius) == "ROWRUNS"
+    assert focal.getCircleSumMethod(focal.rowRunMaxRadius + 1) == "FFT"
+
+
+@pytest.mark.parametrize("radius", [2, 5, 18])
+def testIterFocalCircleSums(rng, radius):
+    landCoverArray = (rng.random((21, 18)) < 0.35).astype(np.uint8)
+    noDataMask = rng.random(landCoverArray.shape) < 0.1
+    noDataMask[:9, :9] = True
+    valueArray = np.where(noDataMask, 0, landCoverArray)
+
+    def readRows(rowOffset, rowCount):
+        return valueArray[rowOffset:rowOffset + rowCount], noDataMask[rowOffset:rowOffset + rowCount]
+
+    sumArray, outNoData = collectStrips(focal.iterFocalCircleSums(readRows, 21, 18, radius, 5), 21, 18)
+    expectedSums, expectedNoData = bruteForceFocalSum(valueArray, getCircleWindowOffsets(radius), noDataMask,
+                                                      anyNoData=False)
+    np.testing.assert_array_equal(outNoData, expectedNoData)
+    np.testing.assert_array_equal(sumArray, expectedSums)
+
+
+@pytest.mark.parametrize("pctStep", [5, 10, 25, 30])
+def testGetPercentZones(pctStep):
+    cellCount = 49
+    sumArray = np.arange(cellCount + 1)
+    zoneArray = focal.getPercentZones(sumArray, cellCount, pctStep)
+
+    upperEdges = list(range(pctStep, 100, pctStep))
+    for count, zoneCode in zip(sumArray.tolist(), zoneArray.tolist()):
+        percent = Fraction(count * 100, cellCount)
+        expected = next((upperEdge for upperEdge in upperEdges if percent <= upperEdge), 100)
+        assert zoneCode == expected, (count, zoneCode, expected)
+
+
+def testGetClassPlanes():
+    classBits = np.array([[0, 1, 2], [3, 4, 7]], dtype=np.uint8)
+    planes = focal.getClassPlanes(classBits, 3)
+    np.testing.assert_array_equal(planes, [(classBits >> k) & 1 for k in range(3)])
+
+
+def testGetStripRows():
+    assert focal.getStripRows(100, 1000) == 10
+    assert focal.getStripRows(100, 1000, 4) == 6
+    assert focal.getStripRows(100, 50, 4) == 1
@@ -0,0 +1,46 @@
+""" Tests of ATtILA2.utils.kernels against cell by cell footprints """
+import numpy as np
+import pytest
+
+from ATtILA2.utils import kernels
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3, 10, 33])
+def testGetCircleFootprint(radius):
+    footprint = kernels.getCircleFootprint(radius)
+    assert footprint.shape == (2 * radius + 1, 2 * radius + 1)
+    for row in range(2 * radius + 1):
+        for col in range(2 * radius + 1):
+            assert footprint[row, col] == ((row - radius) ** 2 + (col - radius) ** 2 <= radius * radius)
+
+
+@pytest.mark.parametrize("radius, cellCount", [(1, 5), (2, 13), (3, 29), (10, 317), (33, 3409), (100, 31417)])
+def testGetCircleCellCount(radius, cellCount):
+    assert kernels.getCircleCellCount(radius) == cellCount
+    assert kernels.getCircleFootprint(radius).sum() == cellCount
+
+
+@pytest.mark.parametrize("radius", [1, 4, 15])
+def testGetCircleRuns(radius):
+    footprint = kernels.getCircleFootprint(radius)
+    runs = kernels.getCircleRuns(radius)
+    assert [rowOffset for rowOffset, _halfWidth in runs] == list(range(-radius, radius + 1))
+    for rowOffset, halfWidth in runs:
+        expected = np.zeros(2 * radius + 1, dtype=bool)
+        expected[radius - halfWidth:radius + halfWidth + 1] = True
+        np.testing.assert_array_equal(footprint[rowOffset + radius], expected)
+
+
+def testRectangle():
+    footprint = kernels.getRectangleFootprint(4, 3)
+    assert footprint.shape == (3, 4) and footprint.all()
+    assert kernels.getRectangleCellCount(4, 3) == 12
+
+
+def testFootprintsAreReadOnly():
+    # the footprints are cached and shared between callers
+    assert kernels.getCircleFootprint(5) is kernels.getCircleFootprint(5)
+    with pytest.raises(ValueError):
+        kernels.getCircleFootprint(5)[0, 0] = True
+    with pytest.raises(ValueError):
+        kernels.getRectangleFootprint(3, 3)[0, 0] = False
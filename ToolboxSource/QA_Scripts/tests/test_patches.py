@@ -0,0 +1,216 @@
+""" Tests of ATtILA2.utils.patches against cell by cell flood fills and distance checks """
+import math
+from collections import deque
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import patches
+
+
+def bruteForceLabels(classMask):
+    """ Flood fill the 8-connected patches of a mask, numbering them from 1 in scan order of their first cell """
+
+    nRows, nCols = classMask.shape
+    labelArray = np.zeros((nRows, nCols), dtype=np.int32)
+    numPatches = 0
+    for row in range(nRows):
+        for col in range(nCols):
+            if not classMask[row, col] or labelArray[row, col]:
+                continue
+            numPatches += 1
+            labelArray[row, col] = numPatches
+            queue = deque([(row, col)])
+            while queue:
+                r, c = queue.popleft()
+                for nextRow in range(max(r - 1, 0), min(r + 2, nRows)):
+                    for nextCol in range(max(c - 1, 0), min(c + 2, nCols)):
+                        if classMask[nextRow, nextCol] and not labelArray[nextRow, nextCol]:
+                            labelArray[nextRow, nextCol] = numPatches
+                            queue.append((nextRow, nextCol))
+
+    return labelArray, numPatches
+
+
+def bruteForceGrownMask(classMask, maxSeparation):
+    """ Mark the cells whose center is within maxSeparation cells of a class cell center """
+
+    classRows, classCols = np.nonzero(classMask)
+    rows, cols = np.indices(classMask.shape)
+    if classRows.size == 0:
+        return np.zeros(classMask.shape, dtype=bool)
+    squaredDistances = ((rows[..., None] - classRows) ** 2 + (cols[..., None] - classCols) ** 2).min(axis=-1)
+    return squaredDistances <= maxSeparation * maxSeparation
+
+
+def getCellGap(cell1, cell2):
+    """ Edge to edge distance, in cells, between two square cells """
+
+    rowGap = max(abs(cell1[0] - cell2[0]) - 1, 0)
+    colGap = max(abs(cell1[1] - cell2[1]) - 1, 0)
+    return math.sqrt(rowGap * rowGap + colGap * colGap)
+
+
+def randomMask(rng, shape, density):
+    return rng.random(shape) < density
+
+
+@pytest.mark.parametrize("density", [0.0, 0.2, 0.45, 0.7, 1.0])
+def testLabelRuns(rng, density):
+    classMask = randomMask(rng, (31, 27), density)
+    labelArray, numPatches = patches.labelRuns(classMask)
+    expected = bruteForceLabels(classMask)
+    np.testing.assert_array_equal(labelArray, expected[0])
+    assert numPatches == expected[1]
+
+
+def testLabelPatches(rng, scipyMode):
+    for density in (0.3, 0.5, 0.65):
+        classMask = randomMask(rng, (34, 23), density)
+        labelArray, numPatches = patches.labelPatches(classMask)
+        expected = bruteForceLabels(classMask)
+        np.testing.assert_array_equal(labelArray, expected[0])
+        assert numPatches == expected[1]
+
+
+@pytest.mark.parametrize("blockSize", [1, 3, 8, 4096])
+def testLabelPatchesByTile(rng, scipyMode, blockSize):
+    for density in (0.3, 0.5, 0.65):
+        classMask = randomMask(rng, (34, 23), density)
+        labelArray, numPatches = patches.labelPatchesByTile(classMask, blockSize)
+        expected = bruteForceLabels(classMask)
+        np.testing.assert_array_equal(labelArray, expected[0])
+        assert numPatches == expected[1]
+
+
+def testLabelPatchesByTileSerpentine(scipyMode):
+    # one patch winding back and forth through every tile, so most seams join labels already joined through others
+    classMask = np.zeros((21, 21), dtype=bool)
+    classMask[::2] = True
+    for row in range(1, 21, 2):
+        classMask[row, -1 if row % 4 == 1 else 0] = True
+    labelArray, numPatches = patches.labelPatchesByTile(classMask, 4)
+    np.testing.assert_array_equal(labelArray, classMask.astype(np.int32))
+    assert numPatches == 1
+
+
+@pytest.mark.parametrize("maxSeparation", [1, 2, 3, 5])
+@pytest.mark.parametrize("blockSize", [4, 9, 4096])
+def testGrowClassMask(rng, scipyMode, maxSeparation, blockSize):
+    classMask = randomMask(rng, (26, 19), 0.04)
+    grownMask = patches.growClassMask(classMask, maxSeparation, blockSize)
+    np.testing.assert_array_equal(grownMask, bruteForceGrownMask(classMask, maxSeparation))
+
+
+def testDilateWithDiskBeyondMaskHeight():
+    # a disk taller than the mask must not shift rows off the mask
+    classMask = np.zeros((2, 12), dtype=bool)
+    classMask[0, 5] = True
+    grownMask = patches._dilateWithDisk(classMask, 4)
+    np.testing.assert_array_equal(grownMask, bruteForceGrownMask(classMask, 4))
+
+
+@pytest.mark.parametrize("maxSeparation", [0, 1, 2, 4])
+def testLabelPatchesWithinSeparation(rng, scipyMode, maxSeparation):
+    classMask = randomMask(rng, (30, 25), 0.08)
+    labelArray, numPatches = patches.labelPatchesWithinSeparation(classMask, maxSeparation, blockSize=8)
+
+    expectedLabels, expectedCount = bruteForceLabels(bruteForceGrownMask(classMask, maxSeparation) if maxSeparation
+                                                     else classMask)
+    expectedLabels[~classMask] = 0
+    np.testing.assert_array_equal(labelArray, expectedLabels)
+    assert numPatches == expectedCount
+
+
+def testReclassifyInOutOther():
+    landCoverArray = np.array([[11, 21, 22], [90, 11, 0]], dtype=np.int16)
+    noDataMask = landCoverArray == 0
+    reclassArray = patches.reclassifyInOutOther(landCoverArray, [21, 22], [11], [1, -9999, 0], noDataMask)
+    np.testing.assert_array_equal(reclassArray, [[-9999, 1, 1], [0, -9999, patches.patchNoData]])
+    assert reclassArray.dtype == np.int32
+
+
+@pytest.mark.parametrize("minPatchSize, maxSeparation", [(1, 0), (3, 0), (4, 2)])
+def testCreatePatchArray(rng, minPatchSize, maxSeparation):
+    landCoverArray = rng.choice([0, 11, 21, 41], size=(28, 22), p=[0.05, 0.1, 0.55, 0.3])
+    noDataMask = landCoverArray == 0
+    reclassArray = patches.reclassifyInOutOther(landCoverArray, [41], [11], [1, -9999, 0], noDataMask)
+    patchArray = patches.createPatchArray(reclassArray, 1, 0, -9999, minPatchSize, maxSeparation, blockSize=8)
+
+    classMask = landCoverArray == 41
+    if maxSeparation:
+        expected, _numPatches = bruteForceLabels(bruteForceGrownMask(classMask, maxSeparation))
+        expected[~classMask] = 0
+    else:
+        expected, _numPatches = bruteForceLabels(classMask)
+    for label in np.unique(expected[expected > 0]).tolist():
+        if (expected == label).sum() < minPatchSize:
+            expected[expected == label] = 0
+    expected[landCoverArray == 11] = -9999
+    expected[noDataMask] = patches.patchNoData
+    np.testing.assert_array_equal(patchArray, expected)
+
+
+def testGetZonePatchStatistics(rng):
+    numZones = 5
+    zoneIndexes = rng.integers(0, numZones - 1, size=80)
+    gridValues = rng.choice([0, -9999, 1, 2, 3, 4, 5, 6, 7], size=80)
+    areas = rng.integers(1, 20, size=80).astype(np.float64)
+    statistics = patches.getZonePatchStatistics(zoneIndexes, gridValues, areas, numZones, 0, -9999)
+
+    for zone in range(numZones):
+        patchAreas = {}
+        otherArea = excludedArea = 0.0
+        for zoneIndex, gridValue, area in zip(zoneIndexes.tolist(), gridValues.tolist(), areas.tolist()):
+            if zoneIndex != zone:
+                continue
+            if gridValue == 0:
+                otherArea += area
+            elif gridValue == -9999:
+                excludedArea += area
+            else:
+                patchAreas[gridValue] = patchAreas.get(gridValue, 0.0) + area
+        areaList = sorted(patchAreas.values())
+        assert statistics["numPatch"][zone] == len(areaList)
+        assert statistics["otherArea"][zone] == pytest.approx(otherArea)
+        assert statistics["excludedArea"][zone] == pytest.approx(excludedArea)
+        if areaList:
+            assert statistics["patchArea"][zone] == pytest.approx(sum(areaList))
+            assert statistics["lrgPatch"][zone] == pytest.approx(areaList[-1])
+            assert statistics["mdnPatch"][zone] == pytest.approx(float(np.median(areaList)))
+            assert statistics["avePatch"][zone] == pytest.approx(sum(areaList) / len(areaList))
+            assert statistics["lrgProportion"][zone] == pytest.approx(areaList[-1] / sum(areaList) * 100)
+        else:
+            for key in ("patchArea", "lrgPatch", "mdnPatch", "avePatch", "lrgProportion"):
+                assert statistics[key][zone] == 0
+
+
+def testGetNearestPatchDistances(rng, scipyMode):
+    zoneArray = np.repeat(np.arange(4, dtype=np.int32), 10)[:, None].repeat(33, axis=1)
+    zoneArray[:, :3] = -1
+    patchArray, _numPatches = patches.labelPatches(randomMask(rng, zoneArray.shape, 0.25))
+    # a zone with a single patch
+    patchArray[30:40] = 0
+    patchArray[35, 10] = 999
+
+    distances = patches.getNearestPatchDistances(zoneArray, patchArray, 30.0, -1)
+
+    expected = {}
+    for zoneCode in range(4):
+        inZone = (zoneArray == zoneCode) & (patchArray > 0)
+        cellsByPatch = {}
+        for row, col in zip(*np.nonzero(inZone)):
+            cellsByPatch.setdefault(patchArray[row, col], []).append((row, col))
+        if len(cellsByPatch) == 1:
+            expected[zoneCode] = (0, 1, 0.0)
+        elif cellsByPatch:
+            gaps = [min(getCellGap(cell, otherCell) for cell in cells
+                        for otherLabel, otherCells in cellsByPatch.items() if otherLabel != label
+                        for otherCell in otherCells)
+                    for label, cells in cellsByPatch.items()]
+            expected[zoneCode] = (len(gaps), 0, sum(gaps) / len(gaps) * 30.0)
+
+    assert sorted(distances) == sorted(expected)
+    for zoneCode, (numWith, numWithout, meanDistance) in expected.items():
+        assert distances[zoneCode][:2] == (numWith, numWithout)
+        assert distances[zoneCode][2] == pytest.approx(meanDistance)
@@ -0,0 +1,211 @@
+""" Tests of ATtILA2.utils.rasterwriter, read back with a small TIFF parser """
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import rasterwriter
+
+_valueFormats = {2: "s", 3: "H", 4: "I", 12: "d", 16: "Q"}
+_valueSizes = {2: 1, 3: 2, 4: 4, 12: 8, 16: 8}
+_sampleTypes = {(1, 8): np.uint8, (1, 16): np.uint16, (2, 16): np.int16, (2, 32): np.int32, (3, 32): np.float32,
+                (3, 64): np.float64}
+
+
+def readTiff(path):
+    """ Return the header magic number and the list of (tags, array) of every image file directory in a tiled TIFF """
+
+    with open(path, "rb") as tiffFile:
+        data = tiffFile.read()
+
+    assert data[:2] == b"II"
+    magic = struct.unpack_from("<H", data, 2)[0]
+    if magic == 43:
+        countFormat, entryFormat, offsetFormat, inlineSize = "<Q", "<HHQ", "<Q", 8
+        ifdOffset = struct.unpack_from("<Q", data, 8)[0]
+    else:
+        countFormat, entryFormat, offsetFormat, inlineSize = "<H", "<HHI", "<I", 4
+        ifdOffset = struct.unpack_from("<I", data, 4)[0]
+
+    directories = []
+    while ifdOffset:
+        entryCount = struct.unpack_from(countFormat, data, ifdOffset)[0]
+        position = ifdOffset + struct.calcsize(countFormat)
+        tags = {}
+        for _entry in range(entryCount):
+            tag, fieldType, count = struct.unpack_from(entryFormat, data, position)
+            position += struct.calcsize(entryFormat)
+            size = count * _valueSizes[fieldType]
+            if size > inlineSize:
+                valueOffset = struct.unpack_from(offsetFormat, data, position)[0]
+            else:
+                valueOffset = position
+            position += inlineSize
+            if fieldType == 2:
+                tags[tag] = data[valueOffset:valueOffset + count].rstrip(b"\0").decode("ascii")
+            else:
+                tags[tag] = list(struct.unpack_from(f"<{count}{_valueFormats[fieldType]}", data, valueOffset))
+        ifdOffset = struct.unpack_from(offsetFormat, data, position)[0]
+        directories.append((tags, readTiles(data, tags)))
+
+    return magic, directories
+
+
+def readTiles(data, tags):
+    """ Decompress and assemble the tiles of one image file directory """
+
+    nCols, nRows = tags[256][0], tags[257][0]
+    tileWidth, tileLength = tags[322][0], tags[323][0]
+    dtype = np.dtype(_sampleTypes[(tags[339][0], tags[258][0])]).newbyteorder("<")
+    assert tags[259] == [8]
+    tilesAcross = (nCols + tileWidth - 1) // tileWidth
+    tilesDown = (nRows + tileLength - 1) // tileLength
+
+    array = np.zeros((tilesDown * tileLength, tilesAcross * tileWidth), dtype=dtype)
+    for i, (offset, byteCount) in enumerate(zip(tags[324], tags[325])):
+        tile = np.frombuffer(zlib.decompress(data[offset:offset + byteCount]), dtype=dtype)
+        tileRow, tileCol = divmod(i, tilesAcross)
+        array[tileRow * tileLength:(tileRow + 1) * tileLength,
+              tileCol * tileWidth:(tileCol + 1) * tileWidth] = tile.reshape(tileLength, tileWidth)
+
+    return array[:nRows, :nCols]
+
+
+def writeInBlocks(writer, grid, blockRows):
+    """ Write a grid with a writer in blocks of the given row counts, cycling through them """
+
+    rowOffset = 0
+    i = 0
+    while rowOffset < grid.shape[0]:
+        count = blockRows[i % len(blockRows)]
+        writer.writeRows(grid[rowOffset:rowOffset + count])
+        rowOffset += count
+        i += 1
+
+
+@pytest.mark.parametrize("blockRows", [[1], [3, 5], [16], [37]])
+def testRoundTrip(tmp_path, rng, blockRows):
+    grid = rng.integers(-500, 500, size=(37, 53)).astype(np.int16)
+    path = str(tmp_path / "grid.tif")
+    with rasterwriter.TiledRasterWriter(path, 37, 53, np.int16, 500000.0, 4200000.0, 30.0, 30.0, -9999,
+                                        tileSize=16, epsgCode=5070) as writer:
+        writeInBlocks(writer, grid, blockRows)
+
+    magic, directories = readTiff(path)
+    assert magic == 42
+    # overviews are added until one fits in a tile: 37 x 53, 19 x 27 and 10 x 14 cells
+    assert [array.shape for _tags, array in directories] == [(37, 53), (19, 27), (10, 14)]
+    for level, (tags, array) in enumerate(directories):
+        # each overview keeps the even rows and columns of the level above, whatever the block boundaries
+        np.testing.assert_array_equal(array, grid[::2 ** level, ::2 ** level])
+        assert tags[254] == [0 if level == 0 else 1]
+        assert tags[42113] == "-9999"
+
+    tags = directories[0][0]
+    assert tags[33550] == [30.0, 30.0, 0.0]
+    assert tags[33922] == [0.0, 0.0, 0.0, 500000.0, 4200000.0, 0.0]
+    geoKeys = tags[34735]
+    assert geoKeys[3] == (len(geoKeys) - 4) // 4
+    assert geoKeys[-4:] == [3072, 0, 1, 5070]
+
+
+def testPartialTilesArePadded(tmp_path, rng):
+    grid = rng.random((21, 18)).astype(np.float32)
+    path = str(tmp_path / "grid.tif")
+    with rasterwriter.TiledRasterWriter(path, 21, 18, np.float32, 0.0, 21.0, 1.0, 1.0, -1.0, tileSize=8,
+                                        overviewLevels=0) as writer:
+        writeInBlocks(writer, grid, [4, 7])
+
+    _magic, directories = readTiff(path)
+    assert len(directories) == 1
+    tags, array = directories[0]
+    np.testing.assert_array_equal(array, grid)
+    # the last tile row and column are padded with the NoData value
+    with open(path, "rb") as tiffFile:
+        data = tiffFile.read()
+    lastTile = np.frombuffer(zlib.decompress(data[tags[324][-1]:tags[324][-1] + tags[325][-1]]), dtype="<f4")
+    lastTile = lastTile.reshape(8, 8)
+    np.testing.assert_array_equal(lastTile[:5, :2], grid[16:, 16:])
+    assert (lastTile[5:] == -1.0).all() and (lastTile[:, 2:] == -1.0).all()
+
+
+def testBoolAndBigTiff(tmp_path, rng, monkeypatch):
+    monkeypatch.setattr(rasterwriter, "bigTiffThreshold", 0)
+    grid = rng.random((9, 12)) < 0.5
+    path = str(tmp_path / "grid.tif")
+    with rasterwriter.TiledRasterWriter(path, 9, 12, bool, 0.0, 9.0, 1.0, 1.0, tileSize=8) as writer:
+        writer.writeRows(grid)
+
+    magic, directories = readTiff(path)
+    assert magic == 43
+    assert len(directories) == 2
+    np.testing.assert_array_equal(directories[0][1], grid.astype(np.uint8))
+    np.testing.assert_array_equal(directories[1][1], grid[::2, ::2].astype(np.uint8))
+    assert 42113 not in directories[0][0]
+
+
+def testReadWithTifffile(tmp_path, rng):
+    tifffile = pytest.importorskip("tifffile")
+    grid = rng.integers(0, 2 ** 20, size=(40, 33)).astype(np.int32)
+    path = str(tmp_path / "grid.tif")
+    with rasterwriter.TiledRasterWriter(path, 40, 33, np.int32, 0.0, 40.0, 1.0, 1.0, 0, tileSize=16) as writer:
+        writeInBlocks(writer, grid, [7])
+
+    with tifffile.TiffFile(path) as tiff:
+        np.testing.assert_array_equal(tiff.pages[0].asarray(), grid)
+        np.testing.assert_array_equal(tiff.pages[1].asarray(), grid[::2, ::2])
+
+
+def testRejectsBadBlocks(tmp_path):
+    path = str(tmp_path / "grid.tif")
+    writer = rasterwriter.TiledRasterWriter(path, 4, 5, np.uint8, 0.0, 4.0, 1.0, 1.0)
+    with pytest.raises(ValueError):
+        writer.writeRows(np.zeros((2, 4), dtype=np.uint8))
+    writer.writeRows(np.zeros((3, 5), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        writer.writeRows(np.zeros((2, 5), dtype=np.uint8))
+    writer.abort()
+
+    with pytest.raises(TypeError):
+        rasterwriter.TiledRasterWriter(str(tmp_path / "complex.tif"), 4, 5, np.complex64, 0.0, 4.0, 1.0, 1.0)
+
+
+def testAbortDeletesFile(tmp_path):
+    path = str(tmp_path / "grid.tif")
+    writer = rasterwriter.TiledRasterWriter(path, 40, 30, np.uint8, 0.0, 40.0, 1.0, 1.0, tileSize=8)
+    writer.writeRows(np.ones((20, 30), dtype=np.uint8))
+    assert os.path.exists(path)
+    writer.abort()
+    assert not os.path.exists(path)
+    # aborting again, or closing after an abort, does nothing
+    writer.abort()
+    writer.close()
+
+
+def testCloseWithMissingRowsDeletesFile(tmp_path):
+    path = str(tmp_path / "grid.tif")
+    writer = rasterwriter.TiledRasterWriter(path, 40, 30, np.uint8, 0.0, 40.0, 1.0, 1.0, tileSize=8)
+    writer.writeRows(np.ones((20, 30), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        writer.close()
+    assert not os.path.exists(path)
+
+
+def testExceptionInsideWithDeletesFile(tmp_path):
+    path = str(tmp_path / "grid.tif")
+    with pytest.raises(RuntimeError):
+        with rasterwriter.TiledRasterWriter(path, 40, 30, np.uint8, 0.0, 40.0, 1.0, 1.0, tileSize=8) as writer:
+            writer.writeRows(np.ones((20, 30), dtype=np.uint8))
+            raise RuntimeError("focal sum failed")
+    assert not os.path.exists(path)
+
+
+def testAbortLeavesClosedFile(tmp_path):
+    path = str(tmp_path / "grid.tif")
+    writer = rasterwriter.TiledRasterWriter(path, 4, 5, np.uint8, 0.0, 4.0, 1.0, 1.0)
+    writer.writeRows(np.ones((4, 5), dtype=np.uint8))
+    writer.close()
+    writer.abort()
+    assert os.path.exists(path)
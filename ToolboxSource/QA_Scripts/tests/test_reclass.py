@@ -0,0 +1,85 @@
+""" Tests of ATtILA2.utils.reclass against a code by code lookup """
+import numpy as np
+import pytest
+
+from ATtILA2.utils import reclass
+
+
+def bruteForceReclass(block, codeMap, defaultCode):
+    return np.array([codeMap.get(aCode, defaultCode) for aCode in block.ravel().tolist()]).reshape(block.shape)
+
+
+@pytest.mark.parametrize("dtype", [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32, np.int64])
+def testLookupTableApply(rng, dtype):
+    typeInfo = np.iinfo(dtype)
+    codes = [int(typeInfo.min), int(typeInfo.max), 0, 1, 100, 127]
+    if typeInfo.min < 0:
+        codes += [-1, -100]
+    codeMap = dict((aCode, i + 1) for i, aCode in enumerate(codes))
+    lookupTable = reclass.LookupTable(codeMap, -7, np.int32)
+
+    for low, high in ((-130, 130), (0, 40), (120, 128), (-5, 5)):
+        low, high = max(low, int(typeInfo.min)), min(high, int(typeInfo.max))
+        block = rng.integers(low, high, size=(9, 11), endpoint=True).astype(dtype)
+        block[0, 0] = low
+        result = lookupTable.apply(block)
+        assert result.dtype == np.int32
+        np.testing.assert_array_equal(result, bruteForceReclass(block, codeMap, -7))
+
+    block = np.array(codes, dtype=dtype)
+    np.testing.assert_array_equal(lookupTable.apply(block), bruteForceReclass(block, codeMap, -7))
+
+
+def testLookupTableAlternatingRanges(rng):
+    codeMap = {5: 1, 1005: 2, 50005: 3}
+    lookupTable = reclass.LookupTable(codeMap, 0)
+    for lowCode in (0, 1000, 50000, 0, 1000, -20):
+        block = rng.integers(lowCode, lowCode + 10, size=50).astype(np.int32)
+        np.testing.assert_array_equal(lookupTable.apply(block), bruteForceReclass(block, codeMap, 0))
+    # blocks alternating between ranges are covered by one growing table
+    assert lookupTable._rangeLowCode == -20 and len(lookupTable._rangeTable) == 50030
+
+
+def testLookupTableWideRange(monkeypatch):
+    monkeypatch.setattr(reclass, "maxLookupTableSize", 64)
+    codeMap = {-1000: 1, 3: 2, 10 ** 9: 3}
+    lookupTable = reclass.LookupTable(codeMap, 9, np.int16)
+    block = np.array([[-1000, 3, 4], [10 ** 9, 0, -999]], dtype=np.int64)
+    result = lookupTable.apply(block)
+    assert result.dtype == np.int16
+    np.testing.assert_array_equal(result, bruteForceReclass(block, codeMap, 9))
+    # a block wider than the largest table does not replace the table of an earlier block
+    lookupTable.apply(np.arange(10, dtype=np.int64))
+    assert len(lookupTable._rangeTable) == 10
+
+
+def testLookupTableNoData():
+    lookupTable = reclass.LookupTable({1: 10}, 0)
+    block = np.array([[1, 2], [1, 3]], dtype=np.int32)
+    result = lookupTable.apply(block, block == 3, -1)
+    np.testing.assert_array_equal(result, [[10, 0], [10, -1]])
+    assert lookupTable.apply(np.zeros((0, 4), dtype=np.int32)).shape == (0, 4)
+
+
+def testGetInOutOtherLookupTable():
+    # a value in both the class and the excluded values is a class value
+    lookupTable = reclass.getInOutOtherLookupTable([21, 22], [11, 22], [1, -9999, 0])
+    block = np.array([11, 21, 22, 41], dtype=np.uint8)
+    np.testing.assert_array_equal(lookupTable.apply(block), [-9999, 1, 1, 0])
+
+
+@pytest.mark.parametrize("numClasses, dtype", [(1, np.uint8), (8, np.uint8), (9, np.uint16), (33, np.uint64)])
+def testGetClassBitsLookupTable(rng, numClasses, dtype):
+    classValueLists = [rng.choice(20, size=3, replace=False).tolist() for _k in range(numClasses)]
+    lookupTable = reclass.getClassBitsLookupTable(classValueLists)
+    block = np.arange(20, dtype=np.uint8)
+    classBits = lookupTable.apply(block)
+    assert classBits.dtype == dtype
+
+    for aValue, bits in zip(block.tolist(), classBits.tolist()):
+        assert bits == sum(1 << k for k, classValues in enumerate(classValueLists) if aValue in classValues)
+
+
+def testGetClassBitsLookupTableTooManyClasses():
+    with pytest.raises(ValueError):
+        reclass.getClassBitsLookupTable([[k] for k in range(65)])
@@ -0,0 +1,136 @@
+""" Tests of ATtILA2.utils.spatialindex against a pair by pair envelope check, and of its overlap graph coloring """
+import numpy as np
+import pytest
+
+from ATtILA2.utils import spatialindex
+
+
+def bruteForcePairs(boxes):
+    """ Every pair (i, j), i < j, of nonempty boxes that intersect or touch """
+
+    pairs = []
+    for i, (xMin1, yMin1, xMax1, yMax1) in enumerate(boxes.tolist()):
+        if not (xMin1 <= xMax1 and yMin1 <= yMax1):
+            continue
+        for j in range(i + 1, len(boxes)):
+            xMin2, yMin2, xMax2, yMax2 = boxes[j].tolist()
+            if not (xMin2 <= xMax2 and yMin2 <= yMax2):
+                continue
+            if xMin1 <= xMax2 and xMin2 <= xMax1 and yMin1 <= yMax2 and yMin2 <= yMax1:
+                pairs.append((i, j))
+
+    return pairs
+
+
+def randomBoxes(rng, count):
+    corners = rng.random((count, 2)) * 100
+    sizes = rng.random((count, 2)) * 8
+    return np.column_stack((corners, corners + sizes))
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 15, 17, 300])
+@pytest.mark.parametrize("capacity", [2, 4, 16])
+def testSTRTreeQuery(rng, count, capacity):
+    boxes = randomBoxes(rng, count)
+    tree = spatialindex.STRTree(boxes, capacity)
+    for queryBox in randomBoxes(rng, 20).tolist() + [[-10, -10, 200, 200], [500, 500, 600, 600]]:
+        expected = np.flatnonzero(spatialindex._intersects(boxes, *queryBox))
+        np.testing.assert_array_equal(tree.query(queryBox), expected)
+
+
+def testSTRTreeQueryTouching():
+    boxes = np.array([[0, 0, 1, 1], [1, 1, 2, 2], [2.5, 0, 3, 1]])
+    tree = spatialindex.STRTree(boxes, 2)
+    assert tree.query([1, 1, 1, 1]).tolist() == [0, 1]
+    assert tree.query([2.1, 0, 2.4, 5]).tolist() == []
+
+
+@pytest.fixture
+def boxesWithEmpties(rng):
+    boxes = randomBoxes(rng, 250)
+    # touching boxes, then the inverted infinite envelope of a null geometry and boxes with NaN coordinates
+    boxes[10] = [boxes[11, 2], boxes[11, 3], boxes[11, 2] + 1, boxes[11, 3] + 1]
+    boxes[20] = [np.inf, np.inf, -np.inf, -np.inf]
+    boxes[30] = [np.nan, 0, np.nan, 100]
+    boxes[40] = [0, 0, 100, np.nan]
+    return boxes
+
+
+def testIterIntersectingPairsWithSTRTree(boxesWithEmpties):
+    pairs = list(spatialindex.iterIntersectingPairs(boxesWithEmpties, useRtree=False))
+    assert pairs == bruteForcePairs(boxesWithEmpties)
+    assert (10, 11) in pairs
+
+
+def testIterIntersectingPairsWithRtree(boxesWithEmpties):
+    pytest.importorskip("rtree")
+    pairs = list(spatialindex.iterIntersectingPairs(boxesWithEmpties, useRtree=True))
+    assert pairs == bruteForcePairs(boxesWithEmpties)
+
+
+def testIterIntersectingPairsWithoutBoxes():
+    assert list(spatialindex.iterIntersectingPairs(np.zeros((0, 4)))) == []
+    assert list(spatialindex.iterIntersectingPairs([[np.inf, np.inf, -np.inf, -np.inf]] * 3)) == []
+
+
+def getOverlapDict(pairs):
+    """ The dictionary of OID to overlapping OIDs that polygons.findOverlaps returns for the overlapping pairs """
+
+    overlapDict = {}
+    for oid1, oid2 in pairs:
+        overlapDict.setdefault(oid1, []).append(oid2)
+        overlapDict.setdefault(oid2, []).append(oid1)
+    return dict((oid, sorted(overlapOIDs)) for oid, overlapOIDs in sorted(overlapDict.items()))
+
+
+def checkGroups(overlapDict, groupDict):
+    """ Check that each OID is in exactly one group and that no group holds two overlapping polygons """
+
+    groupedOIDs = [oid for oids in groupDict.values() for oid in oids]
+    assert sorted(groupedOIDs) == sorted(overlapDict)
+    for oids in groupDict.values():
+        for oid in oids:
+            assert not set(overlapDict[oid]).intersection(oids)
+    assert list(groupDict) == list(range(1, len(groupDict) + 1))
+
+
+@pytest.mark.parametrize("pairs, groupCount", [
+    ([(1, 2), (2, 3), (3, 4), (4, 5)], 2),
+    ([(1, 2), (2, 3), (1, 3)], 3),
+    ([(10, 1), (10, 2), (10, 3), (10, 4), (10, 5), (10, 6)], 2),
+    ([(1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 1)], 2),
+    ([(1, 2), (2, 3), (1, 3), (3, 4), (4, 5), (5, 6), (6, 4), (7, 8)], 3),
+])
+def testColorOverlapGraph(pairs, groupCount):
+    overlapDict = getOverlapDict(pairs)
+    groupDict = spatialindex.colorOverlapGraph(overlapDict)
+    checkGroups(overlapDict, groupDict)
+    assert len(groupDict) == groupCount
+
+
+def testColorOverlapGraphStar():
+    overlapDict = getOverlapDict([(10, leaf) for leaf in range(1, 7)])
+    # the center overlaps the most polygons, so it is colored first and is alone in its group
+    assert spatialindex.colorOverlapGraph(overlapDict) == {1: [10], 2: [1, 2, 3, 4, 5, 6]}
+
+
+def testColorOverlapGraphWithoutOverlaps():
+    assert spatialindex.colorOverlapGraph({}) == {}
+    # polygons that overlap nothing all fit in the first group
+    assert spatialindex.colorOverlapGraph({1: [], 2: [], 3: []}) == {1: [1, 2, 3]}
+
+
+def testColorOverlapGraphOneSided():
+    # an overlap listed for only one of the two polygons still keeps them apart
+    groupDict = spatialindex.colorOverlapGraph({1: [2, 3], 2: [3]})
+    checkGroups(getOverlapDict([(1, 2), (1, 3), (2, 3)]), groupDict)
+
+
+def testColorOverlapGraphRandomBoxes(rng):
+    boxes = randomBoxes(rng, 300)
+    pairs = [(i + 100, j + 100) for i, j in spatialindex.iterIntersectingPairs(boxes, useRtree=False)]
+    overlapDict = getOverlapDict(pairs)
+    groupDict = spatialindex.colorOverlapGraph(overlapDict)
+    checkGroups(overlapDict, groupDict)
+    # a greedy coloring never needs more colors than the largest number of overlaps plus one
+    assert len(groupDict) <= max(len(overlapOIDs) for overlapOIDs in overlapDict.values()) + 1
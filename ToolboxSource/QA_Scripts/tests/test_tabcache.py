@@ -0,0 +1,100 @@
+""" Tests of the ATtILA2.utils.tabcache tabulation cache """
+import os
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import tabcache
+
+
+def getEntryPath(cacheDirectory, fingerprint):
+    return os.path.join(str(cacheDirectory), fingerprint + ".npz")
+
+
+def setAge(filePath, secondsAgo):
+    """ Set the modification time of a cache entry to secondsAgo before now """
+
+    entryTime = os.path.getmtime(filePath) - secondsAgo
+    os.utime(filePath, (entryTime, entryTime))
+
+
+@pytest.fixture
+def areaMatrix(rng):
+    return rng.random((4, 3)) * 900
+
+
+def testStoreAndLoad(tmp_path, areaMatrix):
+    cacheDirectory = tmp_path / "cache"
+    tabulationCache = tabcache.TabulationCache(str(cacheDirectory), 10 ** 6)
+    assert tabulationCache.load("abc") is None
+
+    tabulationCache.store("abc", ["u1", "u2", "u3", "u4"], [11, 21, 41], areaMatrix)
+    zoneIdValues, tabAreaValues, loadedMatrix = tabulationCache.load("abc")
+    assert zoneIdValues == ["u1", "u2", "u3", "u4"]
+    assert tabAreaValues == [11, 21, 41]
+    np.testing.assert_array_equal(loadedMatrix, areaMatrix)
+    # only the finished entry is left in the folder
+    assert os.listdir(str(cacheDirectory)) == ["abc.npz"]
+
+
+def testStoreReplacesEntry(tmp_path, areaMatrix):
+    tabulationCache = tabcache.TabulationCache(str(tmp_path), 10 ** 6)
+    tabulationCache.store("abc", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    tabulationCache.store("abc", [1, 2, 3, 4], [11, 21, 41], areaMatrix * 2)
+    np.testing.assert_array_equal(tabulationCache.load("abc")[2], areaMatrix * 2)
+
+
+def testLoadCorruptEntry(tmp_path, areaMatrix):
+    tabulationCache = tabcache.TabulationCache(str(tmp_path), 10 ** 6)
+    with open(getEntryPath(tmp_path, "bad"), "wb") as entryFile:
+        entryFile.write(b"not a numpy archive")
+    assert tabulationCache.load("bad") is None
+
+    # an archive without the expected arrays is a miss as well
+    np.savez(getEntryPath(tmp_path, "partial"), zoneIdValues=np.arange(4))
+    assert tabulationCache.load("partial") is None
+
+    # the next store replaces the corrupt entry
+    tabulationCache.store("bad", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    np.testing.assert_array_equal(tabulationCache.load("bad")[2], areaMatrix)
+
+
+def testEvictLeastRecentlyUsed(tmp_path, areaMatrix):
+    tabulationCache = tabcache.TabulationCache(str(tmp_path), 10 ** 6)
+    for i, fingerprint in enumerate(["first", "second", "third"]):
+        tabulationCache.store(fingerprint, [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+        setAge(getEntryPath(tmp_path, fingerprint), 300 - i * 100)
+    entrySize = os.path.getsize(getEntryPath(tmp_path, "first"))
+
+    # loading the oldest entry makes it the most recently used
+    assert tabulationCache.load("first") is not None
+
+    tabulationCache.maxCacheSize = entrySize * 2
+    tabulationCache.evict()
+    assert sorted(os.listdir(str(tmp_path))) == ["first.npz", "third.npz"]
+
+    # a store evicts as well, oldest first
+    setAge(getEntryPath(tmp_path, "first"), 500)
+    tabulationCache.store("fourth", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    assert sorted(os.listdir(str(tmp_path))) == ["fourth.npz", "third.npz"]
+
+
+def testEvictLeavesOtherFiles(tmp_path, areaMatrix):
+    otherPath = str(tmp_path / "notes.txt")
+    with open(otherPath, "w") as otherFile:
+        otherFile.write("x" * 10000)
+
+    tabulationCache = tabcache.TabulationCache(str(tmp_path), 0)
+    tabulationCache.store("abc", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    assert os.listdir(str(tmp_path)) == ["notes.txt"]
+
+
+def testEvictAndClearWithoutFolder(tmp_path, areaMatrix):
+    tabulationCache = tabcache.TabulationCache(str(tmp_path / "missing"), 10 ** 6)
+    tabulationCache.evict()
+    tabulationCache.clear()
+
+    tabulationCache.store("abc", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    tabulationCache.store("def", [1, 2, 3, 4], [11, 21, 41], areaMatrix)
+    tabulationCache.clear()
+    assert os.listdir(str(tmp_path / "missing")) == []
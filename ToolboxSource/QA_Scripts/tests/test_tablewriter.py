@@ -0,0 +1,139 @@
+""" Tests of ATtILA2.utils.tablewriter with CSV output files """
+import csv
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import tablewriter
+
+
+def readCsv(csvPath):
+    """ Return the header and the data rows of a CSV file """
+
+    with open(csvPath, newline="") as csvFile:
+        rows = list(csv.reader(csvFile))
+
+    return rows[0], rows[1:]
+
+
+class RecordingTableWriter(tablewriter.MetricTableWriter):
+    """ Writer that records which write method was called """
+
+    def __init__(self, newTable, idFieldName, rowCount):
+        super().__init__(newTable, idFieldName)
+        self.rowCount = rowCount
+        self.calls = []
+
+    def getRowCount(self):
+        return self.rowCount
+
+    def insertRows(self):
+        self.calls.append(("insert", list(self.getRows())))
+
+    def updateRows(self, defaultValues=None):
+        self.calls.append(("update", defaultValues))
+
+
+def testGetTableWriter(tmp_path):
+    assert isinstance(tablewriter.getTableWriter(str(tmp_path / "out.CSV"), "ID"), tablewriter.FileTableWriter)
+    assert isinstance(tablewriter.getTableWriter(str(tmp_path / "out.parquet"), "ID"), tablewriter.FileTableWriter)
+    assert isinstance(tablewriter.getTableWriter(str(tmp_path / "out.gdb" / "lcp"), "ID"),
+                      tablewriter.ArcpyTableWriter)
+
+
+def testMetricTableWriterIsAbstract():
+    with pytest.raises(TypeError):
+        tablewriter.MetricTableWriter("out.csv", "ID")
+
+
+def testAddColumnRejectsWrongLength():
+    writer = RecordingTableWriter("out", "ID", 0)
+    writer.setIds(np.array([1, 2, 3]))
+    with pytest.raises(ValueError):
+        writer.addColumn("pFor", [1.0, 2.0])
+
+
+def testWriteRows():
+    writer = RecordingTableWriter("out", "ID", 0)
+    writer.setIds(np.array([7, 8]))
+    writer.addColumn("pFor", np.array([25.0, 50.0]))
+    writer.writeRows({"pFor": 0})
+    assert writer.calls == [("insert", [(7, 25.0), (8, 50.0)])]
+    # NumPy values are converted to python values before they reach the table
+    assert type(writer.calls[0][1][0][0]) is int
+
+    writer.rowCount = 2
+    writer.calls = []
+    writer.writeRows({"pFor": 0})
+    assert writer.calls == [("update", {"pFor": 0})]
+
+
+def testFileTableWriterInsertRows(tmp_path):
+    csvPath = str(tmp_path / "lcp.csv")
+    writer = tablewriter.FileTableWriter(csvPath, "ID")
+    writer.setIds(np.array([3, 1, 2]))
+    writer.addColumn("pFor", np.array([10.5, 0.0, 99.0]))
+    writer.addColumn("pAgt", [1, 2, 3])
+    assert writer.getRowCount() == 0
+    writer.writeRows()
+
+    header, rows = readCsv(csvPath)
+    assert header == ["ID", "pFor", "pAgt"]
+    assert rows == [["3", "10.5", "1"], ["1", "0.0", "2"], ["2", "99.0", "3"]]
+    assert writer.getRowCount() == 3
+
+
+def testFileTableWriterUpdateRows(tmp_path):
+    csvPath = str(tmp_path / "lcp.csv")
+    writer = tablewriter.FileTableWriter(csvPath, "ID")
+    writer.setIds([1, 2, 3, 4])
+    writer.addColumn("pFor", [10, 20, 30, 40])
+    writer.writeRows()
+
+    # a second class is computed for only some of the reporting units
+    writer = tablewriter.FileTableWriter(csvPath, "ID")
+    writer.setIds([4, 2])
+    writer.addColumn("pFor", [41, 21])
+    writer.addColumn("pAgt", [0.5, 0.25])
+    writer.writeRows({"pAgt": -1})
+
+    header, rows = readCsv(csvPath)
+    assert header == ["ID", "pFor", "pAgt"]
+    # rows without a result keep their values and take the default for the fields in defaultValues
+    assert rows == [["1", "10", "-1"], ["2", "21", "0.25"], ["3", "30", "-1"], ["4", "41", "0.5"]]
+
+
+def testFileTableWriterUpdateRowsWithoutDefaults(tmp_path):
+    csvPath = str(tmp_path / "lcp.csv")
+    writer = tablewriter.FileTableWriter(csvPath, "ID")
+    writer.setIds([1, 2])
+    writer.addColumn("pFor", [10, 20])
+    writer.writeRows()
+
+    writer = tablewriter.FileTableWriter(csvPath, "ID")
+    writer.setIds([2])
+    writer.addColumn("pFor", [22])
+    writer.addColumn("pAgt", [5])
+    writer.writeRows()
+
+    _header, rows = readCsv(csvPath)
+    assert rows == [["1", "10", ""], ["2", "22", "5"]]
+
+
+def testFileTableWriterParquet(tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    parquetPath = str(tmp_path / "lcp.parquet")
+    writer = tablewriter.FileTableWriter(parquetPath, "ID")
+    writer.setIds([1, 2])
+    writer.addColumn("pFor", [10.0, 20.0])
+    writer.writeRows()
+
+    writer = tablewriter.FileTableWriter(parquetPath, "ID")
+    writer.setIds([2])
+    writer.addColumn("pFor", [25.0])
+    writer.writeRows({"pFor": 0.0})
+
+    dataFrame = pd.read_parquet(parquetPath)
+    assert dataFrame["ID"].tolist() == [1, 2]
+    assert dataFrame["pFor"].tolist() == [0.0, 25.0]
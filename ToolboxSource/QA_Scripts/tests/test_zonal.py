@@ -0,0 +1,203 @@
+""" Tests of ATtILA2.utils.zonal against a cell by cell count """
+import pickle
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from ATtILA2.utils import zonal
+
+
+class ArrayReader(object):
+    """ Block reader over an in-memory array """
+
+    def __init__(self, array):
+        self._array = array
+        self.shape = array.shape
+
+    def readBlock(self, rowOffset, colOffset, blockRows, blockCols):
+        return self._array[rowOffset:rowOffset + blockRows, colOffset:colOffset + blockCols].copy()
+
+
+def bruteForceCounts(zoneArray, valueArray, zoneNoData=None, valueNoData=None):
+    """ Count the (zone, value) pairs of the valid cells one cell at a time """
+
+    counts = Counter()
+    for zoneCode, gridValue in zip(zoneArray.ravel().tolist(), valueArray.ravel().tolist()):
+        if zoneCode != zoneNoData and gridValue != valueNoData:
+            counts[(zoneCode, gridValue)] += 1
+
+    return counts
+
+
+def getMatrixCounts(zoneCodes, gridValues, areaMatrix, cellArea=1.0):
+    """ Return the nonzero entries of an area matrix as a Counter of (zone, value) cell counts """
+
+    counts = Counter()
+    for i, zoneCode in enumerate(zoneCodes.tolist()):
+        for j, gridValue in enumerate(gridValues.tolist()):
+            if areaMatrix[i, j]:
+                counts[(zoneCode, gridValue)] = int(round(areaMatrix[i, j] / cellArea))
+
+    return counts
+
+
+@pytest.fixture
+def zoneAndValueArrays(rng):
+    zoneArray = rng.integers(0, 6, size=(37, 29)).astype(np.int32)
+    zoneArray[:5, :] = -1
+    valueArray = rng.choice(np.array([-3, 11, 12, 21, 41, 90, 255], dtype=np.int32), size=zoneArray.shape)
+    return zoneArray, valueArray
+
+
+def testGetDenseIndex(rng):
+    for codeArray in (rng.integers(-50, 50, size=500), rng.integers(0, 2 ** 40, size=500),
+                      rng.random(200).round(1)):
+        uniqueCodes, indexArray = zonal.getDenseIndex(codeArray)
+        np.testing.assert_array_equal(uniqueCodes, np.unique(codeArray))
+        np.testing.assert_array_equal(uniqueCodes[indexArray], codeArray)
+
+    uniqueCodes, indexArray = zonal.getDenseIndex(np.zeros(0, dtype=np.int32))
+    assert uniqueCodes.size == 0 and indexArray.size == 0
+
+
+def testZonalHistogram(zoneAndValueArrays):
+    zoneArray, valueArray = zoneAndValueArrays
+    zoneCodes, gridValues, areaMatrix = zonal.zonalHistogram(zoneArray, valueArray, 2.5, -1, 255)
+
+    expected = bruteForceCounts(zoneArray, valueArray, -1, 255)
+    assert getMatrixCounts(zoneCodes, gridValues, areaMatrix, 2.5) == expected
+    assert zoneCodes.tolist() == sorted(set(zone for zone, _value in expected))
+    assert gridValues.tolist() == sorted(set(value for _zone, value in expected))
+
+
+def testZonalHistogramShapeMismatch():
+    with pytest.raises(ValueError):
+        zonal.zonalHistogram(np.zeros((3, 4), dtype=np.int32), np.zeros((4, 3), dtype=np.int32))
+
+
+def testGetValidCellMaskWithNaN():
+    valueArray = np.array([[1.0, np.nan], [3.0, -9.0]])
+    zoneArray = np.array([[0, 1], [-1, 2]])
+    validMask = zonal.getValidCellMask(zoneArray, valueArray, -1, -9.0)
+    np.testing.assert_array_equal(validMask, [[True, False], [False, False]])
+
+
+def testMergeZones():
+    zoneCodes = np.array([1, 2, 3, 4])
+    areaMatrix = np.arange(12, dtype=np.float64).reshape(4, 3)
+    zoneIdLookup = {1: "b", 2: "a", 3: "b", 4: "c"}
+
+    uniqueIds, mergedMatrix = zonal.mergeZones(zoneCodes, areaMatrix, zoneIdLookup)
+    assert uniqueIds == ["a", "b", "c"]
+    np.testing.assert_array_equal(mergedMatrix, [areaMatrix[1], areaMatrix[0] + areaMatrix[2], areaMatrix[3]])
+
+    uniqueIds, mergedMatrix = zonal.mergeZones(zoneCodes, areaMatrix, {1: 40, 2: 30, 3: 20, 4: 10})
+    assert uniqueIds == [10, 20, 30, 40]
+    np.testing.assert_array_equal(mergedMatrix, areaMatrix[::-1])
+
+
+@pytest.mark.parametrize("blockSize", [1, 4, 7, 64])
+@pytest.mark.parametrize("maxPendingKeys", [3, 2 ** 24])
+def testTiledZonalHistogram(zoneAndValueArrays, monkeypatch, blockSize, maxPendingKeys):
+    monkeypatch.setattr(zonal.ZonalAccumulator, "maxPendingKeys", maxPendingKeys)
+    zoneArray, valueArray = zoneAndValueArrays
+
+    zoneCodes, gridValues, areaMatrix = zonal.tiledZonalHistogram(ArrayReader(zoneArray), ArrayReader(valueArray),
+                                                                  4.0, -1, 255, blockSize)
+    expected = zonal.zonalHistogram(zoneArray, valueArray, 4.0, -1, 255)
+    np.testing.assert_array_equal(zoneCodes, expected[0])
+    np.testing.assert_array_equal(gridValues, expected[1])
+    np.testing.assert_array_equal(areaMatrix, expected[2])
+
+
+def testGetSparseCounts(zoneAndValueArrays):
+    zoneArray, valueArray = zoneAndValueArrays
+    accumulator = zonal.tabulateBlocks(ArrayReader(zoneArray), ArrayReader(valueArray), -1, None, blockSize=8)
+
+    zoneCodes, gridValues, cellCounts = accumulator.getSparseCounts()
+    counts = Counter(dict(zip(zip(zoneCodes.tolist(), gridValues.tolist()), cellCounts.tolist())))
+    assert counts == bruteForceCounts(zoneArray, valueArray, -1, None)
+    assert np.all(np.diff(accumulator.keys) > 0)
+
+
+def testAddBlockRejectsOutOfRangeCodes():
+    accumulator = zonal.ZonalAccumulator()
+    with pytest.raises(ValueError):
+        accumulator.addBlock(np.array([-2, 1]), np.array([1, 1]))
+    with pytest.raises(ValueError):
+        accumulator.addBlock(np.array([1, 1]), np.array([1, 2 ** 40]))
+
+
+def testMergeAccumulators(zoneAndValueArrays):
+    zoneArray, valueArray = zoneAndValueArrays
+    accumulators = []
+    for rowOffset in range(0, zoneArray.shape[0], 10):
+        accumulator = zonal.ZonalAccumulator()
+        accumulator.addBlock(zoneArray[rowOffset:rowOffset + 10], valueArray[rowOffset:rowOffset + 10], -1, 255)
+        if rowOffset == 10:
+            # a partial accumulator that was already read has merged parts as well as pending ones
+            accumulator.keys
+            accumulator.addBlock(zoneArray[:3], valueArray[:3], -1, 255)
+            accumulator.addBlock(zoneArray[3:5], valueArray[3:5], -1, 255)
+        accumulators.append(accumulator)
+
+    total = zonal.mergeAccumulators(accumulators)
+    zoneCodes, gridValues, cellCounts = total.getSparseCounts()
+    counts = Counter(dict(zip(zip(zoneCodes.tolist(), gridValues.tolist()), cellCounts.tolist())))
+    assert counts == bruteForceCounts(zoneArray, valueArray, -1, 255) + bruteForceCounts(zoneArray[:5], valueArray[:5],
+                                                                                         -1, 255)
+    assert zonal.mergeAccumulators([]).keys.size == 0
+
+
+@pytest.mark.parametrize("numAccumulators", [1, 2, 3, 5, 8])
+def testMergeAccumulatorsTree(zoneAndValueArrays, numAccumulators):
+    zoneArray, valueArray = zoneAndValueArrays
+    rowGroups = np.array_split(np.arange(zoneArray.shape[0]), numAccumulators)
+    accumulators = []
+    for rows in rowGroups:
+        accumulator = zonal.ZonalAccumulator()
+        accumulator.addBlock(zoneArray[rows], valueArray[rows], -1, 255)
+        accumulators.append(accumulator)
+
+    total = zonal.mergeAccumulators(accumulators)
+    assert total is accumulators[0]
+    # every level of the reduction merges its pairs, so nothing is left pending
+    assert numAccumulators == 1 or total._pendingSize == 0
+    zoneCodes, gridValues, areaMatrix = total.getAreaMatrix()
+    assert getMatrixCounts(zoneCodes, gridValues, areaMatrix) == bruteForceCounts(zoneArray, valueArray, -1, 255)
+
+
+def testAccumulatorPickles(zoneAndValueArrays):
+    zoneArray, valueArray = zoneAndValueArrays
+    accumulator = zonal.ZonalAccumulator()
+    accumulator.addBlock(zoneArray, valueArray, -1, 255)
+
+    copied = pickle.loads(pickle.dumps(accumulator))
+    np.testing.assert_array_equal(copied.keys, accumulator.keys)
+    np.testing.assert_array_equal(copied.counts, accumulator.counts)
+
+
+def testMemmapRasterReader(tmp_path, zoneAndValueArrays):
+    zoneArray, valueArray = zoneAndValueArrays
+    npyPath = str(tmp_path / "zones.npy")
+    np.save(npyPath, zoneArray)
+    rawPath = str(tmp_path / "values.bin")
+    valueArray.tofile(rawPath)
+
+    zoneReader = zonal.MemmapRasterReader(npyPath)
+    valueReader = zonal.MemmapRasterReader(rawPath, valueArray.shape, valueArray.dtype)
+    np.testing.assert_array_equal(zoneReader.readBlock(3, 4, 10, 100), zoneArray[3:13, 4:])
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(valueReader)).readBlock(0, 0, 5, 5), valueArray[:5, :5])
+
+    result = zonal.tiledZonalHistogram(zoneReader, valueReader, 1.0, -1, 255, blockSize=16)
+    expected = zonal.zonalHistogram(zoneArray, valueArray, 1.0, -1, 255)
+    for resultArray, expectedArray in zip(result, expected):
+        np.testing.assert_array_equal(resultArray, expectedArray)
+
+
+@pytest.mark.parametrize("factor, cpuCount, workers", [(None, 8, 1), ("", 8, 1), ("0", 8, 1), ("4", 8, 4),
+                                                       ("16", 8, 8), ("50%", 8, 4), ("1%", 8, 1), ("abc", 8, 1),
+                                                       (3, 8, 3)])
+def testGetWorkerCount(factor, cpuCount, workers):
+    assert zonal.getWorkerCount(factor, cpuCount) == workers